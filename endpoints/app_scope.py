@@ -0,0 +1,52 @@
+import threading
+from typing import Dict, Mapping, Optional, Set
+
+# Settings that name apps an endpoint invokes besides the app of the request
+APP_ID_SETTINGS = ("static_app_id", "canary_app_id", "shadow_app_id")
+
+
+class EndpointApps:
+    """
+    Remembers the apps each endpoint invoked.
+
+    Metrics and reports are kept per app for the whole plugin process, which serves the
+    endpoints of every workspace. They are only shown for the apps of the endpoint that asks.
+    """
+
+    def __init__(self):
+        self._apps: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint_id: Optional[str], app_id: str) -> None:
+        """
+        Record that an endpoint invoked an app.
+        """
+        with self._lock:
+            self._apps.setdefault(endpoint_id or "", set()).add(app_id)
+
+    def get(self, endpoint_id: Optional[str], settings: Mapping) -> Set[str]:
+        """
+        The apps an endpoint invoked or names in its settings.
+
+        Args:
+            endpoint_id: The ID of the endpoint
+            settings: The settings of the endpoint
+
+        Returns:
+            The app IDs
+        """
+        with self._lock:
+            app_ids = set(self._apps.get(endpoint_id or "", ()))
+        for name in APP_ID_SETTINGS:
+            app_id = settings.get(name)
+            if isinstance(app_id, dict):
+                app_id = app_id.get("app_id")
+            if app_id:
+                app_ids.add(app_id)
+        for group in (settings.get("replica_app_ids") or "").replace("\n", ";").split(";"):
+            app_ids.update(entry.partition(":")[0].strip() for entry in group.split(","))
+        app_ids.discard("")
+        return app_ids
+
+
+endpoint_apps = EndpointApps()
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds a request waits in the queue for a free slot before it is rejected
+MAX_QUEUE_WAIT = 5.0
+# Priority lanes, from highest to lowest priority, with their share of the freed slots
+LANE_WEIGHTS = {"interactive": 8, "default": 4, "bulk": 1}
+# Seconds after which a queued request is served first regardless of its lane
+MAX_LANE_WAIT = 2.0
+
+
+class BulkheadFullError(Exception):
+    """
+    Raised when no slot became free for an invocation.
+    """
+
+    def __init__(self, scope: str):
+        """
+        Initialize the error.
+
+        Args:
+            scope: "app" if the limit of the app was reached, "total" if the limit of the process
+        """
+        self.scope = scope
+        super().__init__(f"Too many concurrent invocations ({scope} limit reached)")
+
+
+class _Waiter:
+    """
+    A queued invocation waiting for a slot.
+    """
+
+    __slots__ = ("key", "limit", "total_limit", "lane", "enqueued_at", "granted")
+
+    def __init__(self, key: str, limit: int, total_limit: int, lane: str):
+        self.key = key
+        self.limit = limit
+        self.total_limit = total_limit
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class Bulkhead:
+    """
+    Limits the number of concurrent invocations for each key and in total.
+
+    Callers that find no free slot wait in a bounded queue for a short time. When the queue is
+    full or the wait times out, the invocation is rejected instead of occupying a worker.
+    Limits are passed on each call, so endpoints with different settings can share the counters.
+    A limit of 0 or less means unlimited.
+
+    The queue is split into priority lanes. Freed slots are handed to the lanes by stride
+    scheduling in proportion to their weights, so interactive requests overtake a bulk backlog
+    without starving it. A request that waited longer than max_lane_wait is served first.
+    """
+
+    def __init__(self, weights: Mapping[str, int] = LANE_WEIGHTS, max_lane_wait: float = MAX_LANE_WAIT):
+        self.weights = dict(weights)
+        self.max_lane_wait = max_lane_wait
+        self._active: Dict[str, int] = {}
+        self._total = 0
+        self._queued = 0
+        self._lanes: Dict[str, Deque[_Waiter]] = {lane: deque() for lane in self.weights}
+        self._passes: Dict[str, float] = {lane: 0.0 for lane in self.weights}
+        self._virtual_time = 0.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, key: str, limit: int, total_limit: int, max_queued: int,
+             timeout: float = MAX_QUEUE_WAIT, lane: str = "default") -> Iterator[None]:
+        """
+        Hold a slot for the duration of the with block.
+
+        Args:
+            key: The key the per-key limit applies to, e.g. the app ID
+            limit: The maximum number of concurrent invocations for the key
+            total_limit: The maximum number of concurrent invocations in total
+            max_queued: The maximum number of callers waiting for a slot
+            timeout: Seconds to wait for a slot
+            lane: The priority lane to wait in
+
+        Raises:
+            BulkheadFullError: If no slot became free
+        """
+        self.acquire(key, limit, total_limit, max_queued, timeout, lane)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def acquire(self, key: str, limit: int, total_limit: int, max_queued: int,
+                timeout: float = MAX_QUEUE_WAIT, lane: str = "default") -> None:
+        """
+        Take a slot, waiting in the queue of the lane if none is free.
+
+        Raises:
+            BulkheadFullError: If the queue is full or no slot became free in time
+        """
+        with self._cond:
+            scope = self._full_scope(key, limit, total_limit)
+            if scope is None:
+                self._take(key)
+                return
+            if self._queued >= max_queued:
+                logger.warning("Rejected invocation for %s, %d invocations are queued", key, self._queued)
+                raise BulkheadFullError(scope)
+
+            waiter = _Waiter(key, limit, total_limit, lane if lane in self._lanes else "default")
+            queue = self._lanes[waiter.lane]
+            if not queue:
+                # A lane that was idle does not get credit for the time it was idle
+                self._passes[waiter.lane] = max(self._passes[waiter.lane], self._virtual_time)
+            queue.append(waiter)
+            self._queued += 1
+
+            deadline = waiter.enqueued_at + timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(waiter)
+                    self._queued -= 1
+                    logger.warning("Rejected invocation for %s after waiting %.1fs", key, timeout)
+                    raise BulkheadFullError(self._full_scope(key, limit, total_limit) or scope)
+                self._cond.wait(remaining)
+
+    def release(self, key: str) -> None:
+        """
+        Free a slot taken with acquire and hand it to the next queued invocation.
+        """
+        with self._cond:
+            self._total -= 1
+            if self._active[key] <= 1:
+                del self._active[key]
+            else:
+                self._active[key] -= 1
+            if self._queued and self._grant():
+                self._cond.notify_all()
+
+    def active(self, key: str) -> int:
+        """
+        The number of invocations in flight for a key.
+        """
+        with self._cond:
+            return self._active.get(key, 0)
+
+    def _grant(self) -> bool:
+        """
+        Hand free slots to queued invocations, taking the slots on their behalf.
+        """
+        granted = False
+        while self._queued:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._lanes[waiter.lane].remove(waiter)
+            self._queued -= 1
+            self._take(waiter.key)
+            waiter.granted = True
+            granted = True
+        return granted
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """
+        Pick the queued invocation that gets the next free slot, or None if none fits.
+        """
+        starving_before = time.monotonic() - self.max_lane_wait
+        best: Optional[_Waiter] = None
+        best_rank = None
+        for lane, queue in self._lanes.items():
+            for waiter in queue:
+                if self._full_scope(waiter.key, waiter.limit, waiter.total_limit) is not None:
+                    continue
+                # Invocations that waited too long come first, the others by the pass of their lane
+                if waiter.enqueued_at <= starving_before:
+                    rank = (0, waiter.enqueued_at)
+                else:
+                    rank = (1, self._passes[lane])
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = waiter, rank
+                # Later waiters of the same lane are only considered when earlier ones do not fit
+                break
+
+        if best is not None:
+            self._virtual_time = self._passes[best.lane]
+            self._passes[best.lane] += 1.0 / self.weights[best.lane]
+        return best
+
+    def _full_scope(self, key: str, limit: int, total_limit: int) -> Optional[str]:
+        if 0 < total_limit <= self._total:
+            return "total"
+        if 0 < limit <= self._active.get(key, 0):
+            return "app"
+        return None
+
+    def _take(self, key: str) -> None:
+        self._active[key] = self._active.get(key, 0) + 1
+        self._total += 1
+
+
+app_bulkhead = Bulkhead()
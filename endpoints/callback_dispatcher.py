@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, Optional
+from endpoints.http_client import callback_clients
+from endpoints.metrics import Sample, metrics
+
+logger = logging.getLogger(__name__)
+
+# Number of callbacks that are sent at the same time
+CALLBACK_WORKERS = 16
+# Maximum number of callbacks waiting to be sent, further callbacks wait for space or are dropped
+MAX_QUEUED_CALLBACKS = 1000
+# Seconds a callback waits for space in a full queue before it is dropped
+SUBMIT_TIMEOUT = 1.0
+# Seconds the pending callbacks are given to finish when the process exits
+DRAIN_TIMEOUT = 10.0
+# Upper bounds of the send latency histogram buckets in seconds
+SEND_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class CallbackDispatcher:
+    """
+    Sends callbacks from a long-lived event loop running on a thread of its own.
+
+    Callbacks are submitted from synchronous code and wait in a bounded queue until one of a
+    fixed number of worker coroutines sends them. When the queue is full, submitting blocks for a
+    short time and then drops the callback, so a slow callback receiver cannot grow memory
+    without bound. On shutdown, the queued and running callbacks are given time to finish.
+    """
+
+    def __init__(self, workers: int = CALLBACK_WORKERS, max_queued: int = MAX_QUEUED_CALLBACKS):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Callable[[], Awaitable[None]]]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._queued = 0
+        self._in_flight = 0
+        self._closed = False
+        self._dropped = 0
+        self._buckets: List[int] = [0] * len(SEND_LATENCY_BUCKETS)
+        self._sent = 0
+        self._latency_sum = 0.0
+        self._cond = threading.Condition()
+
+    def submit(self, send: Callable[[], Awaitable[None]], timeout: float = SUBMIT_TIMEOUT) -> bool:
+        """
+        Queue a callback.
+
+        Args:
+            send: Returns the coroutine sending the callback, it runs on the event loop of the dispatcher
+            timeout: Seconds to wait for space when the queue is full
+
+        Returns:
+            False if the callback was dropped because the queue stayed full or the dispatcher is closed
+        """
+        with self._cond:
+            deadline = time.monotonic() + timeout
+            while not self._closed and self._queued >= self.max_queued:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if self._closed or self._queued >= self.max_queued:
+                self._dropped += 1
+                return False
+            self._start()
+            self._queued += 1
+            loop, queue = self._loop, self._queue
+        loop.call_soon_threadsafe(queue.put_nowait, send)
+        return True
+
+    def drain(self, timeout: float = DRAIN_TIMEOUT) -> bool:
+        """
+        Stop accepting callbacks and wait for the pending ones to be sent.
+
+        Args:
+            timeout: Seconds to wait for the pending callbacks
+
+        Returns:
+            True if all pending callbacks finished in time
+        """
+        with self._cond:
+            self._closed = True
+            deadline = time.monotonic() + timeout
+            while self._queued or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            drained = not self._queued and not self._in_flight
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            self._cond.notify_all()
+            pending = self._queued + self._in_flight
+        if not drained:
+            logger.warning("Dropped %d pending callbacks on shutdown", pending)
+
+        if loop is not None and thread is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=1.0)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Failed to stop the callback dispatcher: %s", str(e))
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=1.0)
+        return drained
+
+    def collect(self) -> List[Sample]:
+        """
+        Report the queue depth, the callbacks in flight and the send latency.
+        """
+        with self._cond:
+            samples: List[Sample] = [
+                ("webhook_callback_queue_depth", {}, self._queued),
+                ("webhook_callback_in_flight", {}, self._in_flight),
+                ("webhook_callbacks_dropped_total", {}, self._dropped),
+            ]
+            for bound, count in zip(SEND_LATENCY_BUCKETS, self._buckets):
+                samples.append(("webhook_callback_send_seconds_bucket", {"le": str(bound)}, count))
+            samples.append(("webhook_callback_send_seconds_bucket", {"le": "+Inf"}, self._sent))
+            samples.append(("webhook_callback_send_seconds_sum", {}, self._latency_sum))
+            samples.append(("webhook_callback_send_seconds_count", {}, self._sent))
+            return samples
+
+    def _start(self) -> None:
+        """
+        Start the event loop thread on first use. Called with the lock held.
+        """
+        if self._thread is not None:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._queue = asyncio.Queue()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="webhook-callbacks",
+                                        daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        self._workers = [loop.create_task(self._work()) for _ in range(self.workers)]
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _shutdown(self) -> None:
+        """
+        Stop the workers and close the connections of the callback client.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await callback_clients.aclose()
+
+    async def _work(self) -> None:
+        while True:
+            send = await self._queue.get()
+            with self._cond:
+                self._queued -= 1
+                self._in_flight += 1
+                self._cond.notify_all()
+            started = time.monotonic()
+            try:
+                await send()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Callback failed: %s", str(e))
+            finally:
+                self._record(time.monotonic() - started)
+
+    def _record(self, seconds: float) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._sent += 1
+            self._latency_sum += seconds
+            for index, bound in enumerate(SEND_LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self._buckets[index] += 1
+            self._cond.notify_all()
+
+
+def install_shutdown_handler(shutdown: Callable[[], None]) -> None:
+    """
+    Run a shutdown function when the plugin daemon stops the process with SIGTERM.
+
+    The process is terminated by the signal, so atexit handlers do not run in that case. The
+    handler runs the shutdown function and then terminates the process with the default action
+    of the signal. It has to be installed from the main thread. When the SDK exits the process
+    with os._exit, e.g. because the daemon is gone, neither runs.
+
+    Args:
+        shutdown: The function to run before the process terminates, e.g. draining the callbacks
+    """
+    def handle(signum: int, _frame: Any) -> None:
+        logger.info("Received signal %d, shutting down", signum)
+        try:
+            shutdown()
+        finally:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, handle)
+
+
+callback_dispatcher = CallbackDispatcher()
+
+metrics.describe("webhook_callback_queue_depth", "gauge", "Number of callbacks waiting to be sent")
+metrics.describe("webhook_callback_in_flight", "gauge", "Number of callbacks being sent")
+metrics.describe("webhook_callbacks_dropped_total", "counter",
+                 "Number of callbacks dropped because the queue was full or the process exited")
+metrics.describe("webhook_callback_send_seconds", "histogram",
+                 "Time to send a callback, including its retries")
+metrics.register_collector(callback_dispatcher.collect)
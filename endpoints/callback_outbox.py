@@ -0,0 +1,242 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from endpoints.codec import dumps, loads
+from endpoints.callback_dispatcher import callback_dispatcher
+from endpoints.http_client import post_callback
+
+logger = logging.getLogger(__name__)
+
+# The outbox database, relative to the working directory of the plugin
+OUTBOX_PATH = "callback_outbox.db"
+# Seconds a callback is kept for replay, older undelivered callbacks are discarded
+MAX_CALLBACK_AGE = 24 * 3600
+# Maximum number of writes committed together
+MAX_BATCH_SIZE = 500
+# Seconds a caller waits for its callback to be committed
+COMMIT_TIMEOUT = 5.0
+# Seconds a replayed callback waits for space in the dispatcher queue
+REPLAY_SUBMIT_TIMEOUT = 60.0
+# Seconds between the removals of expired callbacks while the plugin runs
+PURGE_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS callbacks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    callback_url TEXT NOT NULL,
+    secret_token TEXT,
+    payload BLOB NOT NULL,
+    app_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class OutboxEntry(NamedTuple):
+    """
+    A callback stored in the outbox.
+    """
+    id: int
+    callback_url: str
+    secret_token: Optional[str]
+    payload: Dict[str, Any]
+    app_id: str
+
+
+class _Write:
+    __slots__ = ("sql", "params", "committed", "row_id")
+
+    def __init__(self, sql: str, params: tuple, wait: bool):
+        self.sql = sql
+        self.params = params
+        self.committed = threading.Event() if wait else None
+        self.row_id: Optional[int] = None
+
+
+class CallbackOutbox:
+    """
+    A durable outbox of callbacks in a SQLite database in WAL mode.
+
+    Callbacks are written before they are dispatched and deleted once delivered, so the
+    callbacks pending when the process stops are replayed when it starts again. All writes go
+    through a single writer thread that commits everything queued while the previous commit was
+    syncing to disk in one transaction (group commit). Under load many callbacks share one fsync,
+    while a single callback is not delayed by waiting for others.
+
+    Delivery is at least once: a callback delivered right before the process stops may be sent
+    again when its deletion was not yet committed.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, max_age: float = MAX_CALLBACK_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._writes: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def append(self, callback_url: str, secret_token: Optional[str], payload: Dict[str, Any],
+               app_id: str) -> Optional[int]:
+        """
+        Store a callback and wait until it is committed to disk.
+
+        Returns:
+            The ID of the entry, or None if the outbox is not available
+        """
+        if not self._open():
+            return None
+        write = _Write(
+            "INSERT INTO callbacks (callback_url, secret_token, payload, app_id, created_at) VALUES (?, ?, ?, ?, ?)",
+            (callback_url, secret_token, dumps(payload), app_id, time.time()), wait=True)
+        self._writes.put(write)
+        if not write.committed.wait(COMMIT_TIMEOUT) or write.row_id is None:
+            logger.error("Failed to store callback to %s in the outbox", callback_url)
+            return None
+        return write.row_id
+
+    def mark_done(self, entry_id: int) -> None:
+        """
+        Remove a delivered callback. The deletion is committed with the next batch, without waiting.
+        """
+        self._writes.put(_Write("DELETE FROM callbacks WHERE id = ?", (entry_id,), wait=False))
+
+    def pending(self) -> List[OutboxEntry]:
+        """
+        The callbacks that were not delivered yet, oldest first.
+        """
+        if not self._open():
+            return []
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, callback_url, secret_token, payload, app_id FROM callbacks "
+                "WHERE created_at >= ? ORDER BY id",
+                (time.time() - self.max_age,)).fetchall()
+        return [OutboxEntry(row[0], row[1], row[2], loads(row[3]), row[4]) for row in rows]
+
+    def close(self) -> None:
+        """
+        Commit the queued writes and close the database.
+        """
+        with self._lock:
+            writer = self._writer
+        if writer is None:
+            return
+        self._writes.put(None)
+        writer.join(timeout=COMMIT_TIMEOUT)
+        with self._lock:
+            self._connection.close()
+            self._connection = None
+            self._writer = None
+
+    def _open(self) -> bool:
+        """
+        Open the database and start the writer thread on first use.
+        """
+        with self._lock:
+            if self._connection is not None:
+                return True
+            try:
+                connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                os.chmod(self.path, 0o600)
+                connection.execute("PRAGMA journal_mode=WAL")
+                # With WAL, FULL syncs the log on every commit, which is what makes a batch durable
+                connection.execute("PRAGMA synchronous=FULL")
+                connection.execute(_SCHEMA)
+                connection.execute("DELETE FROM callbacks WHERE created_at < ?", (time.time() - self.max_age,))
+            except (OSError, sqlite3.Error) as e:
+                logger.error("Failed to open the callback outbox %s: %s", self.path, str(e))
+                return False
+            self._connection = connection
+            self._writer = threading.Thread(target=self._write_batches, name="webhook-outbox", daemon=True)
+            self._writer.start()
+            return True
+
+    def _write_batches(self) -> None:
+        stopping = False
+        purged_at = time.monotonic()
+        while not stopping:
+            batch = [self._writes.get()]
+            # Everything queued while the previous batch was committed goes into this one
+            while len(batch) < MAX_BATCH_SIZE:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            writes = [write for write in batch if write is not None]
+            if time.monotonic() - purged_at >= PURGE_INTERVAL:
+                # Callbacks that could not be delivered in time are removed with the batch
+                writes.append(_Write("DELETE FROM callbacks WHERE created_at < ?",
+                                     (time.time() - self.max_age,), wait=False))
+                purged_at = time.monotonic()
+            if writes:
+                self._commit(writes)
+
+    def _commit(self, writes: List[_Write]) -> None:
+        try:
+            with self._lock:
+                self._connection.execute("BEGIN")
+                try:
+                    for write in writes:
+                        write.row_id = self._connection.execute(write.sql, write.params).lastrowid
+                    self._connection.execute("COMMIT")
+                except sqlite3.Error:
+                    self._connection.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.error("Failed to write %d callbacks to the outbox: %s", len(writes), str(e))
+            for write in writes:
+                write.row_id = None
+        for write in writes:
+            if write.committed is not None:
+                write.committed.set()
+
+
+callback_outbox = CallbackOutbox()
+
+
+def replay_pending_callbacks(outbox: CallbackOutbox = callback_outbox) -> threading.Thread:
+    """
+    Dispatch the callbacks left in the outbox by a previous run of the plugin, in the background.
+
+    Returns:
+        The thread submitting the callbacks
+    """
+    def replay() -> None:
+        if not os.path.exists(outbox.path):
+            return
+        entries = outbox.pending()
+        if entries:
+            logger.info("Replaying %d pending callbacks", len(entries))
+        for entry in entries:
+            if not callback_dispatcher.submit(lambda entry=entry: _deliver(outbox, entry),
+                                              timeout=REPLAY_SUBMIT_TIMEOUT):
+                logger.warning("Stopped replaying callbacks, the dispatcher queue is full")
+                return
+
+    thread = threading.Thread(target=replay, name="webhook-outbox-replay", daemon=True)
+    thread.start()
+    return thread
+
+
+async def _deliver(outbox: CallbackOutbox, entry: OutboxEntry) -> None:
+    if await post_callback(entry.callback_url, entry.secret_token, entry.payload, entry.app_id):
+        outbox.mark_done(entry.id)
+
+
+def shutdown_callbacks() -> None:
+    """
+    Send the pending callbacks and close the outbox.
+
+    Pending callbacks are sent first, so their done marks are committed before the outbox closes.
+    """
+    callback_dispatcher.drain()
+    callback_outbox.close()
+
+
+atexit.register(shutdown_callbacks)
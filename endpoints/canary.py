@@ -0,0 +1,192 @@
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from endpoints.bulkhead import BulkheadFullError
+from endpoints.circuit_breaker import CircuitOpenError
+from endpoints.deadline import DeadlineExceededError
+from endpoints.latency import LatencyWindow
+from endpoints.metrics import Sample, metrics
+from endpoints.registry import KeyedRegistry
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# Minimum number of calls of each variant before the canary can be rolled back
+MIN_CANARY_CALLS = 20
+# The canary is rolled back when its p95 latency exceeds that of the stable app by this factor
+MAX_P95_RATIO = 1.5
+# The canary is rolled back when its error rate exceeds that of the stable app by this share
+MAX_ERROR_RATE_INCREASE = 0.05
+
+STABLE = "stable"
+CANARY = "canary"
+
+
+class VariantStats:
+    """
+    The latency histogram and error rate of the calls to one variant.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.buckets: List[int] = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency = LatencyWindow(min_samples=1)
+
+    def record(self, seconds: float, success: bool) -> None:
+        """
+        Record the outcome of a call, the latency only of successful ones.
+        """
+        self.calls += 1
+        if not success:
+            self.errors += 1
+            return
+        self.latency.record(seconds)
+        self.latency_sum += seconds
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[index] += 1
+
+    def error_rate(self) -> float:
+        """
+        The share of failed calls.
+        """
+        return self.errors / self.calls if self.calls else 0.0
+
+    def samples(self, labels: Dict[str, str]) -> Iterable[Sample]:
+        """
+        Report the latency histogram and the calls in the metrics format.
+        """
+        succeeded = self.calls - self.errors
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            yield "webhook_canary_latency_seconds_bucket", dict(labels, le=str(bound)), count
+        yield "webhook_canary_latency_seconds_bucket", dict(labels, le="+Inf"), succeeded
+        yield "webhook_canary_latency_seconds_sum", labels, self.latency_sum
+        yield "webhook_canary_latency_seconds_count", labels, succeeded
+        yield "webhook_canary_calls_total", labels, self.calls
+        yield "webhook_canary_errors_total", labels, self.errors
+
+
+class CanaryRelease:
+    """
+    Splits the calls to an app between the stable app and a canary app.
+
+    The configured percentage of calls goes to the canary. Once both variants had MIN_CANARY_CALLS
+    calls, the canary is rolled back to 0% when its p95 latency exceeds that of the stable app by
+    MAX_P95_RATIO or its error rate exceeds that of the stable app by MAX_ERROR_RATE_INCREASE.
+    A rolled back canary stays at 0% until the configured percentage changes, which starts a new
+    rollout with fresh statistics.
+    """
+
+    def __init__(self, app_id: str, canary_app_id: str):
+        self.app_id = app_id
+        self.canary_app_id = canary_app_id
+        self.percentage = 0
+        self.rollback_reason: Optional[str] = None
+        self.stats = {STABLE: VariantStats(), CANARY: VariantStats()}
+        self._lock = threading.Lock()
+
+    def call(self, percentage: int, fn: Callable[[str], Any]) -> Any:
+        """
+        Call the stable or the canary app and record the outcome.
+
+        Args:
+            percentage: The configured percentage of calls that go to the canary
+            fn: Calls the app with the given ID
+
+        Returns:
+            The result of fn
+        """
+        variant = self._pick(percentage)
+        started = time.monotonic()
+        try:
+            response = fn(self.canary_app_id if variant == CANARY else self.app_id)
+        except (BulkheadFullError, CircuitOpenError, DeadlineExceededError):
+            # The app was not called or the caller ran out of time, e.g. while queued, so the outcome
+            # says nothing about the app
+            raise
+        except Exception:
+            self._record(variant, 0.0, False)
+            raise
+        failed = isinstance(response, dict) and response.get("data", {}).get("status") == "failed"
+        self._record(variant, time.monotonic() - started, not failed)
+        return response
+
+    def _pick(self, percentage: int) -> str:
+        with self._lock:
+            if percentage != self.percentage:
+                logger.info("Starting canary of app_id %s for %d%% of the calls to app_id %s",
+                            self.canary_app_id, percentage, self.app_id)
+                self.percentage = percentage
+                self.rollback_reason = None
+                self.stats = {STABLE: VariantStats(), CANARY: VariantStats()}
+            if self.rollback_reason or random.random() * 100 >= percentage:
+                return STABLE
+            return CANARY
+
+    def _record(self, variant: str, seconds: float, success: bool) -> None:
+        with self._lock:
+            self.stats[variant].record(seconds, success)
+            if self.rollback_reason is None:
+                self.rollback_reason = self._regression()
+                if self.rollback_reason:
+                    logger.warning("Rolled back canary app_id %s of app_id %s: %s",
+                                   self.canary_app_id, self.app_id, self.rollback_reason)
+
+    def _regression(self) -> Optional[str]:
+        stable, canary = self.stats[STABLE], self.stats[CANARY]
+        if stable.calls < MIN_CANARY_CALLS or canary.calls < MIN_CANARY_CALLS:
+            return None
+        if canary.error_rate() > stable.error_rate() + MAX_ERROR_RATE_INCREASE:
+            return f"error rate {canary.error_rate():.1%} against {stable.error_rate():.1%}"
+        stable_p95, canary_p95 = stable.latency.percentile(95), canary.latency.percentile(95)
+        if stable_p95 is not None and canary_p95 is not None and canary_p95 > stable_p95 * MAX_P95_RATIO:
+            return f"p95 latency {canary_p95:.2f}s against {stable_p95:.2f}s"
+        return None
+
+    def samples(self) -> List[Sample]:
+        """
+        Report the split and the statistics of both variants in the metrics format.
+        """
+        labels = {"app_id": self.app_id, "canary_app_id": self.canary_app_id}
+        with self._lock:
+            samples: List[Sample] = [
+                ("webhook_canary_percentage", labels, 0 if self.rollback_reason else self.percentage),
+                ("webhook_canary_rolled_back", labels, 1 if self.rollback_reason else 0),
+            ]
+            for variant, stats in self.stats.items():
+                samples.extend(stats.samples(dict(labels, variant=variant)))
+        return samples
+
+
+class CanaryReleases(KeyedRegistry[Tuple[str, str], CanaryRelease]):
+    """
+    The canary release of each pair of app and canary app, reported to the metrics.
+    """
+
+    def __init__(self):
+        super().__init__(lambda apps: CanaryRelease(*apps))
+
+    def collect(self) -> Iterable[Sample]:
+        """
+        Report the split and the statistics of each canary release.
+        """
+        for release in self.values():
+            yield from release.samples()
+
+
+canary_releases = CanaryReleases()
+
+metrics.describe("webhook_canary_percentage", "gauge",
+                 "Percentage of calls sent to the canary app, 0 after a rollback")
+metrics.describe("webhook_canary_rolled_back", "gauge",
+                 "Whether the canary was rolled back after a regression")
+metrics.describe("webhook_canary_latency_seconds", "histogram",
+                 "Latency of successful calls per variant")
+metrics.describe("webhook_canary_calls_total", "counter", "Number of calls per variant")
+metrics.describe("webhook_canary_errors_total", "counter", "Number of failed calls per variant")
+metrics.register_collector(canary_releases.collect)
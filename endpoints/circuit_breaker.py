@@ -0,0 +1,169 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Iterable, Tuple
+from endpoints.metrics import Sample, metrics
+from endpoints.registry import KeyedRegistry
+
+logger = logging.getLogger(__name__)
+
+# Seconds of recent calls the failure rate is computed over
+WINDOW_SECONDS = 60.0
+# Minimum number of calls in the window before the circuit can open
+MIN_CALLS = 10
+# Share of failed calls in the window that opens the circuit
+FAILURE_RATE = 0.5
+# Seconds an open circuit rejects calls before a probe call is let through
+OPEN_SECONDS = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is rejected because the circuit of the app is open.
+    """
+
+    def __init__(self, app_id: str, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"App {app_id} is unavailable, retry in {retry_after} seconds")
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for the calls to one app.
+
+    While closed, the outcome of each call is recorded. When at least FAILURE_RATE of the calls
+    in the last WINDOW_SECONDS failed, the circuit opens and calls are rejected right away.
+    After OPEN_SECONDS a single probe call is let through (half-open): if it succeeds the circuit
+    closes, otherwise it opens again. Callers decide what counts as failure, e.g. slow calls.
+    """
+
+    def __init__(self, app_id: str, window: float = WINDOW_SECONDS, min_calls: int = MIN_CALLS,
+                 failure_rate: float = FAILURE_RATE, open_seconds: float = OPEN_SECONDS):
+        self.app_id = app_id
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Ask for permission to call the app.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe in flight
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.open_seconds - (now - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(self.app_id, math.ceil(remaining))
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.app_id, 1)
+                self._probing = True
+
+    def rejects_calls(self) -> bool:
+        """
+        Whether a call would be rejected right now because the circuit is open.
+        """
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.open_seconds
+
+    def cancel(self) -> None:
+        """
+        Give up a permission without an outcome, e.g. when the call was never made.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def record(self, success: bool) -> None:
+        """
+        Record the outcome of a permitted call.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                self._transition(CLOSED if success else OPEN, now)
+                return
+            if self.state == OPEN:
+                # A call that started before the circuit opened
+                return
+
+            self._outcomes.append((now, success))
+            if not success:
+                self._failures += 1
+            self._trim(now)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures >= calls * self.failure_rate:
+                logger.warning("Opening circuit for app_id %s after %d of %d calls failed",
+                               self.app_id, self._failures, calls)
+                self._transition(OPEN, now)
+
+    def failure_ratio(self) -> float:
+        """
+        The share of failed calls in the current window.
+        """
+        with self._lock:
+            self._trim(time.monotonic())
+            return self._failures / len(self._outcomes) if self._outcomes else 0.0
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, success = self._outcomes.popleft()
+            if not success:
+                self._failures -= 1
+
+    def _transition(self, state: str, now: float) -> None:
+        if state == OPEN:
+            self._opened_at = now
+        self._outcomes.clear()
+        self._failures = 0
+        logger.info("Circuit for app_id %s changed from %s to %s", self.app_id, self.state, state)
+        self.state = state
+        metrics.inc("webhook_circuit_breaker_transitions_total", app_id=self.app_id, state=state)
+
+
+class CircuitBreakers(KeyedRegistry[str, CircuitBreaker]):
+    """
+    The circuit breaker of each app, reported to the metrics.
+    """
+
+    def __init__(self):
+        super().__init__(CircuitBreaker)
+
+    def collect(self) -> Iterable[Sample]:
+        """
+        Report the state and failure ratio of each circuit.
+        """
+        for breaker in self.values():
+            labels = {"app_id": breaker.app_id}
+            yield "webhook_circuit_breaker_state", labels, _STATE_VALUES[breaker.state]
+            yield "webhook_circuit_breaker_failure_ratio", labels, breaker.failure_ratio()
+
+
+app_breakers = CircuitBreakers()
+
+metrics.describe("webhook_circuit_breaker_state", "gauge",
+                 "Circuit state per app: 0 closed, 1 half-open, 2 open")
+metrics.describe("webhook_circuit_breaker_failure_ratio", "gauge",
+                 "Share of failed calls per app in the current window")
+metrics.describe("webhook_circuit_breaker_transitions_total", "counter",
+                 "Number of circuit state changes per app and new state")
+metrics.register_collector(app_breakers.collect)
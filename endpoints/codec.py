@@ -0,0 +1,202 @@
+import json
+import logging
+from typing import Any, Iterable, Iterator, Mapping, Optional, Union
+from werkzeug import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+
+def _std_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def _std_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _std_canonical_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+
+    def _loads(data: Union[bytes, str]) -> Any:
+        # orjson.JSONDecodeError already subclasses json.JSONDecodeError
+        return orjson.loads(data)
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _msgspec_decoder = msgspec.json.Decoder()
+    _msgspec_encoder = msgspec.json.Encoder()
+
+    def _loads(data: Union[bytes, str]) -> Any:
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            doc = data if isinstance(data, str) else data.decode("utf-8", "replace")
+            raise json.JSONDecodeError(str(e), doc, 0) from e
+
+    def _dumps(obj: Any) -> bytes:
+        return _msgspec_encoder.encode(obj)
+
+    def _canonical_dumps(obj: Any) -> bytes:
+        return msgspec.json.encode(obj, order="sorted")
+
+else:
+    BACKEND = "json"
+    _loads = _std_loads
+    _dumps = _std_dumps
+    _canonical_dumps = _std_canonical_dumps
+
+logger.debug("Using %s as JSON codec", BACKEND)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode a JSON document with the fastest available backend.
+
+    Args:
+        data: The JSON document as bytes or string
+
+    Returns:
+        The decoded Python object
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON, regardless of the backend
+    """
+    return _loads(data)
+
+
+def validate(data: Union[bytes, str]) -> None:
+    """
+    Check that a document is well-formed JSON without keeping the decoded object.
+
+    The document is scanned by the native decoder of the active backend and the result is
+    discarded immediately, so callers can forward the original text unchanged.
+
+    Args:
+        data: The JSON document as bytes or string
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON
+    """
+    _loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object as compact UTF-8 JSON with the fastest available backend.
+
+    Objects the fast backend cannot encode (e.g. integers beyond 64 bit or non-string
+    dictionary keys) are encoded with the standard library instead.
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        The encoded JSON document
+    """
+    try:
+        return _dumps(obj)
+    except TypeError:
+        if BACKEND == "json":
+            raise
+        return _std_dumps(obj)
+
+
+def canonical_dumps(obj: Any) -> bytes:
+    """
+    Encode an object as JSON with sorted keys, so equal objects always produce equal bytes.
+
+    Args:
+        obj: The object to encode
+
+    Returns:
+        The canonical JSON document
+    """
+    try:
+        return _canonical_dumps(obj)
+    except TypeError:
+        if BACKEND == "json":
+            raise
+        return _std_canonical_dumps(obj)
+
+
+def json_response(payload: Any, status: int = 200, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Build a JSON response, encoding the payload through the codec.
+
+    Args:
+        payload: The object to send as response body
+        status: The HTTP status code
+        headers: Optional additional response headers
+
+    Returns:
+        A Werkzeug response with an application/json body
+    """
+    return Response(dumps(payload), status=status, headers=headers, content_type="application/json")
+
+
+def _encode_events(events: Iterable[Any]) -> Iterator[bytes]:
+    try:
+        for event in events:
+            yield b"data: " + dumps(event) + b"\n\n"
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Error while streaming response: %s", str(e))
+        yield b"event: error\ndata: " + dumps({"error": str(e)}) + b"\n\n"
+
+
+def sse_response(events: Iterable[Any]) -> Response:
+    """
+    Build a streaming response that relays each event as a Server-Sent Event.
+
+    Events are encoded through the codec as they arrive. An error raised while iterating
+    the events is sent as a final `error` event, since the status code is already sent.
+
+    Args:
+        events: The events to send, typically the chunks of a streaming Dify invocation
+
+    Returns:
+        A Werkzeug response with a text/event-stream body
+    """
+    return Response(
+        _encode_events(events),
+        status=200,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        content_type="text/event-stream",
+    )
+
+
+def ndjson_response(records: Iterable[Any]) -> Response:
+    """
+    Build a streaming response that sends each record as one line of newline-delimited JSON.
+
+    Args:
+        records: The records to send, encoded through the codec as they arrive
+
+    Returns:
+        A Werkzeug response with an application/x-ndjson body
+    """
+    return Response(
+        (dumps(record) + b"\n" for record in records),
+        status=200,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        content_type="application/x-ndjson",
+    )
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised when the time budget of a request ran out.
+    """
+
+    def __init__(self):
+        super().__init__("Deadline exceeded")
+
+
+def spawn(fn: Callable[[], Any], name: str) -> Future:
+    """
+    Run a function on a thread of its own.
+
+    Unlike a pool, this never queues the function behind other work, so waiting callers only
+    depend on the limits that apply to the function itself.
+
+    Args:
+        fn: The function to run
+        name: The name of the thread
+
+    Returns:
+        The future of the result of fn
+    """
+    future: Future = Future()
+
+    def run() -> None:
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    The seconds left until a deadline.
+
+    Args:
+        deadline: The deadline as time.monotonic() value, or None for no deadline
+
+    Returns:
+        The seconds left, or None if there is no deadline
+
+    Raises:
+        DeadlineExceededError: If the deadline has passed
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError()
+    return remaining
+
+
+def run_with_deadline(fn: Callable[[], Any], deadline: Optional[float]) -> Any:
+    """
+    Run a function and give up waiting for it when the deadline passes.
+
+    The function runs on a thread of its own, so the caller can return as soon as the deadline
+    passes. No pool sits in front of it: concurrency and queueing are left to the bulkhead, which
+    orders waiting invocations by priority lane and stops queueing them at their deadline. A
+    function that runs at the deadline cannot be interrupted and finishes in the background, with
+    its result discarded.
+
+    Args:
+        fn: The function to run
+        deadline: The deadline as time.monotonic() value, or None to run fn directly
+
+    Returns:
+        The result of fn
+
+    Raises:
+        DeadlineExceededError: If the deadline passed before fn finished
+    """
+    remaining = time_left(deadline)
+    if remaining is None:
+        return fn()
+
+    future = spawn(fn, "webhook-deadline")
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeoutError:
+        logger.warning("Deadline exceeded, the invocation continues in the background")
+        raise DeadlineExceededError() from None
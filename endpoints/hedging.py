@@ -0,0 +1,77 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, Optional, Sequence
+from endpoints.deadline import spawn
+from endpoints.metrics import metrics
+from endpoints.registry import KeyedRegistry
+from endpoints.retry import RetryBudget
+
+logger = logging.getLogger(__name__)
+
+# Hedges earned by each call, so at most this share of calls starts a second invocation
+HEDGE_RATIO = 0.1
+
+
+def hedged_call(app_id: str, calls: Sequence[Callable[[], Any]], delay: Optional[float],
+                budget: RetryBudget) -> Any:
+    """
+    Call the first function and start the next one each time the delay passes without a result.
+
+    Each call runs on a thread of its own, so it is only limited by the concurrency limits it
+    acquires itself. The first successful result is returned. The calls still running cannot be
+    interrupted, they finish in the background and their results are discarded. A failed call
+    does not start the next one, the error is raised once no call is left running.
+
+    Args:
+        app_id: The ID of the primary app, used as metrics label
+        calls: The function calling the primary app, followed by those calling its replicas
+        delay: Seconds to wait for a result before the next call is started, or None to not hedge
+        budget: The budget limiting the share of calls that are hedged
+
+    Returns:
+        The result of the first call that succeeded
+
+    Raises:
+        Exception: The error of the last failed call if all calls failed
+    """
+    budget.deposit()
+    if delay is None or len(calls) < 2:
+        return calls[0]()
+
+    started: Dict[Future, int] = {spawn(calls[0], "webhook-hedge"): 0}
+    pending = set(started)
+    hedging = True
+    error: Optional[BaseException] = None
+    while True:
+        can_hedge = hedging and len(started) < len(calls)
+        done, pending = wait(pending, timeout=delay if can_hedge else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                error = e
+                continue
+            if started[future] > 0:
+                metrics.inc("webhook_hedge_wins_total", app_id=app_id)
+            return result
+        if not pending:
+            raise error
+        if can_hedge and not done:
+            if not budget.withdraw():
+                logger.info("Not hedging invocation of app_id %s, the hedge budget is exhausted", app_id)
+                hedging = False
+                continue
+            logger.info("Hedging invocation of app_id %s after %.2fs", app_id, delay)
+            metrics.inc("webhook_hedged_requests_total", app_id=app_id)
+            future = spawn(calls[len(started)], "webhook-hedge")
+            started[future] = len(started)
+            pending.add(future)
+
+
+# The hedge budget of each app
+hedge_budgets: KeyedRegistry[str, RetryBudget] = KeyedRegistry(lambda app_id: RetryBudget(HEDGE_RATIO))
+
+metrics.describe("webhook_hedged_requests_total", "counter",
+                 "Number of invocations started on a replica because the primary app was slow")
+metrics.describe("webhook_hedge_wins_total", "counter",
+                 "Number of hedged requests answered by a replica before the primary app")
@@ -1,15 +1,48 @@
+import hashlib
 import json
-from typing import Literal, Mapping, Optional
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Literal, Mapping, Optional, Tuple
 from werkzeug import Request, Response
 from middlewares.discord_middleware import DiscordMiddleware
 from middlewares.default_middleware import DefaultMiddleware
+from endpoints.request_context import RequestContext
+from endpoints.codec import canonical_dumps, json_response
+from endpoints.rate_limit import parse_rate, rate_limiter
+from endpoints.bulkhead import LANE_WEIGHTS
 
-def apply_middleware(r: Request, settings: Mapping) -> Optional[Response]:
+logger = logging.getLogger(__name__)
+
+# Upper bound for the time budget of a request in seconds, the plugin aborts requests after it
+MAX_REQUEST_TIMEOUT = 120
+# Default for the max_body_size setting, in bytes
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+# Default for the batch_concurrency setting
+DEFAULT_BATCH_CONCURRENCY = 4
+# Maximum number of items accepted by the batch routes
+MAX_BATCH_SIZE = 1000
+# Default for the concurrency_queue_size setting
+DEFAULT_CONCURRENCY_QUEUE_SIZE = 10
+# Default for the idempotency_ttl setting, in seconds
+DEFAULT_IDEMPOTENCY_TTL = 3600
+# Headers identifying a request or webhook delivery, in order of precedence. Senders keep
+# the value when they redeliver, so it is used as idempotency key.
+IDEMPOTENCY_HEADERS = (
+    "Idempotency-Key",
+    "X-GitHub-Delivery",
+    "X-Gitlab-Event-UUID",
+    "X-Shopify-Webhook-Id",
+    "Webhook-Id",
+    "Svix-Id",
+)
+
+def apply_middleware(r: Request, settings: Mapping, context: RequestContext) -> Optional[Response]:
     """
     Applies middleware based on the settings provided.
 
     :param r: The request object
     :param settings: A dictionary containing configuration settings
+    :param context: The parsed request shared by all middlewares and the endpoint
     :return: A Response object if middleware processing returns a response, otherwise None
     """
     try:
@@ -18,19 +51,19 @@ def apply_middleware(r: Request, settings: Mapping) -> Optional[Response]:
 
         if middleware_type == "discord":
             middleware = DiscordMiddleware(signature_verification_key)
-            response = middleware.invoke(r)
+            response = middleware.invoke(r, context)
             if response:
                 return response
     except (json.JSONDecodeError, KeyError, TypeError) as e:
         print(f"Middleware Error: {str(e)}")
-        return Response(json.dumps({"error": f"Middleware error: {str(e)}"}), status=500, content_type="application/json")
+        return json_response({"error": f"Middleware error: {str(e)}"}, status=500)
 
     try:
         default_middleware = DefaultMiddleware()
-        default_middleware.invoke(r, settings)
+        default_middleware.invoke(r, settings, context)
     except (json.JSONDecodeError, KeyError, TypeError) as e:
         print(f"Default Middleware Error: {str(e)}")
-        return Response(json.dumps({"error": f"Default Middleware error: {str(e)}"}), status=500, content_type="application/json")
+        return json_response({"error": f"Default Middleware error: {str(e)}"}, status=500)
 
     return None
 
@@ -46,24 +79,294 @@ def validate_api_key(r: Request, settings: Mapping) -> Optional[Response]:
     expected_api_key = settings.get("api_key")
 
     if api_key_location != 'none' and not expected_api_key:
-        return Response(json.dumps({"error": "Expected API key is not configured."}),
-                        status=500, content_type="application/json")
+        return json_response({"error": "Expected API key is not configured."}, status=500)
 
     if api_key_location == "api_key_header":
         request_api_key = r.headers.get("x-api-key")
         if request_api_key != expected_api_key:
-            return Response(json.dumps({"error": "Invalid API key"}),
-                            status=403, content_type="application/json")
+            return json_response({"error": "Invalid API key"}, status=403)
     
     elif api_key_location == "token_query_param":
         request_api_key = r.args.get("difyToken")
         if request_api_key != expected_api_key:
-            return Response(json.dumps({"error": "Invalid API key"}),
-                            status=403, content_type="application/json")
+            return json_response({"error": "Invalid API key"}, status=403)
+
+    return None
+
+def check_rate_limits(r: Request, values: Mapping, settings: Mapping) -> Optional[Response]:
+    """
+    Applies the rate limits configured for the API key, the app and the client address.
+
+    The limits are checked before the request body is read, so rejected requests cost no
+    middleware or Dify work.
+
+    :param r: The request object
+    :param values: The path values of the request
+    :param settings: A dictionary containing configuration settings
+    :return: A 429 Response if a limit is exceeded, otherwise None
+    """
+    limits = []
+    if settings.get("rate_limit_api_key"):
+        api_key = r.headers.get("x-api-key") or r.args.get("difyToken") or ""
+        # Only a digest of the key is kept in memory
+        limits.append(("rate_limit_api_key", "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]))
+    if settings.get("rate_limit_app"):
+        app_id = values.get("app_id") or settings.get("static_app_id")
+        if isinstance(app_id, dict):
+            app_id = app_id.get("app_id")
+        limits.append(("rate_limit_app", f"app:{app_id}"))
+    if settings.get("rate_limit_ip"):
+        # Requests reach the plugin through a proxy. Callers can send their own X-Forwarded-For entries,
+        # so only the last one, added by the proxy in front of the plugin, is trusted.
+        client = r.access_route[-1] if r.access_route else r.remote_addr
+        limits.append(("rate_limit_ip", f"ip:{client}"))
+
+    for setting, key in limits:
+        try:
+            rate, burst = parse_rate(settings[setting])
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=500)
+        retry_after = rate_limiter.acquire(key, rate, burst)
+        if retry_after:
+            logger.warning("Rate limit %s exceeded for %s", setting, key)
+            return json_response({"error": "Rate limit exceeded"}, status=429,
+                                 headers={"Retry-After": str(math.ceil(retry_after))})
+
+    return None
+
+def get_int_setting(settings: Mapping, name: str, default: int) -> int:
+    """
+    Reads an integer from a text-input setting.
+
+    Args:
+        settings: A dictionary containing configuration settings
+        name: The name of the setting
+        default: The value used when the setting is empty or not a valid integer
+
+    Returns:
+        The configured integer, or the default
+    """
+    value = settings.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        logger.warning("Invalid value for setting %s: %r, using default %d", name, value, default)
+        return default
+
+def get_list_setting(settings: Mapping, name: str) -> List[str]:
+    """
+    Reads a comma or newline separated list from a text-input setting.
+
+    Args:
+        settings: A dictionary containing configuration settings
+        name: The name of the setting
+
+    Returns:
+        The non-empty list entries with surrounding whitespace removed
+    """
+    value = settings.get(name) or ""
+    return [entry.strip() for entry in value.replace("\n", ",").split(",") if entry.strip()]
+
+def get_app_pool(settings: Mapping, app_id: str) -> List[Tuple[str, int]]:
+    """
+    Finds the group of an app in the `replica_app_ids` setting. Groups of apps that are copies
+    of each other are separated by semicolons or newlines, the app IDs of a group by commas.
+    An app ID can be followed by a colon and its weight for load balancing, e.g. `app-id:3`.
+
+    Args:
+        settings: A dictionary containing configuration settings
+        app_id: The ID of the app
+
+    Returns:
+        The app IDs of the group with their weights, or just the app with weight 1 if it is in no group
+    """
+    value = settings.get("replica_app_ids") or ""
+    for group in value.replace("\n", ";").split(";"):
+        pool = []
+        for entry in group.split(","):
+            pool_app_id, _, weight = entry.partition(":")
+            if pool_app_id.strip():
+                try:
+                    pool.append((pool_app_id.strip(), max(1, int(weight)) if weight.strip() else 1))
+                except ValueError:
+                    logger.warning("Invalid weight for app_id %s: %s", pool_app_id.strip(), weight)
+                    pool.append((pool_app_id.strip(), 1))
+        if any(pool_app_id == app_id for pool_app_id, _ in pool):
+            return pool
+    return [(app_id, 1)]
+
+def get_replica_app_ids(settings: Mapping, app_id: str) -> List[str]:
+    """
+    Finds the replicas of an app in the `replica_app_ids` setting.
+
+    Args:
+        settings: A dictionary containing configuration settings
+        app_id: The ID of the app
+
+    Returns:
+        The IDs of the other apps in the group of the app, empty if it is in no group
+    """
+    return [replica for replica, _ in get_app_pool(settings, app_id) if replica != app_id]
+
+def _without_fields(inputs: Mapping[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """
+    Copies inputs without the given dotted paths, copying only the objects along each path.
+    """
+    result = dict(inputs)
+    nested: Dict[str, List[str]] = {}
+    for field in fields:
+        head, _, rest = field.partition(".")
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        else:
+            result.pop(head, None)
+    for head, rest in nested.items():
+        if isinstance(result.get(head), Mapping):
+            result[head] = _without_fields(result[head], rest)
+    return result
 
+def invocation_key(app_id: str, inputs: Mapping[str, Any], exclude: Iterable[str] = ()) -> str:
+    """
+    Builds a key that is equal for invocations of the same app with equal inputs.
+
+    :param app_id: The ID of the invoked app
+    :param inputs: The inputs of the invocation
+    :param exclude: Dotted paths of volatile input fields that are ignored, e.g. `timestamp`
+    :return: A hex digest over the app ID and the canonical JSON encoding of the inputs
+    """
+    if exclude:
+        inputs = _without_fields(inputs, exclude)
+    digest = hashlib.sha256(app_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(canonical_dumps(inputs))
+    return digest.hexdigest()
+
+def get_idempotency_key(r: Request) -> Optional[str]:
+    """
+    Reads the idempotency key of a request from an `Idempotency-Key` header or a delivery ID
+    header of a known webhook provider.
+
+    :param r: The request object
+    :return: The idempotency key, or None if the request has none
+    """
+    for header in IDEMPOTENCY_HEADERS:
+        value = r.headers.get(header)
+        if value:
+            return value
     return None
 
-EndpointRoute = Literal["/workflow/<app_id>", "/chatflow/<app_id>", "/single-workflow", "/single-chatflow"]
+def get_priority_lane(r: Request, route: str, settings: Mapping) -> str:
+    """
+    Determines the priority lane the Dify invocations of a request are queued in.
+
+    The lane comes from the `priority_lane` setting. Batch routes always use the bulk lane, and
+    callers can lower the priority further with an `X-Priority` header, but never raise it.
+
+    :param r: The request object
+    :param route: The endpoint route of the request
+    :param settings: A dictionary containing configuration settings
+    :return: One of the lanes, from highest to lowest priority "interactive", "default" or "bulk"
+    """
+    lanes = list(LANE_WEIGHTS)
+    lane = settings.get("priority_lane") or "default"
+    if lane not in lanes:
+        lane = "default"
+    if route in ("/workflow/<app_id>/batch", "/single-workflow/batch"):
+        lane = "bulk"
+    requested = r.headers.get("X-Priority", "").strip().lower()
+    if requested in lanes and lanes.index(requested) > lanes.index(lane):
+        lane = requested
+    return lane
+
+def get_deadline(r: Request, settings: Mapping, received_at: float) -> Optional[float]:
+    """
+    Determines until when the caller waits for the response.
+
+    The time budget comes from the `request_timeout` setting and the `X-Request-Timeout`
+    header in seconds, whichever is shorter, and never exceeds MAX_REQUEST_TIMEOUT.
+
+    :param r: The request object
+    :param settings: A dictionary containing configuration settings
+    :param received_at: The time.monotonic() value when the request was received
+    :return: The deadline as time.monotonic() value, or None if no time budget is set
+    """
+    budgets = []
+    configured = get_int_setting(settings, "request_timeout", 0)
+    if configured > 0:
+        budgets.append(configured)
+    requested = r.headers.get("X-Request-Timeout")
+    if requested:
+        try:
+            budgets.append(float(requested))
+        except ValueError:
+            logger.warning("Ignoring invalid X-Request-Timeout header: %r", requested)
+    budgets = [budget for budget in budgets if budget > 0]
+    if not budgets:
+        return None
+    return received_at + min(min(budgets), MAX_REQUEST_TIMEOUT)
+
+def wants_streaming(r: Request, settings: Mapping) -> bool:
+    """
+    Determines whether the Dify output should be streamed to the caller as Server-Sent Events.
+
+    The `response_mode` query param takes precedence, followed by an `Accept: text/event-stream`
+    header and finally the `response_mode` setting.
+
+    :param r: The request object
+    :param settings: A dictionary containing configuration settings
+    :return: True if the response should be streamed
+    """
+    requested_mode = r.args.get("response_mode")
+    if requested_mode in ("streaming", "blocking"):
+        return requested_mode == "streaming"
+    if "text/event-stream" in r.headers.get("Accept", ""):
+        return True
+    return settings.get("response_mode", "blocking") == "streaming"
+
+def wants_ndjson(r: Request, settings: Mapping) -> bool:
+    """
+    Determines whether batch results should be streamed as newline-delimited JSON.
+
+    :param r: The request object
+    :param settings: A dictionary containing configuration settings
+    :return: True if the caller accepts `application/x-ndjson` or streaming is requested
+    """
+    accept = r.headers.get("Accept", "")
+    if "application/x-ndjson" in accept or "application/ndjson" in accept:
+        return True
+    return wants_streaming(r, settings)
+
+def wants_async(r: Request, settings: Mapping) -> bool:
+    """
+    Determines whether a workflow should run as background job that is polled for its result.
+
+    :param r: The request object
+    :param settings: A dictionary containing configuration settings
+    :return: True if the request asks for async processing with `Prefer: respond-async`
+             or async mode is enabled in the settings
+    """
+    if "respond-async" in r.headers.get("Prefer", ""):
+        return True
+    return bool(settings.get("async_mode", False))
+
+def get_job_scope(settings: Mapping, endpoint_id: Optional[str]) -> str:
+    """
+    Builds the scope background jobs are visible in, so a job can only be polled through the
+    endpoint and with the API key that created it.
+
+    :param settings: A dictionary containing configuration settings
+    :param endpoint_id: The ID of the endpoint the request was sent to
+    :return: A hex digest over the endpoint ID and the configured API key
+    """
+    digest = hashlib.sha256(str(endpoint_id or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(settings.get("api_key") or "").encode("utf-8"))
+    return digest.hexdigest()
+
+EndpointRoute = Literal["/workflow/<app_id>", "/chatflow/<app_id>", "/single-workflow", "/single-chatflow",
+                        "/workflow/<app_id>/batch", "/single-workflow/batch"]
 
 def determine_route(path: str) -> Optional[EndpointRoute]:
     """
@@ -75,6 +378,12 @@ def determine_route(path: str) -> Optional[EndpointRoute]:
     Returns:
         The endpoint route as a string, or None if the path doesn't match
     """
+    if path.endswith("/batch"):
+        if path.startswith("/workflow"):
+            return "/workflow/<app_id>/batch"
+        elif path.startswith("/single-workflow"):
+            return "/single-workflow/batch"
+        return None
     if path.startswith("/workflow"):
         return "/workflow/<app_id>"
     elif path.startswith("/chatflow"):
@@ -0,0 +1,148 @@
+import asyncio
+import importlib.util
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Seconds a callback request may take
+CALLBACK_TIMEOUT = 30.0
+# Seconds to wait for a connection to a callback URL
+CALLBACK_CONNECT_TIMEOUT = 5.0
+# Maximum number of open connections of the callback client, further requests wait for one
+MAX_CONNECTIONS = 100
+# Maximum number of idle connections kept open for reuse
+MAX_KEEPALIVE_CONNECTIONS = 20
+# Seconds an idle connection is kept open
+KEEPALIVE_EXPIRY = 30.0
+# HTTP/2 is used when the optional h2 package is installed (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Number of attempts to deliver a callback, with exponential backoff in between
+CALLBACK_ATTEMPTS = 3
+# Seconds before the first retry of a callback, doubled for each further retry
+CALLBACK_RETRY_DELAY = 1
+
+
+class CallbackClients:
+    """
+    Long-lived pooled HTTP clients for callback requests, one per event loop.
+
+    Connections are kept alive and reused by all callbacks, so repeated callbacks to the same
+    host skip the TCP and TLS handshakes as well as the DNS lookup. An httpx.AsyncClient can only
+    be used on the event loop it was created on, so a client is created for each running loop
+    and dropped with the loop.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = KEEPALIVE_EXPIRY, timeout: float = CALLBACK_TIMEOUT,
+                 connect_timeout: float = CALLBACK_CONNECT_TIMEOUT, http2: bool = HTTP2_AVAILABLE):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections,
+                                   keepalive_expiry=keepalive_expiry)
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self) -> httpx.AsyncClient:
+        """
+        The client of the running event loop, created on first use.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+                self._clients[loop] = client
+                logger.debug("Created callback client (http2: %s)", self.http2)
+            return client
+
+    async def aclose(self) -> None:
+        """
+        Close the client of the running event loop and its connections.
+        """
+        with self._lock:
+            client: Optional[httpx.AsyncClient] = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+callback_clients = CallbackClients()
+
+
+def callback_payload(workflow_response: Dict[str, Any], app_id: str) -> Dict[str, Any]:
+    """
+    The body of the callback reporting a workflow result.
+
+    Args:
+        workflow_response: The workflow response data to send
+        app_id: The app ID that generated this response
+    """
+    return {
+        "app_id": app_id,
+        "timestamp": workflow_response.get("created_at"),
+        "workflow_run_id": workflow_response.get("workflow_run_id"),
+        "data": workflow_response
+    }
+
+
+async def post_callback(callback_url: str, secret_token: Optional[str], payload: Dict[str, Any],
+                        app_id: str) -> bool:
+    """
+    Sends a callback HTTP request, retrying failed attempts with exponential backoff.
+
+    Args:
+        callback_url: The URL to send the callback to
+        secret_token: Optional secret token for authentication
+        payload: The callback body
+        app_id: The app ID that generated the payload
+
+    Returns:
+        True if the callback was delivered
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "Dify-Webhook-Plugin/1.0"
+    }
+
+    if secret_token:
+        headers["Authorization"] = f"Bearer {secret_token}"
+
+    # All callbacks share the pooled client, so retries and later callbacks reuse connections
+    client = callback_clients.get()
+    for attempt in range(CALLBACK_ATTEMPTS):
+        try:
+            response = await client.post(
+                callback_url,
+                json=payload,
+                headers=headers
+            )
+
+            if response.status_code in [200, 201, 202, 204]:
+                logger.info(
+                    "Callback sent successfully to %s (status: %d) for app_id: %s",
+                    callback_url, response.status_code, app_id
+                )
+                return True
+            logger.warning(
+                "Callback failed with status %d: %s for app_id: %s",
+                response.status_code, response.text, app_id
+            )
+
+        except httpx.TimeoutException:
+            logger.error("Callback timeout (attempt %d/%d) to %s for app_id: %s",
+                         attempt + 1, CALLBACK_ATTEMPTS, callback_url, app_id)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Callback error (attempt %d/%d) to %s for app_id: %s: %s",
+                         attempt + 1, CALLBACK_ATTEMPTS, callback_url, app_id, str(e))
+
+        if attempt < CALLBACK_ATTEMPTS - 1:
+            await asyncio.sleep(CALLBACK_RETRY_DELAY * (2 ** attempt))  # Exponential backoff
+
+    logger.error("All callback attempts failed for %s, app_id: %s", callback_url, app_id)
+    return False
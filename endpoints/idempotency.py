@@ -0,0 +1,101 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from werkzeug import Response
+from endpoints.codec import json_response
+from endpoints.response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the size of all stored response bodies, in bytes
+MAX_IDEMPOTENCY_BYTES = 16 * 1024 * 1024
+# Upper bound for the number of stored responses
+MAX_IDEMPOTENCY_ENTRIES = 10000
+
+
+class _StoredResponse:
+    """
+    The parts of a completed response that are needed to send it again.
+    """
+
+    __slots__ = ("status", "headers", "body", "fingerprint")
+
+    def __init__(self, response: Response, fingerprint: Optional[str]):
+        self.fingerprint = fingerprint
+        self.status = response.status_code
+        self.headers: List[Tuple[str, str]] = list(response.headers.items())
+        self.body = response.get_data()
+
+    def replay(self) -> Response:
+        response = Response(self.body, status=self.status, headers=self.headers)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+class IdempotencyStore:
+    """
+    Runs a request handler at most once per idempotency key.
+
+    While the first request for a key is in flight, duplicates wait for it. Completed responses
+    are stored for a TTL and sent again to later duplicates. Streamed responses, rejections with
+    429 and server errors are not stored, so a redelivery after a failure runs the handler again.
+    A request that reuses a key with a different fingerprint, e.g. another body, is rejected with 422.
+    """
+
+    def __init__(self, max_bytes: int = MAX_IDEMPOTENCY_BYTES, max_entries: int = MAX_IDEMPOTENCY_ENTRIES):
+        self._completed = ResponseCache(max_bytes=max_bytes, max_entries=max_entries)
+        self._in_flight: Dict[str, Tuple[threading.Event, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, handler: Callable[[], Response], ttl: float,
+            fingerprint: Optional[str] = None) -> Response:
+        """
+        Run the handler, unless a request with the same key is in flight or completed.
+
+        Args:
+            key: The idempotency key, scoped to the endpoint
+            handler: The function handling the request
+            ttl: Seconds a completed response is stored
+            fingerprint: Identifies the payload of the request, e.g. the hash of its body
+
+        Returns:
+            The response of the handler, the stored response of the original request, or 422 if the
+            original request had a different fingerprint
+        """
+        while True:
+            with self._lock:
+                stored = self._completed.get(key)
+                if stored is not None:
+                    if stored.fingerprint != fingerprint:
+                        return self._mismatch(key)
+                    logger.info("Replaying stored response for idempotency key %s", key)
+                    return stored.replay()
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    done = threading.Event()
+                    self._in_flight[key] = (done, fingerprint)
+                    break
+                if in_flight[1] != fingerprint:
+                    return self._mismatch(key)
+            logger.info("Waiting for request in flight with idempotency key %s", key)
+            in_flight[0].wait()
+
+        try:
+            response = handler()
+            if not response.is_streamed and response.status_code < 500 and response.status_code != 429:
+                stored = _StoredResponse(response, fingerprint)
+                self._completed.set(key, stored, ttl, len(stored.body))
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+
+    @staticmethod
+    def _mismatch(key: str) -> Response:
+        logger.warning("Rejected reuse of idempotency key %s with a different request", key)
+        return json_response({"error": "The idempotency key was already used for a different request"},
+                             status=422)
+
+
+idempotency_store = IdempotencyStore()
@@ -1,11 +1,37 @@
+import copy
 import json
 import logging
-import asyncio
-from typing import Mapping, Dict, Any, Optional
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Generator, Iterator, List, Mapping, Dict, Any, Optional
 from werkzeug import Request, Response
 from dify_plugin import Endpoint
-from endpoints.helpers import apply_middleware, validate_api_key, determine_route
-import httpx
+from endpoints.helpers import (
+    DEFAULT_BATCH_CONCURRENCY, DEFAULT_CONCURRENCY_QUEUE_SIZE, DEFAULT_IDEMPOTENCY_TTL, DEFAULT_MAX_BODY_SIZE,
+    MAX_BATCH_SIZE, apply_middleware, check_rate_limits, validate_api_key, determine_route,
+    get_deadline, get_idempotency_key, get_int_setting, get_job_scope, get_list_setting, get_priority_lane,
+    get_app_pool, get_replica_app_ids, invocation_key, wants_async, wants_ndjson, wants_streaming)
+from endpoints.request_context import PayloadTooLargeError, RequestContext, hold_response
+from endpoints.codec import dumps, json_response, ndjson_response, sse_response
+from endpoints.projection import compile_projection
+from endpoints.jobs import job_store
+from endpoints.single_flight import workflow_flights
+from endpoints.response_cache import workflow_cache
+from endpoints.idempotency import idempotency_store
+from endpoints.bulkhead import MAX_QUEUE_WAIT, BulkheadFullError, app_bulkhead
+from endpoints.deadline import DeadlineExceededError, run_with_deadline, time_left
+from endpoints.circuit_breaker import CircuitOpenError, app_breakers
+from endpoints.retry import InvalidResponseError, call_with_retries, is_retryable, retry_budgets
+from endpoints.latency import app_latencies
+from endpoints.hedging import hedge_budgets, hedged_call
+from endpoints.load_balancer import LEAST_OUTSTANDING, ROUND_ROBIN, app_balancer
+from endpoints.shadow import DEFAULT_SHADOW_PERCENTAGE, shadow_traffic
+from endpoints.canary import canary_releases
+from endpoints.app_scope import endpoint_apps
+from endpoints.http_client import callback_payload, post_callback
+from endpoints.callback_dispatcher import callback_dispatcher
+from endpoints.callback_outbox import callback_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +42,7 @@ class WebhookEndpoint(Endpoint):
     This endpoint routes requests to the appropriate Dify API based on the path:
     - Paths starting with /workflow/ will invoke Dify workflows
     - Paths starting with /chatflow/ will invoke Dify chatflows
+    - Paths ending with /batch will invoke a Dify workflow once for each item of an inputs array
 
     For chatflow requests, the following parameters are required:
     - `app_id` (required): The ID of the chatflow to trigger
@@ -27,9 +54,50 @@ class WebhookEndpoint(Endpoint):
     - `app_id` (required): The ID of the workflow to trigger
     - `inputs` (optional): An object containing inputs needed for the workflow
 
+    For batch workflow requests, `inputs` is an array of input objects. The results are returned
+    in the same order, with an `error` instead of a `result` for each item that failed. When the
+    caller accepts `application/x-ndjson` or requests streaming, each result is instead sent as one
+    line of newline-delimited JSON as soon as it completes, with its `index` to restore the order.
+
     The endpoint behavior can be configured with:
     - `explicit_inputs`: When true, inputs should be in req.body.inputs. When false, req.body is used.
+    - `input_projection`: When explicit_inputs is false, only the listed fields of req.body are used.
     - `raw_data_output`: When true, workflow responses will only return the data.outputs
+    - `response_mode`: When set to streaming, Dify output is relayed as Server-Sent Events. Callers can
+      also request streaming with `?response_mode=streaming` or an `Accept: text/event-stream` header.
+      Streamed responses are relayed unchanged, so raw_data_output and callbacks do not apply to them.
+    - `coalesce_requests`: When true, identical concurrent workflow invocations share a single Dify run.
+    - `cache_ttl`: When above 0, successful workflow responses are cached for that many seconds and
+      repeated invocations with equal inputs are answered with `X-Cache: HIT`. Input fields listed in
+      `cache_exclude_fields` are ignored when comparing inputs.
+    - `idempotency_ttl`: Requests with an `Idempotency-Key` header or a provider delivery ID such as
+      `X-GitHub-Delivery` run only once. Duplicates wait for the first request and receive its
+      response for that many seconds. Set to 0 to disable this.
+    - `app_concurrency_limit`, `total_concurrency_limit`: The maximum number of blocking Dify invocations
+      in flight for each app and for the whole plugin. Up to `concurrency_queue_size` further
+      invocations wait briefly for a slot, others are rejected with 429 or 503 and `Retry-After`.
+    - `rate_limit_api_key`, `rate_limit_app`, `rate_limit_ip`: Token bucket rate limits such as `10/s` or
+      `600/hour, 20` for each API key, app and client address. Requests over a limit get 429 right away.
+    - `priority_lane`: The lane (interactive, default or bulk) requests wait in when a concurrency limit is
+      reached. Batch routes always use the bulk lane and an `X-Priority` header can lower the lane.
+    - `request_timeout`: The time budget of a request in seconds. Callers can shorten it with an
+      `X-Request-Timeout` header. When it runs out, 504 is returned and queued Dify invocations are dropped.
+    - `circuit_breaker`: When true, an app whose calls keep failing, or take longer than
+      `slow_call_seconds`, is not called for a while and requests are rejected with 503 and `Retry-After`.
+    - `max_retries`: The number of times a blocking Dify invocation is retried after a transient error.
+    - `replica_app_ids`, `hedge_percentile`: Groups of apps that are copies of each other. When a workflow
+      run takes longer than the given latency percentile of its app, the same run is started on a
+      replica and the first result is returned.
+    - `load_balancing`: When set to round_robin or least_outstanding, blocking workflow runs are spread
+      across the group of the app in `replica_app_ids`, optionally weighted with `app-id:weight`.
+    - `shadow_app_id`, `shadow_percentage`: A share of the workflow runs is also sent to a candidate app in
+      the background. The latency and output size of both apps are compared at `/shadow-report`.
+    - `canary_app_id`, `canary_percentage`: That percentage of the workflow runs is sent to a canary app.
+      The split is set back to 0% when the p95 latency or error rate of the canary regresses.
+    - `durable_callbacks`: When true, callbacks are stored in a local outbox until they are delivered and
+      the callbacks left by a restart are sent again when the plugin starts.
+    - `async_mode`: When true, workflow requests return 202 with a job ID right away and the result is
+      polled from `/jobs/<job_id>`. Callers can also request this with a `Prefer: respond-async` header.
     """
 
     def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
@@ -37,18 +105,34 @@ class WebhookEndpoint(Endpoint):
         Invokes the endpoint with the given request for either chatflow or workflow.
         """
         logger.info("Received request to unified endpoint")
+        received_at = time.monotonic()
 
         # Determine the endpoint mode
         route = determine_route(r.path)
         if not route:
             logger.error("Invalid path: %s", r.path)
-            return Response(json.dumps({"error": "Invalid path. Use /workflow/ or /chatflow/"}),
-                            status=404, content_type="application/json")
+            return json_response({"error": "Invalid path. Use /workflow/ or /chatflow/"}, status=404)
 
         logger.info("Request mode: %s", route)
 
+        # Apply rate limits before any other work happens
+        rate_limit_response = check_rate_limits(r, values, settings)
+        if rate_limit_response:
+            return rate_limit_response
+
+        # Read the request body once and share it with middlewares and the endpoint.
+        # Oversized bodies are rejected before any middleware or JSON work happens.
+        max_body_size = get_int_setting(settings, "max_body_size", DEFAULT_MAX_BODY_SIZE)
+        try:
+            context = RequestContext.from_request(r, max_body_size if max_body_size > 0 else None)
+        except PayloadTooLargeError as e:
+            logger.warning("Rejected request body: %s", e)
+            return json_response({"error": str(e)}, status=413)
+        # The time budget of the request starts when it was received
+        context.deadline = get_deadline(r, settings, received_at)
+
         # Apply middleware
-        middleware_response = apply_middleware(r, settings)
+        middleware_response = apply_middleware(r, settings, context)
         if middleware_response:
             logger.debug("Middleware response: %s", middleware_response)
             return middleware_response
@@ -59,9 +143,48 @@ class WebhookEndpoint(Endpoint):
             logger.debug("API key validation failed: %s", validation_response)
             return validation_response
 
+        # Answer redeliveries of the same request with the response of the first delivery
+        idempotency_key = get_idempotency_key(r)
+        idempotency_ttl = get_int_setting(settings, "idempotency_ttl", DEFAULT_IDEMPOTENCY_TTL)
+        if idempotency_key and idempotency_ttl > 0:
+            static_app_id = settings.get("static_app_id")
+            if isinstance(static_app_id, dict):
+                static_app_id = static_app_id.get('app_id')
+            endpoint_id = getattr(self.session, "endpoint_id", None)
+            scoped_key = f"{endpoint_id or ''}\0{static_app_id or ''}\0{r.path}\0{idempotency_key}"
+            response = idempotency_store.run(
+                scoped_key, lambda: self._dispatch(r, route, context, values, settings), idempotency_ttl,
+                context.body_hash)
+        else:
+            response = self._dispatch(r, route, context, values, settings)
+
+        # Background work that invokes Dify needs the session, which ends with the response
+        return hold_response(response, context.pending)
+
+    def _dispatch(self, r: Request, route: str, context: RequestContext, values: Mapping,
+                  settings: Mapping) -> Response:
+        """
+        Invokes the Dify app for an authenticated request.
+
+        Args:
+            r: The request object
+            route: The endpoint route of the request
+            context: The parsed request
+            values: The path values of the request
+            settings: The endpoint settings
+
+        Returns:
+            The response for the caller
+        """
         try:
-            request_body = getattr(
-                r, 'default_middleware_json', {}) or r.get_json()
+            # Requests whose budget ran out in the middlewares are not processed any further
+            time_left(context.deadline)
+            try:
+                request_body = context.middleware_json or context.json
+            except json.JSONDecodeError as e:
+                # The message of the decoder depends on the JSON codec backend
+                raise ValueError(f"Invalid JSON: {e}") from e
+            context.priority = get_priority_lane(r, route, settings)
             
             dynamic_app_id = values.get("app_id")
             static_app_id = settings.get("static_app_id")
@@ -76,22 +199,39 @@ class WebhookEndpoint(Endpoint):
                 logger.error("app_id is required but not provided.")
                 return Response(status=404, content_type="application/json")
 
+            if route in ("/workflow/<app_id>/batch", "/single-workflow/batch"):
+                return self._invoke_batch(route, request_body, dynamic_app_id, static_app_id, settings,
+                                          wants_ndjson(r, settings), context)
+
             # Handle inputs based on explicit_inputs setting
             explicit_inputs = settings.get('explicit_inputs', True)
 
+            input_projection = settings.get('input_projection')
+
             if explicit_inputs:
                 inputs = request_body.get("inputs", {})
+            elif not isinstance(request_body, dict):
+                # Only an object body can be projected or used as inputs, others are rejected below
+                inputs = request_body
+            elif input_projection:
+                # Only forward the selected fields of the request body
+                inputs = compile_projection(input_projection).apply(request_body)
             else:
                 inputs = request_body.copy()
 
             if not isinstance(inputs, dict):
                 logger.error(
                     "Invalid inputs type: expected object, got %s", type(inputs).__name__)
-                return Response(json.dumps({"error": "inputs must be an object"}),
-                                status=400, content_type="application/json")
+                return json_response({"error": "inputs must be an object"}, status=400)
+
+            # Relay Dify output as Server-Sent Events instead of waiting for the full result
+            streaming = wants_streaming(r, settings)
+            # Run workflows in the background and let the caller poll for the result
+            run_async = wants_async(r, settings)
 
             # initialize empty response
             response = None
+            response_headers: Dict[str, str] = {}
 
             if route == "/chatflow/<app_id>":
                 if static_app_id:
@@ -103,39 +243,41 @@ class WebhookEndpoint(Endpoint):
                     "query", None) if explicit_inputs else inputs.pop("query", None)
                 if not query or not isinstance(query, str):
                     logger.error("query is required and must be a string")
-                    return Response(json.dumps({"error": "query must be a string"}),
-                                    status=400, content_type="application/json")
+                    return json_response({"error": "query must be a string"}, status=400)
 
                 conversation_id = request_body.get(
                     "conversation_id") if explicit_inputs else inputs.pop("conversation_id", None)
                 if conversation_id is not None and not isinstance(conversation_id, str):
                     logger.error(
                         "conversation_id must be a string if provided")
-                    return Response(json.dumps({"error": "conversation_id must be a string"}),
-                                    status=400, content_type="application/json")
+                    return json_response({"error": "conversation_id must be a string"}, status=400)
 
                 # Invoke chatflow
+                if streaming:
+                    return sse_response(self._stream_chatflow(
+                        dynamic_app_id, query, conversation_id, inputs))
                 response = self._invoke_chatflow(
-                    dynamic_app_id, query, conversation_id, inputs)
+                    dynamic_app_id, query, conversation_id, inputs, settings, context)
             elif route == "/single-chatflow":
                 query = request_body.get(
                     "query") if explicit_inputs else inputs.pop("query", None)
                 if not query or not isinstance(query, str):
                     logger.error("query is required and must be a string")
-                    return Response(json.dumps({"error": "query must be a string"}),
-                                    status=400, content_type="application/json")
+                    return json_response({"error": "query must be a string"}, status=400)
 
                 conversation_id = request_body.get(
                     "conversation_id") if explicit_inputs else inputs.pop("conversation_id", None)
                 if conversation_id is not None and not isinstance(conversation_id, str):
                     logger.error(
                         "conversation_id must be a string if provided")
-                    return Response(json.dumps({"error": "conversation_id must be a string"}),
-                                    status=400, content_type="application/json")
+                    return json_response({"error": "conversation_id must be a string"}, status=400)
 
                 # Invoke chatflow
+                if streaming:
+                    return sse_response(self._stream_chatflow(
+                        static_app_id, query, conversation_id, inputs))
                 response = self._invoke_chatflow(
-                    static_app_id, query, conversation_id, inputs)
+                    static_app_id, query, conversation_id, inputs, settings, context)
 
             elif route == "/workflow/<app_id>":
                 if static_app_id:
@@ -143,35 +285,47 @@ class WebhookEndpoint(Endpoint):
                     # Static app_id is explicitly used to only expose one single app
                     return Response(status=404, content_type="application/json")
                 # Invoking workflow
-                response = self._invoke_workflow(
-                    dynamic_app_id, inputs, settings.get('raw_data_output', False))
+                if streaming:
+                    return sse_response(self._stream_workflow(dynamic_app_id, inputs))
+                if run_async:
+                    return self._enqueue_workflow(dynamic_app_id, inputs, settings, context, send_callback=False)
+                response = self._invoke_workflow(dynamic_app_id, inputs, settings, context, response_headers)
 
             elif route == "/single-workflow":
                 # Invoking workflow
-                response = self._invoke_workflow(
-                    static_app_id, inputs, settings.get('raw_data_output', False))
+                if streaming:
+                    return sse_response(self._stream_workflow(static_app_id, inputs))
+                if run_async:
+                    return self._enqueue_workflow(static_app_id, inputs, settings, context, send_callback=True)
+                response = self._invoke_workflow(static_app_id, inputs, settings, context, response_headers)
                 
                 # Send callback if configured for static app
-                if static_app_id and settings.get('callback_url'):
-                    self._send_callback_async(
-                        settings.get('callback_url'),
-                        settings.get('callback_secret_token'),
-                        response,
-                        static_app_id
-                    )
+                if static_app_id:
+                    self._send_configured_callback(settings, response, static_app_id)
 
             if not response:
-                return Response(json.dumps({"error": "Failed to get response"}), status=500, content_type="application/json")
+                return json_response({"error": "Failed to get response"}, status=500)
             else:
                 # Return response
                 logger.debug("%s response: %s", route, response)
-                return Response(json.dumps(response), status=200, content_type="application/json")
-
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
+                return json_response(response, status=200, headers=response_headers)
+
+        except DeadlineExceededError as e:
+            logger.warning("Deadline exceeded for %s", route)
+            return json_response({"error": str(e)}, status=504)
+        except CircuitOpenError as e:
+            logger.warning("Rejected request for %s: %s", route, str(e))
+            return json_response({"error": str(e)}, status=503, headers={"Retry-After": str(e.retry_after)})
+        except BulkheadFullError as e:
+            # The app limit only affects this app, the total limit the whole plugin
+            return json_response({"error": str(e)}, status=429 if e.scope == "app" else 503,
+                                 headers={"Retry-After": "1"})
+        except (ValueError, KeyError, TypeError) as e:
             logger.error("Error during request processing: %s", str(e))
-            return Response(json.dumps({"error": str(e)}), status=500, content_type="application/json")
+            return json_response({"error": str(e)}, status=500)
 
-    def _invoke_chatflow(self, app_id: str, query: str, conversation_id: Optional[str], inputs: Dict[str, Any]) -> Dict[str, Any]:
+    def _invoke_chatflow(self, app_id: str, query: str, conversation_id: Optional[str], inputs: Dict[str, Any],
+                         settings: Mapping, context: Optional[RequestContext] = None) -> Dict[str, Any]:
         """
         Invokes a Dify chatflow with the given parameters.
 
@@ -180,65 +334,588 @@ class WebhookEndpoint(Endpoint):
             query: The user query to process
             conversation_id: Optional conversation ID for continuing a conversation
             inputs: Additional inputs for the chatflow
+            settings: The endpoint settings with the concurrency limits
+            context: The request the invocation belongs to
 
         Returns:
             The chatflow response
+
+        Raises:
+            BulkheadFullError: If the concurrency limits are reached
+            CircuitOpenError: If the circuit breaker of the app is open
+            DeadlineExceededError: If the deadline of the request passed
         """
         logger.info("Invoking chatflow with app_id: %s", app_id)
-        dify_response = self.session.app.chat.invoke(
+
+        def call() -> Dict[str, Any]:
+            return self._call_app(app_id, settings, context, lambda: self.session.app.chat.invoke(
+                app_id=app_id,
+                query=query,
+                conversation_id=conversation_id,
+                inputs=inputs,
+                response_mode="blocking"
+            ))
+
+        return run_with_deadline(call, context.deadline if context else None)
+
+    def _stream_chatflow(self, app_id: str, query: str, conversation_id: Optional[str],
+                         inputs: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+        """
+        Invokes a Dify chatflow in streaming mode.
+
+        Args:
+            app_id: The ID of the chatflow to invoke
+            query: The user query to process
+            conversation_id: Optional conversation ID for continuing a conversation
+            inputs: Additional inputs for the chatflow
+
+        Returns:
+            A generator yielding the chatflow events as they are produced
+        """
+        logger.info("Streaming chatflow with app_id: %s", app_id)
+        return self.session.app.chat.invoke(
             app_id=app_id,
             query=query,
             conversation_id=conversation_id,
             inputs=inputs,
-            response_mode="blocking"
+            response_mode="streaming"
         )
-        return dify_response
 
-    def _invoke_workflow(self, app_id: str, inputs: Dict[str, Any], raw_data_output: bool) -> Dict[str, Any]:
+    def _invoke_workflow(self, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                         context: Optional[RequestContext] = None,
+                         response_headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
         Invokes a Dify workflow with the given parameters.
 
         Args:
             app_id: The ID of the workflow to invoke
             inputs: Inputs for the workflow
-            raw_data_output: If True, returns only the outputs field of the response
+            settings: The endpoint settings. With `raw_data_output` only the outputs field of the
+                      response is returned. With `coalesce_requests` identical concurrent
+                      invocations share a single Dify run. With `cache_ttl` successful responses
+                      are cached.
+            context: The request the invocation belongs to
+            response_headers: Optional headers of the HTTP response, the `X-Cache` status is
+                              added to them when the cache is enabled
 
         Returns:
             The workflow response, either full or just the outputs depending on raw_data_output
         """
+        cache_ttl = get_int_setting(settings, "cache_ttl", 0)
+        if cache_ttl > 0:
+            key = invocation_key(app_id, inputs, get_list_setting(settings, "cache_exclude_fields"))
+            dify_response = workflow_cache.get(key)
+            if response_headers is not None:
+                response_headers["X-Cache"] = "MISS" if dify_response is None else "HIT"
+            if dify_response is None:
+                dify_response = self._run_workflow(app_id, inputs, settings, context)
+                # Failed runs are not cached, so the next request tries again
+                if dify_response.get("data", {}).get("status", "succeeded") == "succeeded":
+                    workflow_cache.set(key, dify_response, cache_ttl, len(dumps(dify_response)))
+            else:
+                logger.info("Serving cached workflow response for app_id: %s", app_id)
+        else:
+            dify_response = self._run_workflow(app_id, inputs, settings, context)
+
+        # Process workflow response if raw_data_output is enabled
+        return dify_response["data"]["outputs"] if settings.get('raw_data_output', False) else dify_response
+
+    def _run_workflow(self, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                      context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Runs a Dify workflow, sharing the run with identical concurrent invocations if
+        `coalesce_requests` is enabled. With `shadow_app_id` a share of the runs is mirrored to that
+        app in the background to compare it with the workflow.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+            settings: The endpoint settings
+            context: The request the invocation belongs to, the caller stops waiting at its deadline
+
+        Returns:
+            The full workflow response
+
+        Raises:
+            DeadlineExceededError: If the deadline of the request passed
+        """
+        def invoke(run_context: Optional[RequestContext]) -> Dict[str, Any]:
+            shadow_app_id = settings.get("shadow_app_id")
+            if not shadow_app_id or shadow_app_id == app_id:
+                return self._call_workflow(app_id, inputs, settings, run_context)
+            # The shadow runs in the background and its result is only measured
+            return shadow_traffic.call(
+                app_id, shadow_app_id, get_int_setting(settings, "shadow_percentage", DEFAULT_SHADOW_PERCENTAGE),
+                lambda: self._call_workflow(app_id, inputs, settings, run_context),
+                lambda: self.session.app.workflow.invoke(app_id=shadow_app_id, inputs=inputs, response_mode="blocking"),
+                # The shadow invokes Dify through the session, so the response is held until it finished
+                run_context.pending if run_context else None)
+
+        if settings.get('coalesce_requests', False):
+            # The shared run has no deadline, since its callers have different ones. Each caller stops
+            # waiting at its own deadline below. Only callers of the same priority lane share a run.
+            shared_context = copy.copy(context) if context else None
+            if shared_context:
+                shared_context.deadline = None
+            key = f"{invocation_key(app_id, inputs)}\0{shared_context.priority if shared_context else ''}"
+
+            def call() -> Dict[str, Any]:
+                return workflow_flights.do(key, lambda: invoke(shared_context))
+        else:
+            def call() -> Dict[str, Any]:
+                return invoke(context)
+
+        return run_with_deadline(call, context.deadline if context else None)
+
+    def _call_workflow(self, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                       context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Calls the Dify workflow API in blocking mode, sending `canary_percentage` of the runs to
+        `canary_app_id` until the canary is rolled back after a regression.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+            settings: The endpoint settings
+            context: The request the invocation belongs to
+
+        Returns:
+            The full workflow response
+
+        Raises:
+            BulkheadFullError: If the concurrency limits are reached
+            CircuitOpenError: If the circuit breaker of the app is open
+        """
+        canary_app_id = settings.get("canary_app_id")
+        if not canary_app_id or canary_app_id == app_id:
+            return self._call_workflow_app(app_id, inputs, settings, context)
+
+        # The release is reported under the primary app, which might only receive canary traffic
+        endpoint_apps.add(getattr(self.session, "endpoint_id", None), app_id)
+        return canary_releases.get((app_id, canary_app_id)).call(
+            get_int_setting(settings, "canary_percentage", 0),
+            lambda variant_app_id: self._call_workflow_app(variant_app_id, inputs, settings, context))
+
+    def _call_workflow_app(self, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                           context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Calls a Dify workflow app in blocking mode.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+            settings: The endpoint settings with the concurrency limits. With `load_balancing` the run
+                      is sent to an app of the pool of the app. With `hedge_percentile` a run slower
+                      than that percentile of the app is also started on a replica.
+            context: The request the invocation belongs to
+
+        Returns:
+            The full workflow response
+
+        Raises:
+            BulkheadFullError: If the concurrency limits are reached
+            CircuitOpenError: If the circuit breaker of the app is open
+        """
+        app_id = self._pick_app(app_id, settings)
         logger.info(
             "Invoking workflow with app_id: %s and inputs: %s", app_id, inputs)
-        dify_response = self.session.app.workflow.invoke(
+
+        def call(target_app_id: str) -> Callable[[], Dict[str, Any]]:
+            def invoke() -> Dict[str, Any]:
+                response = self.session.app.workflow.invoke(
+                    app_id=target_app_id,
+                    inputs=inputs,
+                    response_mode="blocking"
+                )
+                if not isinstance(response, dict) or not isinstance(response.get("data"), dict):
+                    raise InvalidResponseError("Invalid workflow response: data is missing")
+                return response
+
+            return lambda: self._call_app(target_app_id, settings, context, invoke)
+
+        hedge_percentile = get_int_setting(settings, "hedge_percentile", 0)
+        replicas = get_replica_app_ids(settings, app_id) if 0 < hedge_percentile < 100 else []
+        if not replicas:
+            return call(app_id)()
+
+        # Start the run on a replica when the app takes longer than usual
+        return hedged_call(app_id, [call(target_app_id) for target_app_id in [app_id, *replicas]],
+                           app_latencies.get(app_id).percentile(hedge_percentile), hedge_budgets.get(app_id))
+
+    def _pick_app(self, app_id: str, settings: Mapping) -> str:
+        """
+        Picks the app of the pool of an app that runs the next invocation.
+
+        Args:
+            app_id: The ID of the requested app
+            settings: The endpoint settings. With `load_balancing` the invocation is sent to an app of
+                      the group of the app in `replica_app_ids`. Apps whose circuit is open are skipped.
+
+        Returns:
+            The ID of the picked app, the requested one if load balancing is disabled
+        """
+        strategy = settings.get("load_balancing")
+        if strategy not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            return app_id
+        pool = get_app_pool(settings, app_id)
+        if settings.get('circuit_breaker', False):
+            pool = [entry for entry in pool if not app_breakers.get(entry[0]).rejects_calls()] or pool
+        if len(pool) < 2:
+            return pool[0][0]
+        return app_balancer.pick(pool, strategy, app_bulkhead.active,
+                                 lambda pool_app_id: app_latencies.get(pool_app_id).percentile(50))
+
+    def _call_app(self, app_id: str, settings: Mapping, context: Optional[RequestContext],
+                  invoke: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Calls a Dify app, retrying transient errors up to `max_retries` times with jittered
+        exponential backoff while the deadline of the request and the retry budget of the app allow.
+
+        Args:
+            app_id: The ID of the invoked app
+            settings: The endpoint settings
+            context: The request the invocation belongs to
+            invoke: The function calling the Dify API
+
+        Returns:
+            The response of the app
+        """
+        endpoint_apps.add(getattr(self.session, "endpoint_id", None), app_id)
+
+        def attempt() -> Dict[str, Any]:
+            return self._guarded_call(app_id, settings, context, invoke)
+
+        max_retries = get_int_setting(settings, "max_retries", 0)
+        if max_retries <= 0:
+            return attempt()
+        return call_with_retries(attempt, max_retries, retry_budgets.get(app_id),
+                                 context.deadline if context else None)
+
+    def _guarded_call(self, app_id: str, settings: Mapping, context: Optional[RequestContext],
+                      invoke: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Calls a Dify app through its circuit breaker and the concurrency limits, and records the
+        duration of successful calls.
+
+        Args:
+            app_id: The ID of the invoked app
+            settings: The endpoint settings. With `circuit_breaker` calls to an app that keeps
+                      failing with transient errors are rejected. Calls slower than
+                      `slow_call_seconds` count as failed.
+            context: The request the invocation belongs to
+            invoke: The function calling the Dify API
+
+        Returns:
+            The response of the app
+
+        Raises:
+            BulkheadFullError: If the concurrency limits are reached
+            CircuitOpenError: If the circuit breaker of the app is open
+        """
+        def timed_invoke() -> Dict[str, Any]:
+            started = time.monotonic()
+            response = invoke()
+            app_latencies.get(app_id).record(time.monotonic() - started)
+            return response
+
+        if not settings.get('circuit_breaker', False):
+            with self._invocation_slot(app_id, settings, context):
+                return timed_invoke()
+
+        breaker = app_breakers.get(app_id)
+        breaker.acquire()
+        try:
+            with self._invocation_slot(app_id, settings, context):
+                started = time.monotonic()
+                try:
+                    response = timed_invoke()
+                except Exception as e:
+                    # Errors caused by the request, e.g. invalid inputs, do not count against the app
+                    breaker.record(not is_retryable(e))
+                    raise
+        except (BulkheadFullError, DeadlineExceededError):
+            # The app was not called, so there is no outcome to record
+            breaker.cancel()
+            raise
+
+        slow_call_seconds = get_int_setting(settings, "slow_call_seconds", 0)
+        data = response.get("data") if isinstance(response, dict) else None
+        failed = (isinstance(data, dict) and data.get("status") == "failed"
+                  and is_retryable(RuntimeError(str(data.get("error") or ""))))
+        slow = 0 < slow_call_seconds < time.monotonic() - started
+        breaker.record(not failed and not slow)
+        return response
+
+    @contextmanager
+    def _invocation_slot(self, app_id: str, settings: Mapping,
+                         context: Optional[RequestContext] = None) -> Iterator[None]:
+        """
+        Holds a slot of the concurrency limits configured in the settings while a Dify app runs.
+
+        Args:
+            app_id: The ID of the invoked app
+            settings: The endpoint settings
+            context: The request the invocation belongs to, its priority selects the queue lane
+                     and it is not queued beyond its deadline
+
+        Raises:
+            BulkheadFullError: If the concurrency limits are reached
+            DeadlineExceededError: If the deadline of the request passed before a slot was free
+        """
+        deadline = context.deadline if context else None
+        remaining = time_left(deadline)
+        try:
+            app_bulkhead.acquire(
+                app_id,
+                get_int_setting(settings, "app_concurrency_limit", 0),
+                get_int_setting(settings, "total_concurrency_limit", 0),
+                get_int_setting(settings, "concurrency_queue_size", DEFAULT_CONCURRENCY_QUEUE_SIZE),
+                MAX_QUEUE_WAIT if remaining is None else min(MAX_QUEUE_WAIT, remaining),
+                context.priority if context else "default")
+        except BulkheadFullError:
+            time_left(deadline)
+            raise
+        try:
+            yield
+        finally:
+            app_bulkhead.release(app_id)
+
+    def _invoke_batch(self, route: str, request_body: Any, dynamic_app_id: Optional[str],
+                      static_app_id: Optional[str], settings: Mapping, stream_results: bool = False,
+                      context: Optional[RequestContext] = None) -> Response:
+        """
+        Invokes a Dify workflow for each item of a batch request with bounded concurrency.
+
+        Args:
+            route: The batch route of the request
+            request_body: The parsed request body
+            dynamic_app_id: The app ID from the request path
+            static_app_id: The app ID from the settings
+            settings: The endpoint settings
+            stream_results: If True, results are streamed as NDJSON in completion order
+            context: The request the batch belongs to
+
+        Returns:
+            A response with one result or error for each item, in request order unless streamed
+        """
+        if route == "/workflow/<app_id>/batch":
+            if static_app_id:
+                # Static app_id is explicitly used to only expose one single app
+                return Response(status=404, content_type="application/json")
+            app_id = dynamic_app_id
+        else:
+            app_id = static_app_id
+
+        if not app_id:
+            return Response(status=404, content_type="application/json")
+
+        explicit_inputs = settings.get('explicit_inputs', True)
+        if explicit_inputs:
+            items = request_body.get("inputs") if isinstance(request_body, dict) else None
+        else:
+            items = request_body
+
+        if not isinstance(items, list):
+            logger.error("Invalid batch inputs type: expected array, got %s", type(items).__name__)
+            return json_response({"error": "inputs must be an array"}, status=400)
+        if len(items) > MAX_BATCH_SIZE:
+            return json_response({"error": f"A batch can contain at most {MAX_BATCH_SIZE} items"}, status=400)
+
+        input_projection = settings.get('input_projection')
+        if not explicit_inputs and input_projection:
+            projection = compile_projection(input_projection)
+            # Items that are not objects are kept, so they are reported as invalid
+            items = [projection.apply(item) if isinstance(item, dict) else item for item in items]
+
+        concurrency = max(1, get_int_setting(settings, "batch_concurrency", DEFAULT_BATCH_CONCURRENCY))
+        logger.info("Invoking batch of %d items for app_id: %s with concurrency %d",
+                    len(items), app_id, concurrency)
+
+        if stream_results:
+            return ndjson_response(self._stream_batch(app_id, items, settings, concurrency, context))
+
+        results: List[Dict[str, Any]] = []
+        if items:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+                results = list(executor.map(
+                    lambda item: self._invoke_batch_item(item[0], app_id, item[1], settings, context),
+                    enumerate(items)))
+
+        return json_response({"results": results}, status=200)
+
+    def _stream_batch(self, app_id: str, items: List[Any], settings: Mapping, concurrency: int,
+                      context: Optional[RequestContext] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        Invokes a Dify workflow for each batch item and yields the results in completion order.
+
+        At most `concurrency` items are in flight and completed results are not kept, so
+        memory does not grow with the size of the batch.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            items: The inputs of each batch item
+            settings: The endpoint settings
+            concurrency: The maximum number of items invoked at the same time
+            context: The request the batch belongs to
+
+        Returns:
+            A generator yielding the index with the result or error of each item
+        """
+        if not items:
+            return
+        pending_items = enumerate(items)
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, len(items)))
+        try:
+            in_flight = set()
+            for index, inputs in pending_items:
+                in_flight.add(executor.submit(self._invoke_batch_item, index, app_id, inputs, settings, context))
+                if len(in_flight) >= concurrency:
+                    break
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    next_item = next(pending_items, None)
+                    if next_item is not None:
+                        index, inputs = next_item
+                        in_flight.add(executor.submit(
+                            self._invoke_batch_item, index, app_id, inputs, settings, context))
+        finally:
+            # Stop queued items when the client disconnects before the batch completed
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _invoke_batch_item(self, index: int, app_id: str, inputs: Any, settings: Mapping,
+                           context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """
+        Invokes a Dify workflow for a single batch item.
+
+        Args:
+            index: The position of the item in the batch
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+            settings: The endpoint settings
+            context: The request the batch belongs to
+
+        Returns:
+            The item index with either the workflow result or the error
+        """
+        if not isinstance(inputs, dict):
+            return {"index": index, "error": "inputs must be an object"}
+        try:
+            return {"index": index, "result": self._invoke_workflow(app_id, inputs, settings, context)}
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Batch item %d failed for app_id %s: %s", index, app_id, str(e))
+            return {"index": index, "error": str(e)}
+
+    def _stream_workflow(self, app_id: str, inputs: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+        """
+        Invokes a Dify workflow in streaming mode.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+
+        Returns:
+            A generator yielding the workflow events as they are produced
+        """
+        logger.info("Streaming workflow with app_id: %s", app_id)
+        return self.session.app.workflow.invoke(
             app_id=app_id,
             inputs=inputs,
-            response_mode="blocking"
+            response_mode="streaming"
         )
-
-        # Process workflow response if raw_data_output is enabled
-        return dify_response["data"]["outputs"] if raw_data_output else dify_response
     
+    def _enqueue_workflow(self, app_id: str, inputs: Dict[str, Any], settings: Mapping,
+                          context: Optional[RequestContext], send_callback: bool) -> Response:
+        """
+        Queues a workflow invocation as background job.
+
+        The job invokes Dify through the session of the request, so it is added to the pending work
+        of the request and the 202 response is held open until the job finished.
+
+        Args:
+            app_id: The ID of the workflow to invoke
+            inputs: Inputs for the workflow
+            settings: The endpoint settings
+            context: The request the job belongs to
+            send_callback: If True, the configured callback is sent when the workflow finished
+
+        Returns:
+            A 202 response with the job ID, or 503 if too many jobs are pending
+        """
+        if context:
+            # The caller does not wait for the job, so its deadline does not apply
+            context.deadline = None
+
+        def run() -> Dict[str, Any]:
+            response = self._invoke_workflow(app_id, inputs, settings, context)
+            if send_callback:
+                self._send_configured_callback(settings, response, app_id)
+            return response
+
+        job = job_store.submit(run, get_job_scope(settings, getattr(self.session, "endpoint_id", None)))
+        if not job:
+            return json_response({"error": "Too many pending jobs"}, status=503, headers={"Retry-After": "5"})
+        if context:
+            context.pending.append(job.done)
+
+        return json_response({"job_id": job.id, "status": job.status, "status_path": f"/jobs/{job.id}"},
+                             status=202)
+
+    def _send_configured_callback(self, settings: Mapping, workflow_response: Dict[str, Any], app_id: str) -> None:
+        """
+        Sends the workflow result to the callback URL from the settings, if one is configured.
+
+        Args:
+            settings: The endpoint settings
+            workflow_response: The workflow response data to send
+            app_id: The app ID that generated this response
+        """
+        if settings.get('callback_url'):
+            self._send_callback_async(
+                settings.get('callback_url'),
+                settings.get('callback_secret_token'),
+                workflow_response,
+                app_id,
+                settings.get('durable_callbacks', False)
+            )
+
     def _send_callback_async(self, callback_url: str, secret_token: Optional[str], 
-                            workflow_response: Dict[str, Any], app_id: str) -> None:
+                            workflow_response: Dict[str, Any], app_id: str, durable: bool = False) -> None:
         """
         Sends an asynchronous callback with workflow results.
+
+        The callback is queued on the callback dispatcher, which sends it from its own event loop,
+        so the response does not wait for it. When the queue stays full, the callback is dropped.
         
         Args:
             callback_url: The URL to send the callback to
             secret_token: Optional secret token for authentication
             workflow_response: The workflow response data to send
             app_id: The app ID that generated this response
+            durable: If True, the callback is stored in the outbox before it is queued and sent
+                     again after a restart of the plugin until it was delivered
         """
-        try:
-            # Run callback in background to avoid blocking the main response
-            asyncio.create_task(self._send_callback(
-                callback_url, secret_token, workflow_response, app_id
-            ))
+        entry_id = None
+        if durable:
+            entry_id = callback_outbox.append(
+                callback_url, secret_token, callback_payload(workflow_response, app_id), app_id)
+
+        async def send() -> None:
+            if await self._send_callback(callback_url, secret_token, workflow_response, app_id) and entry_id:
+                callback_outbox.mark_done(entry_id)
+
+        if callback_dispatcher.submit(send):
             logger.info("Scheduled callback to %s for app_id: %s", callback_url, app_id)
-        except Exception as e:
-            logger.error("Failed to schedule callback: %s", str(e))
+        elif entry_id:
+            logger.warning("Delayed callback to %s for app_id: %s until the next start, too many callbacks "
+                           "are pending", callback_url, app_id)
+        else:
+            logger.error("Dropped callback to %s for app_id: %s, too many callbacks are pending",
+                         callback_url, app_id)
     
     async def _send_callback(self, callback_url: str, secret_token: Optional[str],
-                           workflow_response: Dict[str, Any], app_id: str) -> None:
+                           workflow_response: Dict[str, Any], app_id: str) -> bool:
         """
         Sends a callback HTTP request with workflow results.
         
@@ -247,54 +924,8 @@ class WebhookEndpoint(Endpoint):
             secret_token: Optional secret token for authentication
             workflow_response: The workflow response data to send
             app_id: The app ID that generated this response
+
+        Returns:
+            True if the callback was delivered
         """
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "Dify-Webhook-Plugin/1.0"
-        }
-        
-        if secret_token:
-            headers["Authorization"] = f"Bearer {secret_token}"
-        
-        callback_payload = {
-            "app_id": app_id,
-            "timestamp": workflow_response.get("created_at"),
-            "workflow_run_id": workflow_response.get("workflow_run_id"),
-            "data": workflow_response
-        }
-        
-        max_retries = 3
-        retry_delay = 1  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        callback_url,
-                        json=callback_payload,
-                        headers=headers
-                    )
-                    
-                    if response.status_code in [200, 201, 202, 204]:
-                        logger.info(
-                            "Callback sent successfully to %s (status: %d) for app_id: %s",
-                            callback_url, response.status_code, app_id
-                        )
-                        return
-                    else:
-                        logger.warning(
-                            "Callback failed with status %d: %s for app_id: %s", 
-                            response.status_code, response.text, app_id
-                        )
-                        
-            except httpx.TimeoutException:
-                logger.error("Callback timeout (attempt %d/%d) to %s for app_id: %s", 
-                           attempt + 1, max_retries, callback_url, app_id)
-            except Exception as e:
-                logger.error("Callback error (attempt %d/%d) to %s for app_id: %s: %s", 
-                           attempt + 1, max_retries, callback_url, app_id, str(e))
-            
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (2 ** attempt))  # Exponential backoff
-        
-        logger.error("All callback attempts failed for %s, app_id: %s", callback_url, app_id)
+        return await post_callback(callback_url, secret_token, callback_payload(workflow_response, app_id), app_id)
@@ -0,0 +1,34 @@
+import logging
+from typing import Mapping
+from werkzeug import Request, Response
+from dify_plugin import Endpoint
+from endpoints.helpers import get_job_scope, validate_api_key
+from endpoints.codec import json_response
+from endpoints.jobs import job_store
+
+logger = logging.getLogger(__name__)
+
+class JobStatusEndpoint(Endpoint):
+    """
+    Returns the status and, once finished, the result of a workflow that runs as background job.
+
+    Jobs are created by the workflow routes in async mode and can only be polled through the same
+    endpoint with the same API key. Finished jobs are kept for a limited time, afterwards the
+    endpoint responds with 404.
+    """
+
+    def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
+        """
+        Looks up the job with the given `job_id`.
+        """
+        validation_response = validate_api_key(r, settings)
+        if validation_response:
+            logger.debug("API key validation failed: %s", validation_response)
+            return validation_response
+
+        job = job_store.get(values.get("job_id", ""),
+                            get_job_scope(settings, getattr(self.session, "endpoint_id", None)))
+        if not job:
+            return json_response({"error": "Job not found"}, status=404)
+
+        return json_response(job.to_dict(), status=200)
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of invocations that run in the background at the same time
+JOB_WORKERS = 4
+# Maximum number of jobs that are queued or running, further jobs are rejected
+MAX_PENDING_JOBS = 100
+# Seconds a finished job and its result are kept for polling
+JOB_TTL = 3600
+# Maximum number of jobs kept in memory, the oldest finished jobs are evicted first
+MAX_JOBS = 1000
+
+
+class Job:
+    """
+    A Dify invocation that runs in the background and can be polled for its result.
+    """
+
+    def __init__(self, job_id: str, scope: Optional[str] = None):
+        self.id = job_id
+        self.scope = scope
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the job for the status endpoint.
+        """
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "succeeded":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+class JobStore:
+    """
+    A bounded in-memory job store that runs jobs on a fixed size worker pool.
+
+    Finished jobs expire after a TTL. When the store is full, the oldest finished jobs are
+    evicted first. Jobs are rejected instead of queued without bound when too many are pending.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = MAX_PENDING_JOBS,
+                 ttl: float = JOB_TTL, max_jobs: int = MAX_JOBS):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook-job")
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[], Any], scope: Optional[str] = None) -> Optional[Job]:
+        """
+        Queue a function to run in the background.
+
+        Args:
+            fn: The function to run, its return value becomes the job result
+            scope: The scope the job can be looked up in, e.g. the endpoint and API key that created it
+
+        Returns:
+            The queued job, or None if too many jobs are pending
+        """
+        with self._lock:
+            self._evict(time.time())
+            if self._pending >= self.max_pending:
+                logger.warning("Rejected job, %d jobs are pending", self._pending)
+                return None
+            job = Job(uuid.uuid4().hex, scope)
+            self._jobs[job.id] = job
+            self._pending += 1
+
+        self._executor.submit(self._run, job, fn)
+        logger.info("Queued job %s", job.id)
+        return job
+
+    def get(self, job_id: str, scope: Optional[str] = None) -> Optional[Job]:
+        """
+        Look up a job that has not expired yet.
+
+        Args:
+            job_id: The ID returned when the job was queued
+            scope: The scope of the caller, jobs created in another scope are not returned
+
+        Returns:
+            The job, or None if it is unknown, expired or belongs to another scope
+        """
+        with self._lock:
+            self._evict(time.time())
+            job = self._jobs.get(job_id)
+        return job if job and job.scope == scope else None
+
+    def _run(self, job: Job, fn: Callable[[], Any]) -> None:
+        job.status = "running"
+        try:
+            job.result = fn()
+            job.status = "succeeded"
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Job %s failed: %s", job.id, str(e))
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                self._finished[job.id] = job
+            job.done.set()
+            logger.info("Job %s finished with status %s", job.id, job.status)
+
+    def _evict(self, now: float) -> None:
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if now - job.finished_at < self.ttl and len(self._jobs) < self.max_jobs:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+
+job_store = JobStore()
@@ -0,0 +1,49 @@
+import math
+import threading
+from collections import deque
+from typing import Deque, Optional
+from endpoints.registry import KeyedRegistry
+
+# Number of recent call durations kept for each app
+LATENCY_SAMPLES = 500
+# Minimum number of recorded calls before percentiles are reported
+MIN_LATENCY_SAMPLES = 20
+
+
+class LatencyWindow:
+    """
+    The durations of the most recent calls to an app, used to estimate its latency percentiles.
+    """
+
+    def __init__(self, size: int = LATENCY_SAMPLES, min_samples: int = MIN_LATENCY_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """
+        Record the duration of a completed call.
+        """
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        The duration that the given percentage of the recent calls did not exceed (nearest rank).
+
+        Args:
+            percent: The percentile, between 0 and 100
+
+        Returns:
+            The duration in seconds, or None if fewer than min_samples calls were recorded
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        rank = math.ceil(percent / 100 * len(samples))
+        return samples[min(len(samples), max(1, rank)) - 1]
+
+
+# The latency window of each app
+app_latencies: KeyedRegistry[str, LatencyWindow] = KeyedRegistry(lambda app_id: LatencyWindow())
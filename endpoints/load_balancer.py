@@ -0,0 +1,79 @@
+import logging
+import random
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from endpoints.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+
+
+class LoadBalancer:
+    """
+    Picks one app of a pool of equivalent apps for each invocation.
+
+    With ROUND_ROBIN the apps are picked in turn in proportion to their weights, using smooth
+    weighted round-robin so the picks of a heavy app are interleaved with the others. With
+    LEAST_OUTSTANDING the app with the fewest invocations in flight per weight is picked, scaled
+    by its recent median latency once it is known for all apps of the pool, so a slow app
+    receives fewer invocations than a fast one with the same number in flight.
+    """
+
+    def __init__(self):
+        self._current: Dict[Tuple[Tuple[str, int], ...], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def pick(self, pool: Sequence[Tuple[str, int]], strategy: str, in_flight: Callable[[str], int],
+             latency: Callable[[str], Optional[float]]) -> str:
+        """
+        Pick an app of a pool.
+
+        Args:
+            pool: The app IDs with their weights
+            strategy: ROUND_ROBIN or LEAST_OUTSTANDING
+            in_flight: Returns the number of invocations in flight for an app
+            latency: Returns the recent median latency of an app, or None if it is not known yet
+
+        Returns:
+            The ID of the picked app
+        """
+        if len(pool) == 1:
+            app_id = pool[0][0]
+        elif strategy == LEAST_OUTSTANDING:
+            app_id = self._least_outstanding(pool, in_flight, latency)
+        else:
+            app_id = self._round_robin(pool)
+        metrics.inc("webhook_load_balancer_picks_total", app_id=app_id)
+        return app_id
+
+    def _round_robin(self, pool: Sequence[Tuple[str, int]]) -> str:
+        with self._lock:
+            current = self._current.setdefault(tuple(pool), {app_id: 0.0 for app_id, _ in pool})
+            for app_id, weight in pool:
+                current[app_id] += weight
+            picked = max(current, key=current.get)
+            current[picked] -= sum(weight for _, weight in pool)
+            return picked
+
+    @staticmethod
+    def _least_outstanding(pool: Sequence[Tuple[str, int]], in_flight: Callable[[str], int],
+                           latency: Callable[[str], Optional[float]]) -> str:
+        latencies = {app_id: latency(app_id) for app_id, _ in pool}
+        # Latencies are only compared once every app has one, otherwise new apps would look infinitely fast
+        use_latency = all(value is not None for value in latencies.values())
+
+        def cost(entry: Tuple[str, int]) -> Tuple[float, float]:
+            app_id, weight = entry
+            load = (in_flight(app_id) + 1) / weight
+            # Ties are broken randomly, so idle pools do not send everything to the first app
+            return (load * latencies[app_id] if use_latency else load), random.random()
+
+        return min(pool, key=cost)[0]
+
+
+app_balancer = LoadBalancer()
+
+metrics.describe("webhook_load_balancer_picks_total", "counter",
+                 "Number of invocations sent to each app of a load balanced pool")
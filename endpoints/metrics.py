@@ -0,0 +1,123 @@
+import logging
+import threading
+from typing import Callable, Collection, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A sample reported by a collector: metric name, labels and value
+Sample = Tuple[str, Mapping[str, str], float]
+
+# Labels naming the app a sample describes
+APP_LABELS = ("app_id", "canary_app_id")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in sorted(labels.items())) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _family(name: str, descriptions: Mapping[str, Tuple[str, str]]) -> str:
+    """
+    The metric a sample belongs to, e.g. the histogram of a `_bucket` sample.
+    """
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and descriptions.get(name[:-len(suffix)], ("",))[0] == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+
+class MetricsRegistry:
+    """
+    A minimal in-process metrics registry rendered in the Prometheus text format.
+
+    Counters and gauges are stored in the registry. Components that already keep their own
+    state, such as circuit breakers, register a collector that reports samples on each scrape
+    instead, so they do not have to update the registry on every change.
+    """
+
+    def __init__(self):
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, metric_type: str, description: str) -> None:
+        """
+        Declare the type ("counter", "gauge" or "histogram") and the help text of a metric.
+        """
+        with self._lock:
+            self._descriptions[name] = (metric_type, description)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """
+        Increase a counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """
+        Set a gauge.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Register a function that reports samples whenever the metrics are rendered.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self, app_ids: Optional[Collection[str]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            app_ids: The apps to render samples for, samples labelled with other apps are left out.
+                     Samples without an app label are always rendered. None renders all samples.
+        """
+        with self._lock:
+            samples: List[Sample] = [(name, dict(labels), value) for (name, labels), value in self._values.items()]
+            collectors = list(self._collectors)
+            descriptions = dict(self._descriptions)
+
+        for collector in collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Metrics collector failed: %s", str(e))
+
+        by_family: Dict[str, List[Sample]] = {}
+        for sample in samples:
+            if app_ids is not None and any(
+                    label in sample[1] and sample[1][label] not in app_ids for label in APP_LABELS):
+                continue
+            by_family.setdefault(_family(sample[0], descriptions), []).append(sample)
+
+        lines = []
+        for family in sorted(by_family):
+            if family in descriptions:
+                metric_type, description = descriptions[family]
+                lines.append(f"# HELP {family} {description}")
+                lines.append(f"# TYPE {family} {metric_type}")
+            # Histogram buckets keep the order they were reported in
+            family_samples = sorted(by_family[family], key=lambda sample: (
+                sample[0], sorted((key, value) for key, value in sample[1].items() if key != "le")))
+            for name, labels, value in family_samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,32 @@
+import logging
+from typing import Mapping
+from werkzeug import Request, Response
+from dify_plugin import Endpoint
+from endpoints.helpers import validate_api_key
+from endpoints.metrics import metrics
+from endpoints.app_scope import endpoint_apps
+# Imported for the collectors the modules register with the metrics registry
+import endpoints.circuit_breaker  # pylint: disable=unused-import
+import endpoints.canary  # pylint: disable=unused-import
+import endpoints.callback_dispatcher  # pylint: disable=unused-import
+
+logger = logging.getLogger(__name__)
+
+class MetricsEndpoint(Endpoint):
+    """
+    Exposes the metrics of the plugin process in the Prometheus text format, e.g. the state of
+    the circuit breaker of each app or the latency histograms of canary releases. Metrics of an
+    app are only shown to the endpoint that invoked it or names it in its settings.
+    """
+
+    def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
+        """
+        Renders the current metrics.
+        """
+        validation_response = validate_api_key(r, settings)
+        if validation_response:
+            logger.debug("API key validation failed: %s", validation_response)
+            return validation_response
+
+        app_ids = endpoint_apps.get(getattr(self.session, "endpoint_id", None), settings)
+        return Response(metrics.render(app_ids), status=200, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,127 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ENTRY_SEPARATOR = re.compile(r"[,\n]")
+_ALIAS_SEPARATOR = re.compile(r"\s+as\s+")
+
+
+class _Node:
+    """
+    A node of the projection trie. Paths sharing a prefix share the nodes of that prefix.
+    """
+
+    __slots__ = ("children", "outputs")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.outputs: List[str] = []
+
+
+class Projection:
+    """
+    A compiled input projection that picks a set of fields out of a request body.
+
+    The projection is stored as a trie of path segments, so building the inputs walks the
+    request body once, no matter how many of the selected paths share a prefix.
+    """
+
+    def __init__(self, fields: List[Tuple[List[str], str]]):
+        """
+        Initialize the projection.
+
+        Args:
+            fields: Pairs of path segments and the input name the value is stored under
+        """
+        self.fields = fields
+        self._root = _Node()
+        for segments, name in fields:
+            node = self._root
+            for segment in segments:
+                node = node.children.setdefault(segment, _Node())
+            node.outputs.append(name)
+
+    def apply(self, document: Any) -> Dict[str, Any]:
+        """
+        Build the inputs object from a request body.
+
+        Paths that do not exist in the document are left out of the result.
+
+        Args:
+            document: The decoded request body
+
+        Returns:
+            The projected inputs
+        """
+        inputs: Dict[str, Any] = {}
+        self._walk(self._root, document, inputs)
+        return inputs
+
+    def _walk(self, node: _Node, value: Any, inputs: Dict[str, Any]) -> None:
+        for name in node.outputs:
+            inputs[name] = value
+        for segment, child in node.children.items():
+            if isinstance(value, dict):
+                if segment in value:
+                    self._walk(child, value[segment], inputs)
+            elif isinstance(value, list) and segment.isdigit():
+                index = int(segment)
+                if index < len(value):
+                    self._walk(child, value[index], inputs)
+
+
+def _parse_path(path: str) -> List[str]:
+    """
+    Split a JSON pointer (/a/b/0) or a dotted path (a.b.0) into its segments.
+    """
+    if path.startswith("/"):
+        return [segment.replace("~1", "/").replace("~0", "~") for segment in path[1:].split("/")]
+    return path.split(".")
+
+
+@lru_cache(maxsize=64)
+def compile_projection(spec: str) -> Projection:
+    """
+    Compile a projection spec.
+
+    The spec is a comma or newline separated list of JSON pointers or dotted paths, each
+    optionally followed by `as <name>` to rename the field, e.g.
+    `repository.full_name as repo, /sender/login as user, action`.
+    Without a rename the last path segment is used as input name. Compiled projections are
+    cached per spec, so each endpoint configuration is only compiled once.
+
+    Args:
+        spec: The projection spec
+
+    Returns:
+        The compiled projection
+
+    Raises:
+        ValueError: If an entry is malformed or two entries produce the same input name
+    """
+    fields: List[Tuple[List[str], str]] = []
+    names = set()
+    for entry in _ENTRY_SEPARATOR.split(spec):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = _ALIAS_SEPARATOR.split(entry)
+        if len(parts) > 2:
+            raise ValueError(f"Invalid input projection entry: {entry}")
+        path = parts[0].strip()
+        segments = _parse_path(path)
+        if not path.startswith("/") and "" in segments:
+            raise ValueError(f"Invalid input projection entry: {entry}")
+        name = parts[1].strip() if len(parts) == 2 else segments[-1]
+        if not name:
+            raise ValueError(f"Invalid input projection entry: {entry}")
+        if name in names:
+            raise ValueError(f"Duplicate input name in input projection: {name}")
+        names.add(name)
+        fields.append((segments, name))
+
+    logger.debug("Compiled input projection with %d fields", len(fields))
+    return Projection(fields)
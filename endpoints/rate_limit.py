@@ -0,0 +1,114 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the number of buckets, the least recently used buckets are evicted first
+MAX_BUCKETS = 100000
+
+_RATE_SPEC = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(s|sec|second|m|min|minute|h|hour)\s*(?:,\s*(\d+))?\s*$")
+_PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """
+    Parse a rate limit spec such as `10/s`, `60/minute` or `600/hour, 20`.
+
+    The optional number after the comma is the burst, the number of requests that can be made
+    at once after an idle period. Without it, the burst equals the number of requests per period.
+
+    Args:
+        spec: The rate limit spec
+
+    Returns:
+        The refill rate in requests per second and the burst
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    match = _RATE_SPEC.match(spec)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {spec}")
+    requests, period, burst = match.groups()
+    rate = float(requests) / _PERIODS[period]
+    burst = float(burst) if burst else max(float(requests), 1.0)
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Invalid rate limit: {spec}")
+    return rate, burst
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated_at", "rate", "burst")
+
+    def __init__(self, now: float, rate: float, burst: float):
+        self.tokens = burst
+        self.updated_at = now
+        self.rate = rate
+        self.burst = burst
+
+
+class TokenBucketLimiter:
+    """
+    An in-process token bucket rate limiter with constant work per request.
+
+    Buckets are kept in least recently used order. A bucket that was idle long enough to refill
+    completely behaves like a new one, so such buckets are dropped from the front of the order
+    as requests come in, which keeps memory bounded by the number of recently active keys.
+    """
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, rate: float, burst: float) -> float:
+        """
+        Take a token from the bucket of a key.
+
+        Args:
+            key: The key identifying the bucket
+            rate: The refill rate in tokens per second
+            burst: The capacity of the bucket
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until the next token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(now, rate, burst)
+                self._buckets[key] = bucket
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+                bucket.updated_at = now
+                bucket.rate = rate
+                bucket.burst = burst
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0.0
+            return (1 - bucket.tokens) / rate
+
+    def _evict(self, now: float) -> None:
+        # Only the front of the order is checked, so eviction is amortized constant work
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            refilled = bucket.tokens + (now - bucket.updated_at) * bucket.rate >= bucket.burst
+            if not refilled and len(self._buckets) < self.max_buckets:
+                break
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+rate_limiter = TokenBucketLimiter()
@@ -0,0 +1,41 @@
+import threading
+from typing import Callable, Dict, Generic, Hashable, List, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class KeyedRegistry(Generic[K, V]):
+    """
+    Holds one object per key, e.g. the circuit breaker of each app, created by the factory when
+    its key is first used.
+    """
+
+    def __init__(self, factory: Callable[[K], V]):
+        """
+        Initialize the registry.
+
+        Args:
+            factory: Creates the object of a key
+        """
+        self._factory = factory
+        self._items: Dict[K, V] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V:
+        """
+        The object of a key, created if the key was not used before.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._factory(key)
+                self._items[key] = item
+            return item
+
+    def values(self) -> List[V]:
+        """
+        The objects created so far.
+        """
+        with self._lock:
+            return list(self._items.values())
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import threading
+from typing import IO, Any, Iterable, Iterator, List, Optional
+from werkzeug import Request, Response
+from endpoints import codec
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+# Size of the chunks read from bodies without a Content-Length header
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PayloadTooLargeError(Exception):
+    """
+    Raised when a request body exceeds the configured maximum body size.
+    """
+
+    def __init__(self, max_body_size: int):
+        super().__init__(f"Request body exceeds the maximum size of {max_body_size} bytes")
+        self.max_body_size = max_body_size
+
+
+class RequestContext:
+    """
+    A parsed view of an incoming request that is shared by every middleware and the endpoint.
+
+    The body is read from the request exactly once. The JSON document and the body hash are
+    computed lazily on first access and cached, so no consumer ever decodes the body twice.
+    """
+
+    def __init__(self, raw_body: bytes):
+        """
+        Initialize the context with the raw request body.
+
+        Args:
+            raw_body (bytes): The request body as received from the client.
+        """
+        self.raw_body = raw_body
+        self.content_length = len(raw_body)
+        self.middleware_json: Optional[dict] = None
+        # The priority lane the Dify invocations of this request are queued in
+        self.priority = "default"
+        # The time.monotonic() value after which the caller no longer waits, or None
+        self.deadline: Optional[float] = None
+        # Set when background work that invokes Dify through the session of this request finished.
+        # The session ends with the response, so the response is held open until then.
+        self.pending: List[threading.Event] = []
+        self._json: Any = _UNSET
+        self._json_error: Optional[ValueError] = None
+        self._body_hash: Optional[str] = None
+
+    @classmethod
+    def from_request(cls, r: Request, max_body_size: Optional[int] = None) -> "RequestContext":
+        """
+        Build a context from a Werkzeug request by reading its body once.
+
+        When a maximum body size is given, a declared Content-Length above the limit is
+        rejected before anything is read. Bodies without a Content-Length (chunked transfer)
+        are read in chunks and rejected as soon as the limit is crossed.
+
+        Args:
+            r (Request): The incoming request.
+            max_body_size (Optional[int]): The maximum accepted body size in bytes.
+
+        Returns:
+            RequestContext: The context wrapping the request body.
+
+        Raises:
+            PayloadTooLargeError: If the body exceeds the maximum body size.
+        """
+        if max_body_size is None:
+            return cls(r.get_data())
+
+        content_length = r.content_length
+        if content_length is not None and content_length > max_body_size:
+            raise PayloadTooLargeError(max_body_size)
+
+        if content_length is None:
+            raw_body = cls._read_limited(r.stream, max_body_size)
+        else:
+            raw_body = r.get_data()
+
+        if len(raw_body) > max_body_size:
+            raise PayloadTooLargeError(max_body_size)
+
+        return cls(raw_body)
+
+    @staticmethod
+    def _read_limited(stream: IO[bytes], max_body_size: int) -> bytes:
+        """
+        Read a stream in chunks, aborting once more than max_body_size bytes arrived.
+        """
+        chunks = []
+        total = 0
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_body_size:
+                raise PayloadTooLargeError(max_body_size)
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    @property
+    def json(self) -> Any:
+        """
+        The request body decoded as JSON.
+
+        Raises:
+            json.JSONDecodeError: If the body is not valid JSON. The error is cached as well,
+                                  so repeated access does not parse the body again.
+        """
+        if self._json is _UNSET and self._json_error is None:
+            try:
+                self._json = codec.loads(self.raw_body)
+            except ValueError as e:
+                logger.debug("Failed to parse request body as JSON: %s", e)
+                self._json_error = e
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    @property
+    def json_parsed(self) -> bool:
+        """
+        Whether the body was already decoded successfully as JSON.
+        """
+        return self._json is not _UNSET
+
+    @property
+    def body_hash(self) -> str:
+        """
+        The hex encoded SHA-256 digest of the raw request body.
+        """
+        if self._body_hash is None:
+            self._body_hash = hashlib.sha256(self.raw_body).hexdigest()
+        return self._body_hash
+
+    @property
+    def text(self) -> str:
+        """
+        The raw request body decoded as UTF-8.
+        """
+        return self.raw_body.decode("utf-8")
+
+
+def hold_response(response: Response, pending: List[threading.Event]) -> Response:
+    """
+    Keep a response open until background work of the request finished.
+
+    The plugin SDK ends the session of a request once the response is complete, and Dify can
+    only be invoked within that session. A buffered body is therefore sent right away with its
+    Content-Length, so clients can finish reading it, but the response only completes when every
+    pending event is set, including events added while it is held.
+
+    Args:
+        response: The response for the caller
+        pending: The events that are set when the background work finished
+
+    Returns:
+        The response, streamed if it waits for pending work
+    """
+    if not pending:
+        return response
+
+    if response.is_streamed:
+        chunks: Iterable[bytes] = response.response
+    else:
+        body = response.get_data()
+        chunks = [body]
+        response.headers["Content-Length"] = str(len(body))
+
+    def relay() -> Iterator[bytes]:
+        yield from chunks
+        while pending:
+            pending.pop().wait()
+
+    response.response = relay()
+    return response
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the encoded size of all cached responses, in bytes
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+# Upper bound for the number of cached responses
+MAX_CACHE_ENTRIES = 1024
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache with per-entry TTL and a bound on the total size of its values.
+
+    Sizes are supplied by the caller, typically the length of the encoded response. When
+    either bound is exceeded, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES, max_entries: int = MAX_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            The cached value, or None if it is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: The cache key
+            value: The value to cache
+            ttl: Seconds until the entry expires
+            size: The size the entry accounts for, in bytes
+        """
+        if size > self.max_bytes:
+            logger.debug("Not caching %d byte response, it exceeds the cache size", size)
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+workflow_cache = ResponseCache()
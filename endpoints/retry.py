@@ -0,0 +1,149 @@
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+import httpx
+from dify_plugin.errors.model import (
+    InvokeAuthorizationError, InvokeBadRequestError, InvokeConnectionError, InvokeRateLimitError,
+    InvokeServerUnavailableError)
+from endpoints.bulkhead import BulkheadFullError
+from endpoints.circuit_breaker import CircuitOpenError
+from endpoints.deadline import DeadlineExceededError
+from endpoints.registry import KeyedRegistry
+
+logger = logging.getLogger(__name__)
+
+# Delay before the first retry in seconds, doubled for each further retry
+BASE_DELAY = 0.5
+# Upper bound for the delay between two attempts in seconds
+MAX_DELAY = 8.0
+# Retry tokens earned by each call, so at most this share of calls is retried under load
+RETRY_RATIO = 0.1
+# Retry tokens available before any call earned them, and the upper bound of saved tokens
+MIN_RETRY_TOKENS = 10.0
+MAX_RETRY_TOKENS = 100.0
+
+
+class InvalidResponseError(ValueError):
+    """
+    Raised when Dify returned a response without the expected structure, e.g. a truncated one.
+    """
+
+
+# Errors raised before the app was called, or caused by the request itself
+FATAL_ERRORS = (
+    BulkheadFullError, CircuitOpenError, DeadlineExceededError, InvokeAuthorizationError,
+    InvokeBadRequestError, KeyError, TypeError, ValueError,
+)
+# Checked first, since InvalidResponseError is a ValueError
+RETRYABLE_ERRORS = (
+    InvalidResponseError, ConnectionError, TimeoutError, httpx.TransportError, InvokeConnectionError,
+    InvokeRateLimitError, InvokeServerUnavailableError,
+)
+# The Dify API reports most errors as plain exceptions, so transient ones are recognized by message
+_RETRYABLE_MESSAGE = re.compile(
+    r"time[d ]?out|temporar|unavailable|rate.?limit|too many requests|overloaded|connection (reset|refused|aborted)"
+    r"|exited without response|no response|\b(429|502|503|504)\b",
+    re.IGNORECASE,
+)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error of a Dify invocation as transient or fatal.
+
+    Args:
+        error: The error raised by the invocation
+
+    Returns:
+        True if the same invocation may succeed when it is retried
+    """
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, FATAL_ERRORS):
+        return False
+    return isinstance(error, Exception) and bool(_RETRYABLE_MESSAGE.search(str(error)))
+
+
+class RetryBudget:
+    """
+    Limits retries to a share of the calls, so retries cannot multiply the load on an app that
+    is already overloaded. Each call earns RETRY_RATIO tokens and each retry spends one.
+    """
+
+    def __init__(self, ratio: float = RETRY_RATIO, min_tokens: float = MIN_RETRY_TOKENS,
+                 max_tokens: float = MAX_RETRY_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """
+        Record a call.
+        """
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Take the token for a retry.
+
+        Returns:
+            False if the budget is exhausted and the call must not be retried
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def call_with_retries(fn: Callable[[], Any], max_retries: int, budget: RetryBudget,
+                      deadline: Optional[float] = None, base_delay: float = BASE_DELAY,
+                      max_delay: float = MAX_DELAY) -> Any:
+    """
+    Call a function and retry it on transient errors.
+
+    The delay before each retry is drawn uniformly between 0 and the capped exponential backoff
+    (full jitter), so retries of many requests do not arrive in waves. A retry is skipped when it
+    could not finish before the deadline or the retry budget is exhausted.
+
+    Args:
+        fn: The function to call
+        max_retries: The maximum number of retries after the first attempt
+        budget: The retry budget shared by the calls to the same app
+        deadline: The deadline as time.monotonic() value, or None
+        base_delay: The backoff before the first retry in seconds
+        max_delay: The upper bound of the backoff in seconds
+
+    Returns:
+        The result of fn
+
+    Raises:
+        Exception: The error of the last attempt
+    """
+    budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:  # pylint: disable=broad-except
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if deadline is not None and deadline - time.monotonic() <= delay:
+                logger.warning("Not retrying, the deadline passes before the retry: %s", str(e))
+                raise
+            if not budget.withdraw():
+                logger.warning("Not retrying, the retry budget is exhausted: %s", str(e))
+                raise
+            attempt += 1
+            logger.warning("Retrying (attempt %d/%d) in %.2fs after error: %s", attempt, max_retries, delay, str(e))
+            time.sleep(delay)
+
+
+# The retry budget of each app
+retry_budgets: KeyedRegistry[str, RetryBudget] = KeyedRegistry(lambda app_id: RetryBudget())
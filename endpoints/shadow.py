@@ -0,0 +1,191 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+from endpoints.codec import dumps
+from endpoints.latency import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Number of shadow invocations that run at the same time
+SHADOW_WORKERS = 4
+# Maximum number of shadow invocations that are queued or running, further ones are skipped
+MAX_PENDING_SHADOWS = 50
+# Default for the shadow_percentage setting
+DEFAULT_SHADOW_PERCENTAGE = 10
+
+
+def _output_size(response: Any) -> int:
+    """
+    The size of the outputs of a workflow response in bytes, serialized as JSON.
+    """
+    data = response.get("data") if isinstance(response, dict) else None
+    outputs = data.get("outputs") if isinstance(data, dict) else response
+    return len(dumps(outputs))
+
+
+def _failed(response: Any) -> bool:
+    data = response.get("data") if isinstance(response, dict) else None
+    return not isinstance(data, dict) or data.get("status") == "failed"
+
+
+class InvocationStats:
+    """
+    The latency and output size of the invocations of one app.
+    """
+
+    def __init__(self):
+        self.invocations = 0
+        self.errors = 0
+        self.output_bytes = 0
+        self.latency = LatencyWindow(min_samples=1)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, response: Any) -> None:
+        """
+        Record a completed invocation.
+        """
+        failed = _failed(response)
+        size = 0 if failed else _output_size(response)
+        with self._lock:
+            self.invocations += 1
+            if failed:
+                self.errors += 1
+            else:
+                self.output_bytes += size
+        if not failed:
+            self.latency.record(seconds)
+
+    def record_error(self) -> None:
+        """
+        Record an invocation that raised an error.
+        """
+        with self._lock:
+            self.invocations += 1
+            self.errors += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the stats for the report.
+        """
+        with self._lock:
+            succeeded = self.invocations - self.errors
+            return {
+                "invocations": self.invocations,
+                "errors": self.errors,
+                "latency_p50": self.latency.percentile(50),
+                "latency_p95": self.latency.percentile(95),
+                "mean_output_bytes": self.output_bytes / succeeded if succeeded else None,
+            }
+
+
+class ShadowTraffic:
+    """
+    Mirrors a sample of the invocations of an app to a candidate app and compares both.
+
+    Shadow invocations run on a small worker pool of their own, so the primary response never
+    waits for them. Their results are only measured and then discarded. When too many shadow
+    invocations are pending, further ones are skipped instead of queued.
+    """
+
+    def __init__(self, workers: int = SHADOW_WORKERS, max_pending: int = MAX_PENDING_SHADOWS):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook-shadow")
+        self._pending = 0
+        self._comparisons: Dict[Tuple[str, str], Tuple[InvocationStats, InvocationStats]] = {}
+        self._lock = threading.Lock()
+
+    def call(self, app_id: str, shadow_app_id: str, percentage: int, primary: Callable[[], Any],
+             shadow: Callable[[], Any], pending: Optional[List[threading.Event]] = None) -> Any:
+        """
+        Call the primary app and, for the given percentage of calls, mirror the call to the shadow app.
+
+        Args:
+            app_id: The ID of the primary app
+            shadow_app_id: The ID of the candidate app
+            percentage: The percentage of calls that are mirrored
+            primary: The function calling the primary app
+            shadow: The function calling the candidate app, its result is discarded
+            pending: If given, an event that is set when the shadow call finished is added to it
+
+        Returns:
+            The result of the primary call
+        """
+        if random.random() * 100 >= percentage or not self._mirror(app_id, shadow_app_id, shadow, pending):
+            return primary()
+
+        stats = self._stats(app_id, shadow_app_id)[0]
+        started = time.monotonic()
+        try:
+            response = primary()
+        except Exception:
+            stats.record_error()
+            raise
+        stats.record(time.monotonic() - started, response)
+        return response
+
+    def report(self, app_ids: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Compare the primary and the shadow invocations of each pair of apps.
+
+        Args:
+            app_ids: The apps to report on, pairs are left out unless both apps are among them.
+                     None reports all pairs.
+        """
+        with self._lock:
+            comparisons = [
+                (apps, stats) for apps, stats in self._comparisons.items()
+                if app_ids is None or (apps[0] in app_ids and apps[1] in app_ids)
+            ]
+        return [
+            {
+                "app_id": app_id,
+                "shadow_app_id": shadow_app_id,
+                "primary": primary.to_dict(),
+                "shadow": shadow.to_dict(),
+            }
+            for (app_id, shadow_app_id), (primary, shadow) in comparisons
+        ]
+
+    def _mirror(self, app_id: str, shadow_app_id: str, shadow: Callable[[], Any],
+                pending: Optional[List[threading.Event]]) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.warning("Skipped shadow invocation of app_id %s, %d are pending", shadow_app_id, self._pending)
+                return False
+            self._pending += 1
+
+        stats = self._stats(app_id, shadow_app_id)[1]
+        done = threading.Event()
+        if pending is not None:
+            pending.append(done)
+
+        def run() -> None:
+            started = time.monotonic()
+            try:
+                response = shadow()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Shadow invocation of app_id %s failed: %s", shadow_app_id, str(e))
+                stats.record_error()
+            else:
+                stats.record(time.monotonic() - started, response)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                done.set()
+
+        self._executor.submit(run)
+        return True
+
+    def _stats(self, app_id: str, shadow_app_id: str) -> Tuple[InvocationStats, InvocationStats]:
+        with self._lock:
+            stats = self._comparisons.get((app_id, shadow_app_id))
+            if stats is None:
+                stats = (InvocationStats(), InvocationStats())
+                self._comparisons[(app_id, shadow_app_id)] = stats
+            return stats
+
+
+shadow_traffic = ShadowTraffic()
@@ -0,0 +1,31 @@
+import logging
+from typing import Mapping
+from werkzeug import Request, Response
+from dify_plugin import Endpoint
+from endpoints.helpers import validate_api_key
+from endpoints.codec import json_response
+from endpoints.shadow import shadow_traffic
+from endpoints.app_scope import endpoint_apps
+
+logger = logging.getLogger(__name__)
+
+class ShadowReportEndpoint(Endpoint):
+    """
+    Compares the latency and output size of the workflow runs of each app with those of the
+    candidate app its traffic is mirrored to.
+
+    The report covers the runs since the plugin process started, latency percentiles cover the
+    most recent runs. It only includes the apps the endpoint invoked or names in its settings.
+    """
+
+    def _invoke(self, r: Request, values: Mapping, settings: Mapping) -> Response:
+        """
+        Returns the comparison report.
+        """
+        validation_response = validate_api_key(r, settings)
+        if validation_response:
+            logger.debug("API key validation failed: %s", validation_response)
+            return validation_response
+
+        app_ids = endpoint_apps.get(getattr(self.session, "endpoint_id", None), settings)
+        return json_response({"comparisons": shadow_traffic.report(app_ids)}, status=200)
@@ -0,0 +1,79 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """
+    An invocation in flight that other callers with the same key can wait for.
+    """
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent invocations.
+
+    While a call for a key is in flight, further calls with the same key do not invoke the
+    function again but wait for the running call and share its result or exception. The key
+    is forgotten as soon as the call finished, so nothing is cached beyond the call itself.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, unless a call with the same key is already in flight.
+
+        Args:
+            key: The key identifying identical invocations
+            fn: The function to run
+
+        Returns:
+            The result of fn, either from this call or from the call in flight
+
+        Raises:
+            Exception: The exception raised by fn, re-raised for every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            logger.info("Joining invocation in flight for key %s", key)
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            if call.waiters:
+                logger.info("Shared invocation result with %d waiting requests", call.waiters)
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+workflow_flights = SingleFlight()
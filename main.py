@@ -1,6 +1,13 @@
 from dify_plugin import Plugin, DifyPluginEnv
+from endpoints.helpers import MAX_REQUEST_TIMEOUT
+from endpoints.callback_dispatcher import install_shutdown_handler
+from endpoints.callback_outbox import replay_pending_callbacks, shutdown_callbacks
 
-plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=120))
+plugin = Plugin(DifyPluginEnv(MAX_REQUEST_TIMEOUT=MAX_REQUEST_TIMEOUT))
 
 if __name__ == '__main__':
+    # Send the callbacks a previous run of the plugin could not deliver
+    replay_pending_callbacks()
+    # The daemon stops the plugin with SIGTERM, which skips atexit handlers
+    install_shutdown_handler(shutdown_callbacks)
     plugin.run()
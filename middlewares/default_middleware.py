@@ -2,6 +2,8 @@ import json
 import logging
 from typing import Mapping
 from werkzeug import Request, Response
+from endpoints.request_context import RequestContext
+from endpoints import codec
 
 logger = logging.getLogger(__name__)
 
@@ -13,27 +15,47 @@ class DefaultMiddleware:
     be extended or supplemented by custom middlewares for third-party services.
     """
 
-    def invoke(self, r: Request, settings: Mapping) -> Response:
+    def invoke(self, r: Request, settings: Mapping, context: RequestContext) -> Response:
         """
         Handle the incoming request with optional transformations based on settings.
         """
-        logger.debug("Request received with body: %s", r.data)
+        logger.debug("Request received with %d byte body", context.content_length)
 
         if settings.get("json_string_input", False):
-            self.transform_request_body(r)
+            if settings.get("json_string_raw", False):
+                self.forward_request_body(context)
+            else:
+                self.transform_request_body(context)
 
         return None
 
-    def transform_request_body(self, request: Request) -> bool:
+    def transform_request_body(self, context: RequestContext) -> bool:
         """
         Transform the request body into a JSON string and attach it to the request
-        object for subsequent processing.
+        context for subsequent processing.
         """
         try:
             logger.debug("Transform request body to json string")
-            request_json = request.get_json()
+            request_json = context.json
+            # Encoded with the standard library, so the string keeps its established format
             json_string = json.dumps(request_json)
-            request.default_middleware_json = {'json_string': json_string}
+            context.middleware_json = {'json_string': json_string}
         except (TypeError, ValueError) as e:
             logger.error(
                 "Failed to parse request JSON for request transformation: %s", e)
+
+    def forward_request_body(self, context: RequestContext) -> None:
+        """
+        Attach the original request body text as JSON string without re-encoding it.
+
+        The body is only validated, never re-serialized, so the sender's exact formatting
+        is preserved and no second encode of a large payload is needed.
+        """
+        try:
+            logger.debug("Forward raw request body as json string")
+            if not context.json_parsed:
+                codec.validate(context.raw_body)
+            context.middleware_json = {'json_string': context.text}
+        except (TypeError, ValueError) as e:
+            logger.error(
+                "Failed to validate request JSON for request forwarding: %s", e)
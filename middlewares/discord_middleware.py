@@ -1,8 +1,9 @@
-import json
 import logging
 from werkzeug import Request, Response
 from nacl.signing import VerifyKey
 from nacl.exceptions import BadSignatureError
+from endpoints.request_context import RequestContext
+from endpoints.codec import json_response
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +33,7 @@ class DiscordMiddleware:
         self.verify_key = VerifyKey(bytes.fromhex(signature_verification_key))
         logger.info("DiscordMiddleware initialized with verification key")
 
-    def invoke(self, r: Request) -> Response:
+    def invoke(self, r: Request, context: RequestContext) -> Response:
         """
         Process an incoming request from Discord.
         
@@ -41,71 +42,73 @@ class DiscordMiddleware:
         
         Args:
             r (Request): The incoming request to process.
+            context (RequestContext): The parsed request body shared across the pipeline.
             
         Returns:
             Response: A response to send back to Discord, or None if the request
                      doesn't match any expected interaction type.
         """
-        logger.debug("Request received with body: %s", r.data)
+        logger.debug("Request received with %d byte body", context.content_length)
 
-        if not self.verify_request(r):
+        if not self.verify_request(r, context):
             logger.warning("Invalid request signature")
-            return Response(json.dumps({"error": "invalid request signature"}), status=401, content_type="application/json")
+            return json_response({"error": "invalid request signature"}, status=401)
 
         logger.info("Request signature verified")
 
-        if r.method == 'POST' and self.is_ping(r):
+        if r.method == 'POST' and self.is_ping(context):
             logger.info("Ping received, sending ping response")
             return Response(status=204)
-        elif r.method == 'POST' and self.is_webhook_event(r):
+        elif r.method == 'POST' and self.is_webhook_event(context):
             logger.info("Webhook event received, sending acknowledgment")
-            return Response(json.dumps({"type": 1}), content_type="application/json")
+            return json_response({"type": 1})
 
         logger.info("No specific handler for this request")
         return None
 
-    def is_webhook_event(self, request: Request) -> bool:
+    def is_webhook_event(self, context: RequestContext) -> bool:
         """
         Check if the request is a Discord webhook event (type 1).
         
         Args:
-            request (Request): The request to check.
+            context (RequestContext): The parsed request to check.
             
         Returns:
             bool: True if the request is a webhook event, False otherwise.
         """
         try:
             logger.debug("Checking if request is a webhook event")
-            return request.json.get('type') == 1
+            return context.json.get('type') == 1
         except (TypeError, ValueError) as e:
             logger.error("Failed to parse request JSON for webhook event check: %s", e)
             return False
 
-    def is_ping(self, request: Request) -> bool:
+    def is_ping(self, context: RequestContext) -> bool:
         """
         Check if the request is a Discord ping (type 0).
         
         Discord sends this when registering a new webhook to verify it's working.
         
         Args:
-            request (Request): The request to check.
+            context (RequestContext): The parsed request to check.
             
         Returns:
             bool: True if the request is a ping, False otherwise.
         """
         try:
             logger.debug("Checking if request is a ping")
-            return request.json.get('type') == 0
+            return context.json.get('type') == 0
         except (TypeError, ValueError) as e:
             logger.error("Failed to parse request JSON for ping check: %s", e)
             return False
 
-    def verify_request(self, request: Request) -> bool:
+    def verify_request(self, request: Request, context: RequestContext) -> bool:
         """
         Verify the authenticity of a Discord request using Ed25519 signatures.
         
         Args:
             request (Request): The request to verify.
+            context (RequestContext): The parsed request holding the raw body.
             
         Returns:
             bool: True if the request signature is valid, False otherwise.
@@ -114,11 +117,10 @@ class DiscordMiddleware:
             logger.debug("Verifying request with headers: %s", request.headers)
             signature = request.headers['X-Signature-Ed25519']
             timestamp = request.headers['X-Signature-Timestamp']
-            body = request.data.decode('utf-8')
 
-            logger.debug("Signature: %s, Timestamp: %s, Body: %s", signature, timestamp, body)
+            logger.debug("Signature: %s, Timestamp: %s, Body: %s", signature, timestamp, context.raw_body)
             self.verify_key.verify(
-                f'{timestamp}{body}'.encode(), bytes.fromhex(signature))
+                timestamp.encode() + context.raw_body, bytes.fromhex(signature))
             logger.info("Request signature successfully verified")
             return True
         except (BadSignatureError, KeyError) as e:
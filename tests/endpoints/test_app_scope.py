@@ -0,0 +1,26 @@
+import unittest
+from endpoints.app_scope import EndpointApps
+
+
+class TestEndpointApps(unittest.TestCase):
+    def test_get(self):
+        """
+        Tests that an endpoint sees the apps it invoked and the apps named in its settings only.
+        """
+        apps = EndpointApps()
+        apps.add("endpoint-a", "invoked-app")
+        apps.add("endpoint-b", "other-app")
+        settings = {
+            "static_app_id": {"app_id": "static-app"},
+            "canary_app_id": "canary-app",
+            "shadow_app_id": "",
+            "replica_app_ids": "replica-1:2, replica-2\nreplica-3",
+        }
+
+        self.assertEqual(apps.get("endpoint-a", settings), {
+            "invoked-app", "static-app", "canary-app", "replica-1", "replica-2", "replica-3"})
+        self.assertEqual(apps.get("endpoint-c", {}), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from endpoints.bulkhead import Bulkhead, BulkheadFullError
+
+
+class TestBulkhead(unittest.TestCase):
+    def setUp(self):
+        self.bulkhead = Bulkhead()
+
+    def test_app_limit(self):
+        """
+        Tests that the per-app limit rejects further invocations of the same app only.
+        """
+        with self.bulkhead.slot("app", limit=1, total_limit=0, max_queued=0):
+            with self.assertRaises(BulkheadFullError) as error:
+                self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=0)
+            self.assertEqual(error.exception.scope, "app")
+
+            with self.bulkhead.slot("other-app", limit=1, total_limit=0, max_queued=0):
+                self.assertEqual(self.bulkhead.active("other-app"), 1)
+
+        self.assertEqual(self.bulkhead.active("app"), 0)
+
+    def test_total_limit(self):
+        """
+        Tests that the total limit applies across apps.
+        """
+        with self.bulkhead.slot("app", limit=0, total_limit=1, max_queued=0):
+            with self.assertRaises(BulkheadFullError) as error:
+                self.bulkhead.acquire("other-app", limit=0, total_limit=1, max_queued=0)
+            self.assertEqual(error.exception.scope, "total")
+
+    def test_queued_invocation_gets_released_slot(self):
+        """
+        Tests that a queued invocation takes the slot as soon as it is released.
+        """
+        self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=1)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            queued = executor.submit(self.bulkhead.acquire, "app", 1, 0, 1, 5)
+            while self.bulkhead._queued == 0:
+                time.sleep(0.01)
+            # The queue is full, so further invocations are rejected right away
+            with self.assertRaises(BulkheadFullError):
+                self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=1)
+            self.bulkhead.release("app")
+            queued.result(timeout=5)
+
+        self.assertEqual(self.bulkhead.active("app"), 1)
+
+    def test_queued_invocation_times_out(self):
+        """
+        Tests that a queued invocation is rejected when no slot becomes free in time.
+        """
+        self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=1)
+
+        with self.assertRaises(BulkheadFullError):
+            self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=1, timeout=0.05)
+        self.assertEqual(self.bulkhead._queued, 0)
+
+    def _queue(self, executor, lane, order):
+        """
+        Queues an invocation of "app" in a lane that records its lane once it got a slot.
+        """
+        queued = self.bulkhead._queued
+
+        def run():
+            self.bulkhead.acquire("app", 1, 0, 10, 5, lane)
+            order.append(lane)
+            self.bulkhead.release("app")
+
+        future = executor.submit(run)
+        while self.bulkhead._queued == queued:
+            time.sleep(0.01)
+        return future
+
+    def test_higher_lanes_are_served_first(self):
+        """
+        Tests that a queued interactive invocation overtakes queued bulk invocations.
+        """
+        order = []
+        self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=10)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [self._queue(executor, lane, order) for lane in ("bulk", "bulk", "interactive")]
+            self.bulkhead.release("app")
+            for future in futures:
+                future.result(timeout=5)
+
+        self.assertEqual(order, ["interactive", "bulk", "bulk"])
+
+    def test_starving_invocations_are_served_first(self):
+        """
+        Tests that an invocation that waited longer than max_lane_wait is served before higher lanes.
+        """
+        self.bulkhead = Bulkhead(max_lane_wait=0)
+        order = []
+        self.bulkhead.acquire("app", limit=1, total_limit=0, max_queued=10)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [self._queue(executor, lane, order) for lane in ("bulk", "interactive")]
+            self.bulkhead.release("app")
+            for future in futures:
+                future.result(timeout=5)
+
+        self.assertEqual(order, ["bulk", "interactive"])
+
+
+if __name__ == '__main__':
+    unittest.main()
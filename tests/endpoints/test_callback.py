@@ -11,8 +11,7 @@ class TestWebhookCallback:
     @pytest.fixture
     def webhook_endpoint(self):
         """Create a WebhookEndpoint instance for testing."""
-        endpoint = WebhookEndpoint()
-        endpoint.session = Mock()
+        endpoint = WebhookEndpoint(Mock())
         endpoint.session.app = Mock()
         endpoint.session.app.workflow = Mock()
         return endpoint
@@ -142,13 +141,13 @@ class TestWebhookCallback:
         callback_url = "https://example.com/callback"
         app_id = "app-456"
         
-        with patch('asyncio.create_task') as mock_create_task:
+        with patch('endpoints.invoke_endpoint.callback_dispatcher') as mock_dispatcher:
             webhook_endpoint._send_callback_async(
                 callback_url, None, sample_workflow_response, app_id
             )
             
-            # Verify that asyncio.create_task was called
-            mock_create_task.assert_called_once()
+            # Verify that the callback was queued on the dispatcher
+            mock_dispatcher.submit.assert_called_once()
 
     def test_callback_payload_structure(self, webhook_endpoint, sample_workflow_response):
         """Test that callback payload has the correct structure."""
@@ -0,0 +1,109 @@
+import asyncio
+import signal
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from endpoints.callback_dispatcher import CallbackDispatcher, install_shutdown_handler
+
+
+class TestCallbackDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = CallbackDispatcher(workers=1, max_queued=1)
+        self.addCleanup(self.dispatcher.drain, 1.0)
+
+    def test_sends_callbacks_on_its_event_loop(self):
+        """
+        Tests that callbacks submitted from synchronous code run on the dispatcher's event loop.
+        """
+        sent = threading.Event()
+        loops = []
+
+        async def send():
+            loops.append(asyncio.get_running_loop())
+            sent.set()
+
+        self.assertTrue(self.dispatcher.submit(send))
+
+        self.assertTrue(sent.wait(5))
+        self.assertIs(loops[0], self.dispatcher._loop)
+
+    def test_full_queue_drops_callbacks(self):
+        """
+        Tests that callbacks are dropped after waiting when the queue stays full.
+        """
+        release = threading.Event()
+        started = threading.Event()
+
+        async def slow():
+            started.set()
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+
+        async def noop():
+            pass
+
+        self.assertTrue(self.dispatcher.submit(slow))
+        self.assertTrue(started.wait(5))
+        # The worker is busy, so the next callback waits in the queue and the one after is dropped
+        self.assertTrue(self.dispatcher.submit(noop))
+        self.assertFalse(self.dispatcher.submit(noop, timeout=0.05))
+        release.set()
+
+        samples = {name: value for name, labels, value in self.dispatcher.collect() if not labels}
+        self.assertEqual(samples["webhook_callbacks_dropped_total"], 1)
+
+    def test_drain_waits_for_pending_callbacks(self):
+        """
+        Tests that draining waits for queued callbacks and then rejects new ones.
+        """
+        sent = []
+
+        async def send():
+            await asyncio.sleep(0.05)
+            sent.append(True)
+
+        self.dispatcher.submit(send)
+        self.dispatcher.submit(send)
+
+        self.assertTrue(self.dispatcher.drain(5))
+        self.assertEqual(sent, [True, True])
+        self.assertFalse(self.dispatcher.submit(send))
+
+    def test_send_latency_is_recorded(self):
+        """
+        Tests that the send latency of completed callbacks is reported as a histogram.
+        """
+        async def send():
+            raise ValueError("Connection refused")
+
+        self.dispatcher.submit(send)
+        self.dispatcher.drain(5)
+
+        samples = {(name, labels.get("le")): value for name, labels, value in self.dispatcher.collect()}
+        self.assertEqual(samples[("webhook_callback_send_seconds_count", None)], 1)
+        self.assertEqual(samples[("webhook_callback_send_seconds_bucket", "0.1")], 1)
+        self.assertEqual(samples[("webhook_callback_queue_depth", None)], 0)
+
+
+
+class TestShutdownHandler(unittest.TestCase):
+    @patch('endpoints.callback_dispatcher.os.kill')
+    @patch('endpoints.callback_dispatcher.signal.signal')
+    def test_sigterm_runs_shutdown(self, mock_signal, mock_kill):
+        """
+        Tests that SIGTERM runs the shutdown function and then terminates with the default action.
+        """
+        shutdown = Mock()
+        install_shutdown_handler(shutdown)
+        signum, handle = mock_signal.call_args[0]
+        self.assertEqual(signum, signal.SIGTERM)
+
+        handle(signal.SIGTERM, None)
+
+        shutdown.assert_called_once()
+        mock_signal.assert_called_with(signal.SIGTERM, signal.SIG_DFL)
+        self.assertEqual(mock_kill.call_args[0][1], signal.SIGTERM)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+from endpoints.callback_outbox import CallbackOutbox, replay_pending_callbacks
+
+
+class TestCallbackOutbox(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "outbox.db")
+        self.outbox = CallbackOutbox(self.path)
+        self.addCleanup(self.outbox.close)
+
+    def test_pending_callbacks_survive_restart(self):
+        """
+        Tests that stored callbacks are pending after reopening until they are delivered.
+        """
+        first = self.outbox.append("https://example.com/a", "token", {"data": {"id": 1}}, "app")
+        second = self.outbox.append("https://example.com/b", None, {"data": {"id": 2}}, "app")
+        self.outbox.mark_done(first)
+        self.outbox.close()
+
+        reopened = CallbackOutbox(self.path)
+        self.addCleanup(reopened.close)
+        entries = reopened.pending()
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].id, second)
+        self.assertEqual(entries[0].callback_url, "https://example.com/b")
+        self.assertIsNone(entries[0].secret_token)
+        self.assertEqual(entries[0].payload, {"data": {"id": 2}})
+
+    def test_expired_callbacks_are_not_replayed(self):
+        """
+        Tests that callbacks older than the maximum age are discarded.
+        """
+        self.outbox.max_age = -1
+        self.outbox.append("https://example.com/a", None, {}, "app")
+
+        self.assertEqual(self.outbox.pending(), [])
+
+    def count_rows(self) -> int:
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute("SELECT COUNT(*) FROM callbacks").fetchone()[0]
+
+    def test_delivered_callbacks_are_deleted(self):
+        """
+        Tests that a delivered callback is removed from the database while the outbox is open.
+        """
+        first = self.outbox.append("https://example.com/a", None, {"data": {"id": 1}}, "app")
+        self.outbox.mark_done(first)
+        # Writes are committed in order, so the deletion is committed once the next append is
+        self.outbox.append("https://example.com/b", None, {"data": {"id": 2}}, "app")
+
+        self.assertEqual(self.count_rows(), 1)
+
+    @patch('endpoints.callback_outbox.PURGE_INTERVAL', 0)
+    def test_expired_callbacks_are_purged(self):
+        """
+        Tests that expired callbacks are removed from the database while the outbox is open.
+        """
+        self.outbox.max_age = -1
+        self.outbox.append("https://example.com/a", None, {}, "app")
+
+        self.assertEqual(self.count_rows(), 0)
+
+    def test_concurrent_appends_share_commits(self):
+        """
+        Tests that callbacks stored at the same time are all committed, in batches, with their own IDs.
+        """
+        commit = self.outbox._commit
+        batches = []
+
+        def record_batch(writes):
+            batches.append(len(writes))
+            commit(writes)
+
+        self.outbox._open()
+        ids = []
+        with patch.object(self.outbox, "_commit", side_effect=record_batch):
+            threads = [threading.Thread(target=lambda: ids.append(
+                self.outbox.append("https://example.com", None, {}, "app"))) for _ in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sum(batches), 50)
+        self.assertEqual(len(set(ids)), 50)
+        self.assertEqual(len(self.outbox.pending()), 50)
+
+    def test_unavailable_outbox(self):
+        """
+        Tests that callbacks are not stored when the database cannot be opened.
+        """
+        outbox = CallbackOutbox(os.path.join(self.path, "missing", "outbox.db"))
+
+        self.assertIsNone(outbox.append("https://example.com", None, {}, "app"))
+        self.assertEqual(outbox.pending(), [])
+
+    @patch('endpoints.callback_outbox.post_callback', new_callable=AsyncMock)
+    @patch('endpoints.callback_outbox.callback_dispatcher')
+    def test_replay(self, mock_dispatcher, mock_post_callback):
+        """
+        Tests that pending callbacks are dispatched on startup and marked done once delivered.
+        """
+        self.assertIsNotNone(self.outbox.append("https://example.com/a", "token", {"data": {}}, "app"))
+        sends = []
+        mock_dispatcher.submit.side_effect = lambda send, timeout: sends.append(send) or True
+        mock_post_callback.return_value = True
+
+        replay_pending_callbacks(self.outbox).join(5)
+        self.assertEqual(len(sends), 1)
+        asyncio.run(sends[0]())
+
+        mock_post_callback.assert_awaited_once_with("https://example.com/a", "token", {"data": {}}, "app")
+        self.outbox.close()
+        reopened = CallbackOutbox(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.pending(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
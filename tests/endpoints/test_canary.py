@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import Mock, patch
+from endpoints.bulkhead import BulkheadFullError
+from endpoints.canary import CANARY, STABLE, CanaryRelease
+from endpoints.deadline import DeadlineExceededError
+
+
+def succeeded(app_id):
+    return {"data": {"status": "succeeded", "outputs": {"app": app_id}}}
+
+
+@patch('endpoints.canary.time.monotonic')
+class TestCanaryRelease(unittest.TestCase):
+    def setUp(self):
+        self.release = CanaryRelease("stable-app", "canary-app")
+
+    def _calls(self, mock_monotonic, count, seconds, fn=succeeded):
+        for _ in range(count):
+            mock_monotonic.side_effect = [100.0, 100.0 + seconds]
+            try:
+                self.release.call(50, fn)
+            except ValueError:
+                pass
+
+    @patch('endpoints.canary.random.random')
+    def test_split(self, mock_random, mock_monotonic):
+        """
+        Tests that the configured percentage of calls is sent to the canary.
+        """
+        mock_monotonic.return_value = 100.0
+        mock_random.return_value = 0.49
+        self.assertEqual(self.release.call(50, succeeded)["data"]["outputs"]["app"], "canary-app")
+        mock_random.return_value = 0.5
+        self.assertEqual(self.release.call(50, succeeded)["data"]["outputs"]["app"], "stable-app")
+        self.assertEqual(self.release.call(0, succeeded)["data"]["outputs"]["app"], "stable-app")
+
+    @patch('endpoints.canary.random.random')
+    def test_rollback_on_latency_regression(self, mock_random, mock_monotonic):
+        """
+        Tests that the canary is rolled back when its p95 latency regresses.
+        """
+        mock_random.return_value = 0.9
+        self._calls(mock_monotonic, 20, 1.0)
+        mock_random.return_value = 0.1
+        self._calls(mock_monotonic, 19, 2.0)
+        self.assertIsNone(self.release.rollback_reason)
+
+        self._calls(mock_monotonic, 1, 2.0)
+
+        self.assertIn("p95 latency", self.release.rollback_reason)
+        mock_monotonic.side_effect = None
+        mock_monotonic.return_value = 100.0
+        self.assertEqual(self.release.call(50, succeeded)["data"]["outputs"]["app"], "stable-app")
+
+    @patch('endpoints.canary.random.random')
+    def test_rollback_on_error_rate(self, mock_random, mock_monotonic):
+        """
+        Tests that the canary is rolled back when its error rate regresses.
+        """
+        mock_random.return_value = 0.9
+        self._calls(mock_monotonic, 20, 1.0)
+        mock_random.return_value = 0.1
+        self._calls(mock_monotonic, 18, 1.0)
+        self._calls(mock_monotonic, 2, 1.0, Mock(side_effect=ValueError("Provider error")))
+
+        self.assertIn("error rate", self.release.rollback_reason)
+        self.assertEqual(self.release.stats[CANARY].errors, 2)
+
+    @patch('endpoints.canary.random.random')
+    def test_new_percentage_restarts_rollout(self, mock_random, mock_monotonic):
+        """
+        Tests that changing the percentage after a rollback starts a new rollout.
+        """
+        mock_monotonic.return_value = 100.0
+        mock_random.return_value = 0.1
+        self.release.call(50, succeeded)
+        self.release.rollback_reason = "p95 latency"
+
+        self.assertEqual(self.release.call(20, succeeded)["data"]["outputs"]["app"], "canary-app")
+        self.assertIsNone(self.release.rollback_reason)
+        self.assertEqual(self.release.stats[CANARY].calls, 1)
+
+    def test_rejected_calls_are_not_recorded(self, mock_monotonic):
+        """
+        Tests that calls rejected by the concurrency limits or whose deadline passed do not count as errors.
+        """
+        mock_monotonic.return_value = 100.0
+        with self.assertRaises(BulkheadFullError):
+            self.release.call(0, Mock(side_effect=BulkheadFullError("app")))
+        with self.assertRaises(DeadlineExceededError):
+            self.release.call(0, Mock(side_effect=DeadlineExceededError()))
+
+        self.assertEqual(self.release.stats[STABLE].calls, 0)
+
+    def test_samples(self, mock_monotonic):
+        """
+        Tests that the latency histogram of each variant is reported.
+        """
+        self._calls(mock_monotonic, 1, 1.5)
+
+        samples = {(name, tuple(sorted(labels.items()))): value for name, labels, value in self.release.samples()}
+        labels = (("app_id", "stable-app"), ("canary_app_id", "canary-app"))
+        variant = next(variant for variant in (STABLE, CANARY) if self.release.stats[variant].calls)
+        self.assertEqual(samples[("webhook_canary_percentage", labels)], 50)
+        self.assertEqual(samples[("webhook_canary_latency_seconds_bucket",
+                                  tuple(sorted(labels + (("le", "1.0"), ("variant", variant)))))], 0)
+        self.assertEqual(samples[("webhook_canary_latency_seconds_bucket",
+                                  tuple(sorted(labels + (("le", "2.0"), ("variant", variant)))))], 1)
+        self.assertEqual(samples[("webhook_canary_latency_seconds_sum", labels + (("variant", variant),))], 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
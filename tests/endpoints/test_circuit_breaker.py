@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import patch
+from endpoints.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@patch('endpoints.circuit_breaker.time.monotonic')
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("app", window=60, min_calls=4, failure_rate=0.5, open_seconds=30)
+
+    def _call(self, success):
+        self.breaker.acquire()
+        self.breaker.record(success)
+
+    def test_opens_at_failure_rate(self, mock_monotonic):
+        """
+        Tests that the circuit opens once the failure rate is reached with enough calls.
+        """
+        mock_monotonic.return_value = 100.0
+        self._call(False)
+        self._call(False)
+        self._call(True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self._call(True)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as error:
+            self.breaker.acquire()
+        self.assertEqual(error.exception.retry_after, 30)
+        self.assertTrue(self.breaker.rejects_calls())
+
+        mock_monotonic.return_value = 130.0
+        self.assertFalse(self.breaker.rejects_calls())
+
+    def test_old_failures_leave_the_window(self, mock_monotonic):
+        """
+        Tests that failures older than the window are not counted.
+        """
+        mock_monotonic.return_value = 100.0
+        self._call(False)
+        self._call(False)
+
+        mock_monotonic.return_value = 200.0
+        self._call(True)
+        self._call(True)
+        self._call(False)
+        self._call(True)
+
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_probe(self, mock_monotonic):
+        """
+        Tests that a single probe is let through after the open period and decides the state.
+        """
+        mock_monotonic.return_value = 100.0
+        for _ in range(4):
+            self._call(False)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        mock_monotonic.return_value = 130.0
+        self.breaker.acquire()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        # Only one probe at a time
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.acquire()
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        mock_monotonic.return_value = 160.0
+        self.breaker.acquire()
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_cancelled_probe_allows_next_probe(self, mock_monotonic):
+        """
+        Tests that a probe that was never sent lets the next call probe.
+        """
+        mock_monotonic.return_value = 100.0
+        for _ in range(4):
+            self._call(False)
+
+        mock_monotonic.return_value = 130.0
+        self.breaker.acquire()
+        self.breaker.cancel()
+        self.breaker.acquire()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
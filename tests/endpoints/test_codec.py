@@ -0,0 +1,64 @@
+import json
+import unittest
+from unittest.mock import patch
+from endpoints import codec
+
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        Tests that encoding and decoding returns the original object.
+        """
+        payload = {"text": "héllo", "items": [1, 2.5, None, True], "nested": {"a": "b"}}
+
+        self.assertEqual(codec.loads(codec.dumps(payload)), payload)
+
+    def test_dumps_returns_bytes(self):
+        """
+        Tests that the encoder produces UTF-8 bytes.
+        """
+        self.assertIsInstance(codec.dumps({"a": 1}), bytes)
+
+    def test_loads_invalid_json_raises_json_decode_error(self):
+        """
+        Tests that decode errors are reported as json.JSONDecodeError for every backend.
+        """
+        with self.assertRaises(json.JSONDecodeError):
+            codec.loads(b'invalid json')
+
+    def test_dumps_falls_back_to_stdlib(self):
+        """
+        Tests that objects the fast backend rejects are encoded by the standard library.
+        """
+        with patch('endpoints.codec._dumps', side_effect=TypeError("unsupported")), \
+                patch('endpoints.codec.BACKEND', "orjson"):
+            self.assertEqual(json.loads(codec.dumps({1: "a"})), {"1": "a"})
+
+    def test_json_response(self):
+        """
+        Tests that json_response builds a JSON response with the given status.
+        """
+        response = codec.json_response({"error": "Not found"}, status=404)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content_type, "application/json")
+        self.assertEqual(json.loads(response.data), {"error": "Not found"})
+
+    def test_sse_response(self):
+        """
+        Tests that events are relayed as Server-Sent Events and errors end the stream.
+        """
+        def events():
+            yield {"event": "message"}
+            raise RuntimeError("connection lost")
+
+        response = codec.sse_response(events())
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual(
+            response.get_data(as_text=True),
+            'data: {"event":"message"}\n\nevent: error\ndata: {"error":"connection lost"}\n\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
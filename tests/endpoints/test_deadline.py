@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+from endpoints.deadline import DeadlineExceededError, run_with_deadline, time_left
+
+
+class TestDeadline(unittest.TestCase):
+    def test_time_left(self):
+        """
+        Tests that the time left is returned and a passed deadline raises.
+        """
+        self.assertIsNone(time_left(None))
+        self.assertGreater(time_left(time.monotonic() + 10), 9)
+        with self.assertRaises(DeadlineExceededError):
+            time_left(time.monotonic() - 1)
+
+    def test_run_without_deadline(self):
+        """
+        Tests that functions without a deadline run directly.
+        """
+        self.assertEqual(run_with_deadline(lambda: threading.current_thread(), None), threading.current_thread())
+
+    def test_run_returns_result_before_deadline(self):
+        """
+        Tests that the result is returned when the function finishes in time.
+        """
+        self.assertEqual(run_with_deadline(lambda: "result", time.monotonic() + 5), "result")
+
+    def test_run_gives_up_at_deadline(self):
+        """
+        Tests that the caller stops waiting at the deadline while the function keeps running.
+        """
+        release = threading.Event()
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            run_with_deadline(lambda: release.wait(5), time.monotonic() + 0.05)
+        release.set()
+
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_passed_deadline_drops_work(self):
+        """
+        Tests that a function is not run when the deadline has already passed.
+        """
+        fn = Mock()
+
+        with self.assertRaises(DeadlineExceededError):
+            run_with_deadline(fn, time.monotonic() - 1)
+
+        fn.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import unittest
+from unittest.mock import Mock
+from endpoints.hedging import hedged_call
+from endpoints.retry import RetryBudget
+
+
+class TestHedgedCall(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def slow(self, result):
+        def call():
+            self.release.wait(5)
+            return result
+        return call
+
+    def test_without_delay_calls_primary(self):
+        """
+        Tests that only the primary is called when no hedge delay is known.
+        """
+        replica = Mock()
+
+        self.assertEqual(hedged_call("app", [lambda: "primary", replica], None, RetryBudget()), "primary")
+
+        replica.assert_not_called()
+
+    def test_fast_primary_is_not_hedged(self):
+        """
+        Tests that the replica is not called when the primary answers within the delay.
+        """
+        replica = Mock()
+
+        self.assertEqual(hedged_call("app", [lambda: "primary", replica], 1.0, RetryBudget()), "primary")
+
+        replica.assert_not_called()
+
+    def test_slow_primary_is_hedged(self):
+        """
+        Tests that the replica is started after the delay and its result returned first.
+        """
+        result = hedged_call("app", [self.slow("primary"), lambda: "replica"], 0.01, RetryBudget())
+
+        self.assertEqual(result, "replica")
+
+    def test_hedges_are_not_queued_behind_running_calls(self):
+        """
+        Tests that a replica is started right away while many slow hedged calls are running.
+        """
+        budget = RetryBudget(min_tokens=100)
+        slow_calls = [threading.Thread(target=hedged_call, args=(
+            "app", [self.slow("primary"), self.slow("replica")], 0.01, budget)) for _ in range(64)]
+        for thread in slow_calls:
+            thread.start()
+
+        result = hedged_call("app", [self.slow("primary"), lambda: "replica"], 0.2, budget)
+
+        self.assertEqual(result, "replica")
+        self.release.set()
+        for thread in slow_calls:
+            thread.join(5)
+
+    def test_failed_replica_waits_for_primary(self):
+        """
+        Tests that a failed hedge does not fail the request while the primary still runs.
+        """
+        def replica():
+            threading.Timer(0.05, self.release.set).start()
+            raise TimeoutError("replica timed out")
+
+        result = hedged_call("app", [self.slow("primary"), replica], 0.01, RetryBudget())
+
+        self.assertEqual(result, "primary")
+
+    def test_all_calls_failed(self):
+        """
+        Tests that the error is raised once no call is left running.
+        """
+        with self.assertRaises(ValueError):
+            hedged_call("app", [Mock(side_effect=ValueError("invalid")), Mock()], 1.0, RetryBudget())
+
+    def test_hedge_budget(self):
+        """
+        Tests that no replica is started when the hedge budget is exhausted.
+        """
+        replica = Mock()
+        threading.Timer(0.05, self.release.set).start()
+
+        result = hedged_call("app", [self.slow("primary"), replica], 0.01, RetryBudget(ratio=0.1, min_tokens=0))
+
+        self.assertEqual(result, "primary")
+        replica.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,16 @@ import json
 import unittest
 from unittest.mock import Mock, patch
 from werkzeug import Request, Response
-from endpoints.helpers import apply_middleware, validate_api_key
+from endpoints.helpers import (
+    apply_middleware, check_rate_limits, determine_route, get_deadline, get_priority_lane, get_app_pool, get_replica_app_ids,
+    invocation_key, validate_api_key, get_int_setting, wants_streaming)
+from endpoints.request_context import RequestContext
+from endpoints.rate_limit import TokenBucketLimiter
 
 class TestHelpers(unittest.TestCase):
     def setUp(self):
         self.request = Mock(spec=Request)
+        self.context = RequestContext(b'{"type": 1}')
         self.settings = {
             "middleware": "discord",
             "signature_verification_key": "0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef",
@@ -24,10 +29,10 @@ class TestHelpers(unittest.TestCase):
         mock_response.status_code = 200
         mock_invoke.return_value = mock_response
         
-        response = apply_middleware(self.request, self.settings)
+        response = apply_middleware(self.request, self.settings, self.context)
         
         self.assertEqual(response, mock_response)
-        mock_invoke.assert_called_once_with(self.request)
+        mock_invoke.assert_called_once_with(self.request, self.context)
 
     @patch('endpoints.helpers.DiscordMiddleware.invoke')
     def test_apply_middleware_error(self, mock_invoke):
@@ -37,7 +42,7 @@ class TestHelpers(unittest.TestCase):
         """
         mock_invoke.side_effect = json.JSONDecodeError("Error", "doc", 0)  # Simulates a JSON error
 
-        response = apply_middleware(self.request, self.settings)
+        response = apply_middleware(self.request, self.settings, self.context)
 
         self.assertEqual(response.status_code, 500)
         self.assertIn("Middleware error", response.data.decode())
@@ -55,11 +60,11 @@ class TestHelpers(unittest.TestCase):
         # Default middleware doesn't return a response
         mock_default_invoke.return_value = None
         
-        response = apply_middleware(self.request, self.settings)
+        response = apply_middleware(self.request, self.settings, self.context)
         
         self.assertIsNone(response)
-        mock_discord_invoke.assert_called_once_with(self.request)
-        mock_default_invoke.assert_called_once_with(self.request, self.settings)
+        mock_discord_invoke.assert_called_once_with(self.request, self.context)
+        mock_default_invoke.assert_called_once_with(self.request, self.settings, self.context)
 
     @patch('endpoints.helpers.DiscordMiddleware.invoke')
     @patch('endpoints.helpers.DefaultMiddleware.invoke')
@@ -74,12 +79,12 @@ class TestHelpers(unittest.TestCase):
         # Default middleware raises an exception
         mock_default_invoke.side_effect = json.JSONDecodeError("Error in default", "doc", 0)
         
-        response = apply_middleware(self.request, self.settings)
+        response = apply_middleware(self.request, self.settings, self.context)
         
         self.assertEqual(response.status_code, 500)
         self.assertIn("Default Middleware error", response.data.decode())
-        mock_discord_invoke.assert_called_once_with(self.request)
-        mock_default_invoke.assert_called_once_with(self.request, self.settings)
+        mock_discord_invoke.assert_called_once_with(self.request, self.context)
+        mock_default_invoke.assert_called_once_with(self.request, self.settings, self.context)
 
     @patch('endpoints.helpers.DiscordMiddleware.invoke')
     @patch('endpoints.helpers.DefaultMiddleware')
@@ -97,11 +102,105 @@ class TestHelpers(unittest.TestCase):
         mock_default_middleware_class.return_value = mock_default_middleware
         mock_default_middleware.invoke.return_value = None
         
-        response = apply_middleware(self.request, settings)
+        response = apply_middleware(self.request, settings, self.context)
         
         self.assertIsNone(response)
         mock_discord_invoke.assert_not_called()
-        mock_default_middleware.invoke.assert_called_once_with(self.request, settings)
+        mock_default_middleware.invoke.assert_called_once_with(self.request, settings, self.context)
+
+    @patch('endpoints.helpers.rate_limiter', new_callable=TokenBucketLimiter)
+    def test_check_rate_limits(self, mock_rate_limiter):
+        """
+        Tests that requests over the rate limit of an API key get 429 with Retry-After.
+        """
+        self.request.headers = {"x-api-key": "test_api_key"}
+        self.request.args = {}
+        settings = {"rate_limit_api_key": "1/minute"}
+
+        self.assertIsNone(check_rate_limits(self.request, {}, settings))
+        response = check_rate_limits(self.request, {}, settings)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "60")
+        # Other API keys are not affected
+        self.request.headers = {"x-api-key": "other_api_key"}
+        self.assertIsNone(check_rate_limits(self.request, {}, settings))
+
+    def test_get_priority_lane(self):
+        """
+        Tests that the lane comes from the setting, batch routes use the bulk lane and the
+        X-Priority header can only lower the lane.
+        """
+        settings = {"priority_lane": "interactive"}
+        self.request.headers = {}
+        self.assertEqual(get_priority_lane(self.request, "/single-chatflow", settings), "interactive")
+        self.assertEqual(get_priority_lane(self.request, "/single-workflow/batch", settings), "bulk")
+
+        self.request.headers = {"X-Priority": "bulk"}
+        self.assertEqual(get_priority_lane(self.request, "/single-chatflow", settings), "bulk")
+
+        self.request.headers = {"X-Priority": "interactive"}
+        self.assertEqual(get_priority_lane(self.request, "/single-chatflow", {}), "default")
+
+    def test_get_replica_app_ids(self):
+        """
+        Tests that the other apps of the group of an app are returned as its replicas.
+        """
+        settings = {"replica_app_ids": "app-a, app-b, app-c; app-d,app-e\napp-f, app-g"}
+        self.assertEqual(get_replica_app_ids(settings, "app-b"), ["app-a", "app-c"])
+        self.assertEqual(get_replica_app_ids(settings, "app-e"), ["app-d"])
+        self.assertEqual(get_replica_app_ids(settings, "app-g"), ["app-f"])
+        self.assertEqual(get_replica_app_ids(settings, "app-x"), [])
+        self.assertEqual(get_replica_app_ids({}, "app-a"), [])
+
+    def test_get_app_pool(self):
+        """
+        Tests that the group of an app is returned with the weights of its apps.
+        """
+        settings = {"replica_app_ids": "app-a:3, app-b; app-c, app-d:x"}
+        self.assertEqual(get_app_pool(settings, "app-b"), [("app-a", 3), ("app-b", 1)])
+        self.assertEqual(get_app_pool(settings, "app-c"), [("app-c", 1), ("app-d", 1)])
+        self.assertEqual(get_app_pool(settings, "app-x"), [("app-x", 1)])
+        self.assertEqual(get_replica_app_ids(settings, "app-a"), ["app-b"])
+
+    def test_get_deadline(self):
+        """
+        Tests that the shorter of the setting and the X-Request-Timeout header is used.
+        """
+        self.request.headers = {}
+        self.assertIsNone(get_deadline(self.request, {}, 100.0))
+        self.assertEqual(get_deadline(self.request, {"request_timeout": "30"}, 100.0), 130.0)
+
+        self.request.headers = {"X-Request-Timeout": "10"}
+        self.assertEqual(get_deadline(self.request, {"request_timeout": "30"}, 100.0), 110.0)
+
+        self.request.headers = {"X-Request-Timeout": "3600"}
+        self.assertEqual(get_deadline(self.request, {}, 100.0), 220.0)
+
+    def test_check_rate_limits_invalid_setting(self):
+        """
+        Tests that a malformed rate limit setting returns 500.
+        """
+        self.request.access_route = ["203.0.113.1"]
+
+        response = check_rate_limits(self.request, {}, {"rate_limit_ip": "fast"})
+
+        self.assertEqual(response.status_code, 500)
+
+    @patch('endpoints.helpers.rate_limiter', new_callable=TokenBucketLimiter)
+    def test_check_rate_limits_ignores_spoofed_forwarded_for(self, mock_rate_limiter):
+        """
+        Tests that the client address limit uses the X-Forwarded-For entry of the trusted proxy,
+        so callers cannot avoid it by sending their own first entries.
+        """
+        responses = []
+        for i in range(3):
+            request = Request.from_values(
+                headers={"X-Forwarded-For": f"10.0.0.{i}, 203.0.113.5"}, environ_base={"REMOTE_ADDR": "172.18.0.2"})
+            responses.append(check_rate_limits(request, {}, {"rate_limit_ip": "1/hour, 1"}))
+
+        self.assertIsNone(responses[0])
+        self.assertEqual([response.status_code for response in responses[1:]], [429, 429])
 
     def test_validate_api_key_success(self):
         """
@@ -153,5 +252,64 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(response.status_code, 403)
         self.assertEqual(json.loads(response.data), {"error": "Invalid API key"})
 
+    def test_get_int_setting(self):
+        """
+        Tests get_int_setting parses text-input settings and falls back to the default.
+        """
+        self.assertEqual(get_int_setting({"limit": "42"}, "limit", 10), 42)
+        self.assertEqual(get_int_setting({"limit": ""}, "limit", 10), 10)
+        self.assertEqual(get_int_setting({}, "limit", 10), 10)
+        self.assertEqual(get_int_setting({"limit": "abc"}, "limit", 10), 10)
+
+    def test_wants_streaming(self):
+        """
+        Tests that the query param overrides the Accept header, which overrides the setting.
+        """
+        self.request.args = {}
+        self.request.headers = {}
+        self.assertFalse(wants_streaming(self.request, {}))
+        self.assertTrue(wants_streaming(self.request, {"response_mode": "streaming"}))
+
+        self.request.headers = {"Accept": "text/event-stream"}
+        self.assertTrue(wants_streaming(self.request, {}))
+
+        self.request.args = {"response_mode": "blocking"}
+        self.assertFalse(wants_streaming(self.request, {"response_mode": "streaming"}))
+
+    def test_determine_route(self):
+        """
+        Tests that request paths are mapped to their endpoint routes, including the batch routes.
+        """
+        self.assertEqual(determine_route("/workflow/app-id"), "/workflow/<app_id>")
+        self.assertEqual(determine_route("/workflow/app-id/batch"), "/workflow/<app_id>/batch")
+        self.assertEqual(determine_route("/single-workflow"), "/single-workflow")
+        self.assertEqual(determine_route("/single-workflow/batch"), "/single-workflow/batch")
+        self.assertEqual(determine_route("/chatflow/app-id"), "/chatflow/<app_id>")
+        self.assertIsNone(determine_route("/chatflow/app-id/batch"))
+        self.assertIsNone(determine_route("/unknown"))
+
+    def test_invocation_key(self):
+        """
+        Tests that invocation keys ignore the key order of inputs but distinguish apps and values.
+        """
+        key = invocation_key("app", {"a": 1, "b": {"c": 2, "d": 3}})
+
+        self.assertEqual(key, invocation_key("app", {"b": {"d": 3, "c": 2}, "a": 1}))
+        self.assertNotEqual(key, invocation_key("other-app", {"a": 1, "b": {"c": 2, "d": 3}}))
+        self.assertNotEqual(key, invocation_key("app", {"a": 2, "b": {"c": 2, "d": 3}}))
+
+    def test_invocation_key_excludes_fields(self):
+        """
+        Tests that excluded top-level and nested fields do not change the invocation key.
+        """
+        inputs = {"a": 1, "ts": 100, "event": {"id": "x", "delivery_id": "d1"}}
+        exclude = ["ts", "event.delivery_id"]
+        key = invocation_key("app", inputs, exclude)
+
+        self.assertEqual(key, invocation_key("app", {"a": 1, "ts": 200, "event": {"id": "x", "delivery_id": "d2"}}, exclude))
+        self.assertNotEqual(key, invocation_key("app", {"a": 1, "ts": 100, "event": {"id": "y"}}, exclude))
+        # The inputs themselves are not modified
+        self.assertEqual(inputs["event"]["delivery_id"], "d1")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+from endpoints.http_client import CallbackClients
+
+
+class TestCallbackClients(unittest.TestCase):
+    def setUp(self):
+        self.clients = CallbackClients(max_connections=10, max_keepalive_connections=5, http2=False)
+
+    def test_client_is_shared_on_a_loop(self):
+        """
+        Tests that callbacks on the same event loop share one pooled client.
+        """
+        async def run():
+            first, second = self.clients.get(), self.clients.get()
+            await self.clients.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        self.assertIs(first, second)
+        self.assertTrue(first.is_closed)
+        self.assertEqual(first._transport._pool._max_connections, 10)
+        self.assertEqual(first._transport._pool._max_keepalive_connections, 5)
+
+    def test_client_per_loop(self):
+        """
+        Tests that each event loop gets a client of its own.
+        """
+        async def run():
+            client = self.clients.get()
+            await self.clients.aclose()
+            return client
+
+        self.assertIsNot(asyncio.run(run()), asyncio.run(run()))
+
+    def test_closed_client_is_replaced(self):
+        """
+        Tests that a new client is created when the client of the loop was closed.
+        """
+        async def run():
+            client = self.clients.get()
+            await client.aclose()
+            replacement = self.clients.get()
+            await self.clients.aclose()
+            return client, replacement
+
+        client, replacement = asyncio.run(run())
+
+        self.assertIsNot(client, replacement)
+
+
+if __name__ == '__main__':
+    unittest.main()
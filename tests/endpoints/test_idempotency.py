@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from werkzeug import Response
+from endpoints.codec import json_response
+from endpoints.idempotency import IdempotencyStore
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    def setUp(self):
+        self.store = IdempotencyStore()
+
+    def test_completed_response_is_replayed(self):
+        """
+        Tests that a duplicate receives the stored response without running the handler again.
+        """
+        handler = Mock(return_value=json_response({"result": 1}, headers={"X-Cache": "MISS"}))
+
+        first = self.store.run("key", handler, ttl=60)
+        second = self.store.run("key", handler, ttl=60)
+
+        handler.assert_called_once()
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(second.headers["X-Cache"], "MISS")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_data(), first.get_data())
+
+    def test_duplicate_waits_for_request_in_flight(self):
+        """
+        Tests that a duplicate arriving while the first request runs waits for its response.
+        """
+        release = threading.Event()
+        handler = Mock(side_effect=lambda: release.wait(5) and json_response({"result": 1}))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(self.store.run, "key", handler, 60)
+            while "key" not in self.store._in_flight:
+                time.sleep(0.01)
+            second = executor.submit(self.store.run, "key", handler, 60)
+            release.set()
+            responses = [first.result(timeout=5), second.result(timeout=5)]
+
+        handler.assert_called_once()
+        self.assertEqual(responses[1].get_data(), responses[0].get_data())
+
+    def test_key_reused_with_other_fingerprint(self):
+        """
+        Tests that a key reused with a different fingerprint is rejected, whether the first
+        request is completed or still in flight.
+        """
+        handler = Mock(return_value=json_response({"result": 1}))
+        self.store.run("key", handler, ttl=60, fingerprint="body-a")
+
+        self.assertEqual(self.store.run("key", handler, ttl=60, fingerprint="body-b").status_code, 422)
+        self.assertEqual(self.store.run("key", handler, ttl=60, fingerprint="body-a").status_code, 200)
+        handler.assert_called_once()
+
+        release = threading.Event()
+        in_flight_handler = Mock(side_effect=lambda: release.wait(5) and json_response({"result": 2}))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            first = executor.submit(self.store.run, "other-key", in_flight_handler, 60, "body-a")
+            while "other-key" not in self.store._in_flight:
+                time.sleep(0.01)
+            rejected = self.store.run("other-key", in_flight_handler, ttl=60, fingerprint="body-b")
+            self.assertEqual(rejected.status_code, 422)
+            release.set()
+            self.assertEqual(first.result(timeout=5).status_code, 200)
+
+    def test_server_errors_are_not_stored(self):
+        """
+        Tests that failed requests and exceptions let the next duplicate run the handler again.
+        """
+        handler = Mock(side_effect=[json_response({"error": "failed"}, status=500),
+                                    RuntimeError("Workflow error"),
+                                    json_response({"result": 1})])
+
+        self.assertEqual(self.store.run("key", handler, ttl=60).status_code, 500)
+        with self.assertRaises(RuntimeError):
+            self.store.run("key", handler, ttl=60)
+        self.assertEqual(self.store.run("key", handler, ttl=60).status_code, 200)
+        self.assertEqual(handler.call_count, 3)
+
+    def test_streamed_responses_are_not_stored(self):
+        """
+        Tests that streamed responses are passed through without being stored.
+        """
+        handler = Mock(side_effect=lambda: Response(iter([b"data: {}\n\n"]), content_type="text/event-stream"))
+
+        self.store.run("key", handler, ttl=60)
+        self.store.run("key", handler, ttl=60)
+
+        self.assertEqual(handler.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,22 @@
 # pylint: disable=W0212
 
 import json
+import threading
+import time
 import unittest
 from unittest.mock import Mock, patch, AsyncMock
 from werkzeug import Request, Response
 from dify_plugin.core.runtime import Session
 from endpoints.invoke_endpoint import WebhookEndpoint
+from endpoints.helpers import get_job_scope
+from endpoints.response_cache import ResponseCache
+from endpoints.idempotency import IdempotencyStore
+from endpoints.bulkhead import Bulkhead
+from endpoints.circuit_breaker import CircuitBreakers, CircuitOpenError
+from endpoints.retry import InvalidResponseError
+from endpoints.jobs import JobStore
+from endpoints.request_context import RequestContext
+from endpoints.deadline import DeadlineExceededError
 
 class TestWebhookEndpoint(unittest.TestCase):
     def setUp(self):
@@ -20,9 +31,10 @@ class TestWebhookEndpoint(unittest.TestCase):
 
         # Create a mock request
         self.mock_request = Mock(spec=Request)
-        self.mock_request.get_json = Mock(return_value={})
+        self.mock_request.get_data = Mock(return_value=b"{}")
+        self.mock_request.content_length = 2
         self.mock_request.headers = {}
-        self.mock_request.default_middleware_json = None
+        self.mock_request.args = {}
         
         # Set default path to empty string
         self.mock_request.path = ""
@@ -45,6 +57,11 @@ class TestWebhookEndpoint(unittest.TestCase):
             "static_app_id": "static-app-id"  # Use static_app_id instead of app_id
         }
         
+    def set_request_body(self, body):
+        """Sets the raw JSON body returned by the mock request."""
+        self.mock_request.get_data.return_value = json.dumps(body).encode("utf-8")
+        self.mock_request.content_length = len(self.mock_request.get_data.return_value)
+
     # Reset the mock invocations after each test
     def tearDown(self):
         self.mock_session.app.workflow.invoke.reset_mock()
@@ -104,6 +121,21 @@ class TestWebhookEndpoint(unittest.TestCase):
             {"error": "Invalid API key"}
         )
 
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    def test_body_too_large_rejected_before_middleware(self, mock_apply_middleware):
+        """Tests the maximum body size.
+        Ensures oversized requests are rejected with 413 before any middleware runs."""
+        self.mock_request.content_length = 2048
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, max_body_size="1024")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 413)
+        mock_apply_middleware.assert_not_called()
+        self.mock_request.get_data.assert_not_called()
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
     def test_json_parsing_fails(self, mock_validate_api_key, mock_apply_middleware):
@@ -112,10 +144,8 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
         
-        # Mock both request.get_json and request.default_middleware_json 
-        self.mock_request.get_json.side_effect = json.JSONDecodeError(
-            "Invalid JSON", "doc", 0)
-        self.mock_request.default_middleware_json = None
+        # Send a body that is not valid JSON
+        self.mock_request.get_data.return_value = b"invalid json"
 
         self.mock_request.path = "/single-workflow"
 
@@ -129,18 +159,18 @@ class TestWebhookEndpoint(unittest.TestCase):
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
     def test_default_middleware_json_used(self, mock_validate_api_key, mock_apply_middleware):
-        """Tests usage of default_middleware_json.
+        """Tests usage of middleware_json on the request context.
         Ensures middleware-provided JSON is used instead of request body."""
-        mock_apply_middleware.return_value = None
+        # Set middleware_json which should be used instead of the request body
+        def set_middleware_json(r, settings, context):
+            context.middleware_json = {
+                "inputs": {"from_middleware": "middleware value"}
+            }
+        mock_apply_middleware.side_effect = set_middleware_json
         mock_validate_api_key.return_value = None
 
-        # Set middleware_json which should be used instead of get_json
-        self.mock_request.default_middleware_json = {
-            "inputs": {"from_middleware": "middleware value"}
-        }
-        
-        # Ensure request.get_json won't be called
-        self.mock_request.get_json.side_effect = Exception("Should not be called")
+        # Ensure the request body won't be used
+        self.mock_request.get_data.return_value = b"not used"
         
         self.mock_request.path = "/single-workflow"
 
@@ -176,7 +206,6 @@ class TestWebhookEndpoint(unittest.TestCase):
             mock_apply_middleware.reset_mock()
             mock_validate_api_key.reset_mock()
             
-            mock_apply_middleware.return_value = None
             mock_validate_api_key.return_value = None
             
             self.mock_request.path = path
@@ -187,10 +216,12 @@ class TestWebhookEndpoint(unittest.TestCase):
             else:  # chatflow routes
                 middleware_json = {"query": "Middleware query", "inputs": {}}
                 
-            self.mock_request.default_middleware_json = middleware_json
+            mock_apply_middleware.side_effect = (
+                lambda r, settings, context, middleware_json=middleware_json:
+                    setattr(context, "middleware_json", middleware_json))
             
-            # Make get_json fail to ensure it's not used
-            self.mock_request.get_json.side_effect = Exception("Should not be called")
+            # Make sure the request body is not used
+            self.mock_request.get_data.return_value = b"not used"
             
             response = self.endpoint._invoke(self.mock_request, values, settings)
             
@@ -221,7 +252,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/single-workflow"
 
         response = self.endpoint._invoke(
@@ -246,7 +277,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.set_request_body({"inputs": {}})
         self.mock_request.path = "/single-workflow"
         
         # Remove static_app_id from settings
@@ -267,7 +298,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": "not a dictionary"}
+        self.set_request_body({"inputs": "not a dictionary"})
         self.mock_request.path = "/single-workflow"
 
         response = self.endpoint._invoke(
@@ -285,7 +316,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/single-workflow"
         
         settings_with_raw_output = dict(self.default_settings)
@@ -306,7 +337,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"param1": "value1", "param2": "value2"}
+        self.set_request_body({"param1": "value1", "param2": "value2"})
         self.mock_request.path = "/single-workflow"
         
         settings_no_explicit_inputs = dict(self.default_settings)
@@ -330,7 +361,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.set_request_body({"inputs": {}})
         self.mock_request.path = "/single-workflow"
         
         # Make workflow.invoke raise an exception
@@ -352,10 +383,10 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/single-chatflow"
 
         response = self.endpoint._invoke(
@@ -382,10 +413,10 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/single-chatflow"
         
         # Remove static_app_id from settings
@@ -406,7 +437,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.set_request_body({"inputs": {}})
         self.mock_request.path = "/single-chatflow"
 
         response = self.endpoint._invoke(
@@ -424,10 +455,10 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": 123,  # Not a string
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/single-chatflow"
 
         response = self.endpoint._invoke(
@@ -445,11 +476,11 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "conversation_id": "123",
             "param1": "value1"
-        }
+        })
         self.mock_request.path = "/single-chatflow"
         
         settings_no_explicit_inputs = dict(self.default_settings)
@@ -477,7 +508,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/workflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -506,7 +537,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": "not a dictionary"}
+        self.set_request_body({"inputs": "not a dictionary"})
         self.mock_request.path = "/workflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -548,7 +579,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/workflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -571,7 +602,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"param1": "value1", "param2": "value2"}
+        self.set_request_body({"param1": "value1", "param2": "value2"})
         self.mock_request.path = "/workflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -589,6 +620,49 @@ class TestWebhookEndpoint(unittest.TestCase):
             response_mode="blocking"
         )
 
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_input_projection_workflow_dynamic(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /workflow/<app_id> with explicit_inputs=False and an input projection.
+        Ensures only the projected fields of the request body are used as inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body({"action": "opened", "sender": {"login": "octocat", "id": 1}, "large": ["..."]})
+        self.mock_request.path = "/workflow/test-app-id"
+
+        settings = dict(self.default_settings, static_app_id=None, explicit_inputs=False,
+                        input_projection="action, sender.login as user")
+
+        self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="test-app-id",
+            inputs={"action": "opened", "user": "octocat"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_input_projection_rejects_non_object_body(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /workflow/<app_id> with an input projection and a body that is not an object.
+        Ensures the body is rejected instead of being projected to empty inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        settings = dict(self.default_settings, static_app_id=None, explicit_inputs=False,
+                        input_projection="action")
+
+        for body in ([{"action": "opened"}], "opened", 1, None):
+            self.set_request_body(body)
+            self.mock_request.path = "/workflow/test-app-id"
+
+            response = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data), {"error": "inputs must be an object"})
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
     def test_workflow_invocation_exception_workflow_dynamic(self, mock_validate_api_key, mock_apply_middleware):
@@ -597,7 +671,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.set_request_body({"inputs": {}})
         self.mock_request.path = "/workflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -623,10 +697,10 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/chatflow/test-app-id"
 
         # Remove static_app_id to allow dynamic app_id routes
@@ -657,7 +731,7 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {}}
+        self.set_request_body({"inputs": {}})
         self.mock_request.path = "/chatflow/test-app-id"
 
         # Remove static_app_id to allow dynamic app_id routes
@@ -678,10 +752,10 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": 123,  # Not a string
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/chatflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -703,11 +777,11 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "inputs": {},
             "conversation_id": 123  # Invalid conversation_id
-        }
+        })
         self.mock_request.path = "/chatflow/test-app-id"
 
         # Remove static_app_id to allow dynamic app_id routes
@@ -729,11 +803,11 @@ class TestWebhookEndpoint(unittest.TestCase):
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "conversation_id": "123",
             "param1": "value1"
-        }
+        })
         self.mock_request.path = "/chatflow/test-app-id"
         
         # Remove static_app_id to allow dynamic app_id routes
@@ -753,18 +827,713 @@ class TestWebhookEndpoint(unittest.TestCase):
             response_mode="blocking"
         )
 
+    # BATCH TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_batch_single_workflow(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /single-workflow/batch with one failing item.
+        Ensures results are returned in request order with an error for each failed item."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        def invoke(app_id, inputs, response_mode):
+            if inputs["n"] == 2:
+                raise Exception("Workflow error")
+            return {"data": {"outputs": {"n": inputs["n"]}}}
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+
+        self.set_request_body({"inputs": [{"n": 1}, {"n": 2}, "invalid", {"n": 4}]})
+        self.mock_request.path = "/single-workflow/batch"
+        settings = dict(self.default_settings, raw_data_output=True, batch_concurrency="2")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"results": [
+            {"index": 0, "result": {"n": 1}},
+            {"index": 1, "error": "Workflow error"},
+            {"index": 2, "error": "inputs must be an object"},
+            {"index": 3, "result": {"n": 4}},
+        ]})
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 3)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_batch_workflow_dynamic_body_array(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /workflow/<app_id>/batch with explicit_inputs=False.
+        Ensures the request body itself is used as the array of inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body([{"param1": "value1"}])
+        self.mock_request.path = "/workflow/test-app-id/batch"
+        settings = dict(self.default_settings, static_app_id=None, explicit_inputs=False)
+
+        response = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.assertEqual(json.loads(response.data), {"results": [{"index": 0, "result": self.workflow_response}]})
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="test-app-id",
+            inputs={"param1": "value1"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_batch_input_projection_rejects_non_object_items(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /workflow/<app_id>/batch with an input projection and items that are not objects.
+        Ensures those items fail instead of being projected to empty inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body([1, "x", None, {"action": "opened", "other": 1}])
+        self.mock_request.path = "/workflow/test-app-id/batch"
+        settings = dict(self.default_settings, static_app_id=None, explicit_inputs=False,
+                        input_projection="action")
+
+        response = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.assertEqual(json.loads(response.data), {"results": [
+            {"index": 0, "error": "inputs must be an object"},
+            {"index": 1, "error": "inputs must be an object"},
+            {"index": 2, "error": "inputs must be an object"},
+            {"index": 3, "result": self.workflow_response},
+        ]})
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="test-app-id",
+            inputs={"action": "opened"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_batch_inputs_not_array(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests batch requests where inputs is not an array.
+        Ensures a 400 error is returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow/batch"
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data), {"error": "inputs must be an array"})
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_batch_streams_ndjson_in_completion_order(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests /single-workflow/batch with an Accept: application/x-ndjson header.
+        Ensures each result is streamed as one line with its index as soon as it completes."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        slow_item_started = threading.Event()
+        fast_item_done = threading.Event()
+
+        def invoke(app_id, inputs, response_mode):
+            if inputs["n"] == 0:
+                slow_item_started.set()
+                fast_item_done.wait(5)
+            else:
+                slow_item_started.wait(5)
+                fast_item_done.set()
+            return {"data": {"outputs": {"n": inputs["n"]}}}
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+
+        self.set_request_body({"inputs": [{"n": 0}, {"n": 1}]})
+        self.mock_request.path = "/single-workflow/batch"
+        self.mock_request.headers = {"Accept": "application/x-ndjson"}
+        settings = dict(self.default_settings, raw_data_output=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(lines, [
+            {"index": 1, "result": {"n": 1}},
+            {"index": 0, "result": {"n": 0}},
+        ])
+
+    # STREAMING TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_streaming_workflow_via_accept_header(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests streaming mode requested with an Accept: text/event-stream header.
+        Ensures the workflow is invoked in streaming mode and relayed as Server-Sent Events."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Accept": "text/event-stream"}
+        self.mock_session.app.workflow.invoke.return_value = iter([
+            {"event": "workflow_started"},
+            {"event": "workflow_finished", "data": {"outputs": {"result": "done"}}},
+        ])
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id",
+            inputs={"param1": "value1"},
+            response_mode="streaming"
+        )
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [json.loads(line[len("data: "):])
+                  for line in response.get_data(as_text=True).split("\n\n") if line]
+        self.assertEqual(events[0], {"event": "workflow_started"})
+        self.assertEqual(events[1]["data"]["outputs"], {"result": "done"})
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_streaming_chatflow_via_setting(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests streaming mode enabled with the response_mode setting.
+        Ensures the chatflow is invoked in streaming mode."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body({"query": "Hi", "inputs": {}})
+        self.mock_request.path = "/single-chatflow"
+        self.mock_session.app.chat.invoke.return_value = iter([{"event": "message", "answer": "Hello"}])
+
+        settings = dict(self.default_settings, response_mode="streaming")
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(self.mock_session.app.chat.invoke.call_args[1]["response_mode"], "streaming")
+        self.assertEqual(response.get_data(as_text=True), 'data: {"event":"message","answer":"Hello"}\n\n')
+
+    # ASYNC JOB TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.job_store')
+    def test_async_workflow_returns_job(self, mock_job_store, mock_validate_api_key, mock_apply_middleware):
+        """Tests async mode requested with a Prefer: respond-async header.
+        Ensures the workflow is queued in the scope of the endpoint and 202 with the job ID is returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_job_store.submit.return_value = Mock(id="job-1", status="queued")
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Prefer": "respond-async"}
+
+        response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)["job_id"], "job-1")
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+        # Running the queued job invokes the workflow
+        run, scope = mock_job_store.submit.call_args[0]
+        self.assertEqual(scope, get_job_scope(self.default_settings, None))
+        self.assertEqual(run(), self.workflow_response)
+        self.mock_session.app.workflow.invoke.assert_called_once_with(
+            app_id="static-app-id",
+            inputs={"param1": "value1"},
+            response_mode="blocking"
+        )
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_async_workflow_runs_while_session_is_open(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests that an async job invokes Dify before the session of its request ends.
+        The plugin SDK iterates a streamed response body and ends the session afterwards, so the
+        body with the job ID is sent first and the response only completes when the job finished."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        session_open = threading.Event()
+        session_open.set()
+        release = threading.Event()
+
+        def invoke(**kwargs):
+            release.wait(5)
+            if not session_open.is_set():
+                raise RuntimeError("Session is closed")
+            return self.workflow_response
+
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Prefer": "respond-async"}
+
+        with patch('endpoints.invoke_endpoint.job_store', JobStore(workers=1)) as store:
+            response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+            self.assertEqual(response.status_code, 202)
+            self.assertTrue(response.is_streamed)
+
+            # Like dify_plugin.core.plugin_executor.PluginExecutor.invoke_endpoint
+            chunks = iter(response.response)
+            body = next(chunks)
+            self.assertEqual(response.headers["Content-Length"], str(len(body)))
+            job = store.get(json.loads(body)["job_id"], get_job_scope(self.default_settings, None))
+            self.assertFalse(job.done.is_set())
+            release.set()
+            self.assertEqual(list(chunks), [])
+            # Like dify_plugin.core.server.io_server.IOServer, which ends the session afterwards
+            session_open.clear()
+
+            self.assertEqual(job.status, "succeeded")
+            self.assertEqual(job.result, self.workflow_response)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.idempotency_store', new_callable=IdempotencyStore)
+    @patch('endpoints.invoke_endpoint.job_store')
+    def test_async_workflow_redelivery(self, mock_job_store, mock_store, mock_validate_api_key,
+                                       mock_apply_middleware):
+        """Tests an async request that is delivered twice with the same Idempotency-Key.
+        Ensures one job is queued and the redelivery receives the same job ID."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_job_store.submit.return_value = Mock(id="job-1", status="queued")
+
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Prefer": "respond-async", "Idempotency-Key": "delivery-1"}
+
+        first = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        second = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        mock_job_store.submit.assert_called_once()
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(json.loads(second.get_data()), json.loads(first.get_data()))
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.job_store')
+    def test_async_workflow_queue_full(self, mock_job_store, mock_validate_api_key, mock_apply_middleware):
+        """Tests async mode when too many jobs are pending.
+        Ensures a 503 with Retry-After is returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_job_store.submit.return_value = None
+
+        self.mock_request.path = "/workflow/test-app-id"
+        settings = dict(self.default_settings, static_app_id=None, async_mode=True)
+
+        response = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    # RESPONSE CACHE TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.workflow_cache', new_callable=ResponseCache)
+    def test_cached_workflow_response(self, mock_cache, mock_validate_api_key, mock_apply_middleware):
+        """Tests workflow requests with the cache_ttl setting.
+        Ensures a repeated request with equal inputs, apart from excluded fields, is served from the cache."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.mock_request.path = "/workflow/test-app-id"
+        settings = dict(self.default_settings, static_app_id=None, cache_ttl="60",
+                        cache_exclude_fields="timestamp")
+
+        self.set_request_body({"inputs": {"param1": "value1", "timestamp": 1}})
+        first = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+        self.set_request_body({"inputs": {"param1": "value1", "timestamp": 2}})
+        second = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.assertEqual(first.headers["X-Cache"], "MISS")
+        self.assertEqual(second.headers["X-Cache"], "HIT")
+        self.assertEqual(json.loads(second.data), self.workflow_response)
+        self.mock_session.app.workflow.invoke.assert_called_once()
+
+    # IDEMPOTENCY TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.idempotency_store', new_callable=IdempotencyStore)
+    def test_redelivery_is_not_invoked_again(self, mock_store, mock_validate_api_key, mock_apply_middleware):
+        """Tests a webhook that is delivered twice with the same X-GitHub-Delivery header.
+        Ensures the workflow runs once and the redelivery receives the stored response."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"X-GitHub-Delivery": "72d3162e-cc78-11e3-81ab-4c9367dc0958"}
+
+        first = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        second = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.mock_session.app.workflow.invoke.assert_called_once()
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(json.loads(second.data), json.loads(first.data))
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.idempotency_store', new_callable=IdempotencyStore)
+    def test_idempotency_key_reused_with_other_body(self, mock_store, mock_validate_api_key, mock_apply_middleware):
+        """Tests a request that reuses an Idempotency-Key with a different body.
+        Ensures 422 is returned instead of the response of the first request."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Idempotency-Key": "order-1"}
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        first = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        self.set_request_body({"inputs": {"param1": "value2"}})
+        second = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 422)
+        self.mock_session.app.workflow.invoke.assert_called_once()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.idempotency_store', new_callable=IdempotencyStore)
+    def test_idempotency_key_scoped_to_endpoint(self, mock_store, mock_validate_api_key, mock_apply_middleware):
+        """Tests two endpoints that receive the same Idempotency-Key for the same app and path.
+        Ensures the second endpoint runs the workflow instead of replaying the first response."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"Idempotency-Key": "order-1"}
+
+        self.mock_session.endpoint_id = "endpoint-a"
+        self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        self.mock_session.endpoint_id = "endpoint-b"
+        second = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+
+        self.assertNotIn("Idempotent-Replayed", second.headers)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+
+    # CONCURRENCY LIMIT TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_bulkhead', new_callable=Bulkhead)
+    def test_app_concurrency_limit_reached(self, mock_bulkhead, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request while the app already runs at its concurrency limit.
+        Ensures a 429 with Retry-After is returned without invoking the workflow."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_bulkhead.acquire("test-app-id", limit=1, total_limit=0, max_queued=0)
+
+        self.mock_request.path = "/workflow/test-app-id"
+        settings = dict(self.default_settings, static_app_id=None, app_concurrency_limit="1",
+                        concurrency_queue_size="0")
+
+        response = self.endpoint._invoke(self.mock_request, {"app_id": "test-app-id"}, settings)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    # DEADLINE TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    def test_deadline_exceeded_returns_504(self, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow that does not finish within the X-Request-Timeout of the caller.
+        Ensures 504 is returned as soon as the time budget runs out."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        release = threading.Event()
+        self.mock_session.app.workflow.invoke.side_effect = lambda **kwargs: release.wait(5)
+
+        self.mock_request.path = "/single-workflow"
+        self.mock_request.headers = {"X-Request-Timeout": "0.05"}
+
+        try:
+            response = self.endpoint._invoke(self.mock_request, {}, self.default_settings)
+        finally:
+            release.set()
+
+        self.assertEqual(response.status_code, 504)
+
+    def test_coalesced_run_ignores_leader_deadline(self):
+        """Tests identical concurrent workflow runs where the first caller has a short deadline.
+        Ensures the shared run has no deadline and a follower with a longer one gets its result."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def invoke(**kwargs):
+            started.set()
+            release.wait(5)
+            return self.workflow_response
+
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+        settings = dict(self.default_settings, coalesce_requests=True)
+        leader, follower = RequestContext(b"{}"), RequestContext(b"{}")
+        leader.deadline = time.monotonic() + 0.05
+        follower.deadline = time.monotonic() + 5
+        results = {}
+
+        def run(name, context):
+            try:
+                results[name] = self.endpoint._run_workflow("coalesced-app-id", {"n": 1}, settings, context)
+            except DeadlineExceededError as e:
+                results[name] = e
+
+        with patch.object(self.endpoint, '_call_workflow', wraps=self.endpoint._call_workflow) as mock_call:
+            leader_thread = threading.Thread(target=run, args=("leader", leader))
+            leader_thread.start()
+            self.assertTrue(started.wait(5))
+            follower_thread = threading.Thread(target=run, args=("follower", follower))
+            follower_thread.start()
+            leader_thread.join(5)
+            release.set()
+            follower_thread.join(5)
+
+        self.assertIsInstance(results["leader"], DeadlineExceededError)
+        self.assertEqual(results["follower"], self.workflow_response)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 1)
+        self.assertIsNone(mock_call.call_args[0][3].deadline)
+
+    def test_interactive_runs_not_starved_behind_bulk_runs(self):
+        """Tests interactive workflow runs with a deadline while many bulk runs are in flight.
+        Ensures the interactive runs are not queued behind the bulk runs and finish in time."""
+        release = threading.Event()
+        bulk_started = threading.Semaphore(0)
+
+        def invoke(**kwargs):
+            if kwargs["inputs"]["lane"] == "bulk":
+                bulk_started.release()
+                release.wait(5)
+            return self.workflow_response
+
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+
+        def run(lane):
+            context = RequestContext(b"{}")
+            context.priority = lane
+            context.deadline = time.monotonic() + 5
+            return self.endpoint._run_workflow("static-app-id", {"lane": lane}, self.default_settings, context)
+
+        bulk_threads = [threading.Thread(target=run, args=("bulk",)) for _ in range(64)]
+        try:
+            for thread in bulk_threads:
+                thread.start()
+            for _ in bulk_threads:
+                self.assertTrue(bulk_started.acquire(timeout=5))
+
+            for _ in range(10):
+                context = RequestContext(b"{}")
+                context.priority = "interactive"
+                context.deadline = time.monotonic() + 1
+                self.assertEqual(
+                    self.endpoint._run_workflow("static-app-id", {"lane": "interactive"}, self.default_settings,
+                                                context),
+                    self.workflow_response)
+        finally:
+            release.set()
+            for thread in bulk_threads:
+                thread.join(5)
+
+    # CIRCUIT BREAKER TESTS
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_breakers')
+    def test_open_circuit_returns_503(self, mock_breakers, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request while the circuit of the app is open.
+        Ensures 503 with Retry-After is returned without invoking the workflow."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_breakers.get.return_value.acquire.side_effect = CircuitOpenError("static-app-id", 12)
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, circuit_breaker=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "12")
+        self.mock_session.app.workflow.invoke.assert_not_called()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_breakers')
+    def test_circuit_records_failures(self, mock_breakers, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request that fails with a transient error while the circuit breaker is enabled.
+        Ensures the failure is recorded for the app."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.app.workflow.invoke.side_effect = InvalidResponseError("Invalid workflow response")
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, circuit_breaker=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 500)
+        mock_breakers.get.assert_called_once_with("static-app-id")
+        mock_breakers.get.return_value.record.assert_called_once_with(False)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_breakers', new_callable=CircuitBreakers)
+    def test_request_errors_do_not_open_circuit(self, mock_breakers, mock_validate_api_key, mock_apply_middleware):
+        """Tests many workflow requests that fail because of their inputs while the circuit breaker is enabled.
+        Ensures the circuit stays closed, also for runs that failed on the inputs."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.app.workflow.invoke.side_effect = [
+            ValueError("Invalid inputs"),
+            {"data": {"status": "failed", "error": "Variable param1 is required"}},
+        ] * 20
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, circuit_breaker=True)
+
+        for _ in range(40):
+            self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(mock_breakers.get("static-app-id").state, "closed")
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 40)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.retry.time.sleep')
+    def test_transient_error_is_retried(self, mock_sleep, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request whose first invocation times out while retries are enabled.
+        Ensures the workflow is invoked again and its result returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        self.mock_session.app.workflow.invoke.side_effect = [
+            TimeoutError("Read timed out"),
+            {"data": {"outputs": {"result": "ok"}}},
+        ]
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, max_retries="2")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_count, 2)
+        mock_sleep.assert_called_once()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_latencies')
+    def test_slow_workflow_is_hedged_on_replica(self, mock_latencies, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request whose app is slower than its latency percentile.
+        Ensures the run is started on the replica and the replica's result returned."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_latencies.get.return_value.percentile.return_value = 0.01
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def invoke(app_id, inputs, response_mode):
+            if app_id == "static-app-id":
+                release.wait(5)
+            return {"data": {"outputs": {"app": app_id}}}
+
+        self.mock_session.app.workflow.invoke.side_effect = invoke
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, replica_app_ids="static-app-id, replica-app-id",
+                        hedge_percentile="95", raw_data_output=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"app": "replica-app-id"})
+        mock_latencies.get.return_value.percentile.assert_called_once_with(95)
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.app_balancer')
+    def test_workflow_is_load_balanced(self, mock_balancer, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request with load balancing across the group of the app.
+        Ensures the workflow is invoked on the app picked from the pool."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_balancer.pick.return_value = "replica-app-id"
+        self.mock_session.app.workflow.invoke.return_value = {"data": {"outputs": {}}}
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, replica_app_ids="static-app-id:2, replica-app-id",
+                        load_balancing="least_outstanding")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_balancer.pick.call_args[0][:2],
+                         ([("static-app-id", 2), ("replica-app-id", 1)], "least_outstanding"))
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_args[1]["app_id"], "replica-app-id")
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.shadow_traffic')
+    def test_workflow_is_mirrored_to_shadow_app(self, mock_traffic, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request with a shadow app configured.
+        Ensures the primary result is returned, the shadow call targets the candidate app and the
+        response is held open until the shadow call finished."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        shadow_done = threading.Event()
+
+        def call(app_id, shadow_app_id, percentage, primary, shadow, pending):
+            pending.append(shadow_done)
+            return primary()
+
+        mock_traffic.call.side_effect = call
+        self.mock_session.app.workflow.invoke.return_value = {"data": {"outputs": {"result": "ok"}}}
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, shadow_app_id="candidate-app-id", shadow_percentage="50")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        app_id, shadow_app_id, percentage, _, shadow, _ = mock_traffic.call.call_args[0]
+        self.assertEqual((app_id, shadow_app_id, percentage), ("static-app-id", "candidate-app-id", 50))
+        self.mock_session.app.workflow.invoke.assert_called_once()
+        shadow()
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_args[1]["app_id"], "candidate-app-id")
+
+        chunks = iter(response.response)
+        self.assertEqual(json.loads(next(chunks)), {"data": {"outputs": {"result": "ok"}}})
+        shadow_done.set()
+        self.assertEqual(list(chunks), [])
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.canary_releases')
+    def test_workflow_canary_split(self, mock_releases, mock_validate_api_key, mock_apply_middleware):
+        """Tests a workflow request with a canary app configured.
+        Ensures the run goes through the canary release of the app with the configured percentage."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_releases.get.return_value.call.side_effect = lambda percentage, call: call("canary-app-id")
+        self.mock_session.app.workflow.invoke.return_value = {"data": {"outputs": {}}}
+
+        self.mock_request.path = "/single-workflow"
+        settings = dict(self.default_settings, canary_app_id="canary-app-id", canary_percentage="5")
+
+        response = self.endpoint._invoke(self.mock_request, {}, settings)
+
+        self.assertEqual(response.status_code, 200)
+        mock_releases.get.assert_called_once_with(("static-app-id", "canary-app-id"))
+        self.assertEqual(mock_releases.get.return_value.call.call_args[0][0], 5)
+        self.assertEqual(self.mock_session.app.workflow.invoke.call_args[1]["app_id"], "canary-app-id")
+
     # CALLBACK FUNCTIONALITY TESTS
 
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
-    @patch('asyncio.create_task')
-    def test_callback_triggered_on_single_workflow(self, mock_create_task, mock_validate_api_key, mock_apply_middleware):
+    @patch('endpoints.invoke_endpoint.callback_dispatcher')
+    def test_callback_triggered_on_single_workflow(self, mock_dispatcher, mock_validate_api_key, mock_apply_middleware):
         """Tests that callback is triggered for single-workflow when configured.
         Ensures callback is scheduled for workflows with static app and callback URL."""
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/single-workflow"
 
         # Settings with callback configuration
@@ -781,19 +1550,44 @@ class TestWebhookEndpoint(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json.loads(response.data), self.workflow_response)
 
-        # Assert callback task was created
-        mock_create_task.assert_called_once()
+        # Assert callback was queued
+        mock_dispatcher.submit.assert_called_once()
 
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
-    @patch('asyncio.create_task')
-    def test_callback_not_triggered_without_static_app(self, mock_create_task, mock_validate_api_key, mock_apply_middleware):
+    @patch('endpoints.invoke_endpoint.callback_outbox')
+    @patch('endpoints.invoke_endpoint.callback_dispatcher')
+    def test_durable_callback_is_stored_before_dispatch(self, mock_dispatcher, mock_outbox, mock_validate_api_key,
+                                                        mock_apply_middleware):
+        """Tests a workflow request with durable callbacks enabled.
+        Ensures the callback is stored in the outbox before it is queued on the dispatcher."""
+        mock_apply_middleware.return_value = None
+        mock_validate_api_key.return_value = None
+        mock_outbox.append.return_value = 7
+
+        self.set_request_body({"inputs": {"param1": "value1"}})
+        self.mock_request.path = "/single-workflow"
+        callback_settings = dict(self.default_settings, callback_url="https://example.com/callback",
+                                 durable_callbacks=True)
+
+        response = self.endpoint._invoke(self.mock_request, {}, callback_settings)
+
+        self.assertEqual(response.status_code, 200)
+        callback_url, secret_token, payload, app_id = mock_outbox.append.call_args[0]
+        self.assertEqual((callback_url, app_id), ("https://example.com/callback", "static-app-id"))
+        self.assertEqual(payload["data"], self.workflow_response)
+        mock_dispatcher.submit.assert_called_once()
+
+    @patch('endpoints.invoke_endpoint.apply_middleware')
+    @patch('endpoints.invoke_endpoint.validate_api_key')
+    @patch('endpoints.invoke_endpoint.callback_dispatcher')
+    def test_callback_not_triggered_without_static_app(self, mock_dispatcher, mock_validate_api_key, mock_apply_middleware):
         """Tests that callback is NOT triggered for dynamic workflows.
         Ensures callback is only for static app configurations."""
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/workflow/test-app-id"
 
         # Remove static_app_id to use dynamic routing
@@ -810,19 +1604,19 @@ class TestWebhookEndpoint(unittest.TestCase):
         # Assert successful response
         self.assertEqual(response.status_code, 200)
 
-        # Assert callback task was NOT created (no static app)
-        mock_create_task.assert_not_called()
+        # Assert callback was NOT queued (no static app)
+        mock_dispatcher.submit.assert_not_called()
 
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
-    @patch('asyncio.create_task')
-    def test_callback_not_triggered_without_url(self, mock_create_task, mock_validate_api_key, mock_apply_middleware):
+    @patch('endpoints.invoke_endpoint.callback_dispatcher')
+    def test_callback_not_triggered_without_url(self, mock_dispatcher, mock_validate_api_key, mock_apply_middleware):
         """Tests that callback is NOT triggered when callback URL is not configured.
         Ensures callback requires URL configuration."""
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {"inputs": {"param1": "value1"}}
+        self.set_request_body({"inputs": {"param1": "value1"}})
         self.mock_request.path = "/single-workflow"
 
         # Settings without callback URL
@@ -835,22 +1629,22 @@ class TestWebhookEndpoint(unittest.TestCase):
         # Assert successful response
         self.assertEqual(response.status_code, 200)
 
-        # Assert callback task was NOT created (no callback URL)
-        mock_create_task.assert_not_called()
+        # Assert callback was NOT queued (no callback URL)
+        mock_dispatcher.submit.assert_not_called()
 
     @patch('endpoints.invoke_endpoint.apply_middleware')
     @patch('endpoints.invoke_endpoint.validate_api_key')
-    @patch('asyncio.create_task')
-    def test_callback_not_triggered_on_chatflow(self, mock_create_task, mock_validate_api_key, mock_apply_middleware):
+    @patch('endpoints.invoke_endpoint.callback_dispatcher')
+    def test_callback_not_triggered_on_chatflow(self, mock_dispatcher, mock_validate_api_key, mock_apply_middleware):
         """Tests that callback is NOT triggered for chatflow endpoints.
         Ensures callback is only for workflow endpoints."""
         mock_apply_middleware.return_value = None
         mock_validate_api_key.return_value = None
 
-        self.mock_request.get_json.return_value = {
+        self.set_request_body({
             "query": "What is the weather?",
             "inputs": {}
-        }
+        })
         self.mock_request.path = "/single-chatflow"
 
         # Settings with callback configuration
@@ -867,8 +1661,8 @@ class TestWebhookEndpoint(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json.loads(response.data), self.chatflow_response)
 
-        # Assert callback task was NOT created (chatflow, not workflow)
-        mock_create_task.assert_not_called()
+        # Assert callback was NOT queued (chatflow, not workflow)
+        mock_dispatcher.submit.assert_not_called()
 
 
 if __name__ == '__main__':
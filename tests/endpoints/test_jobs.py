@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+from werkzeug import Request
+from dify_plugin.core.runtime import Session
+from endpoints.helpers import get_job_scope
+from endpoints.jobs import JobStore
+from endpoints.job_status_endpoint import JobStatusEndpoint
+
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.store = JobStore(workers=2, max_pending=2, ttl=60, max_jobs=10)
+
+    def test_job_succeeds(self):
+        """
+        Tests that a job runs in the background and stores its result.
+        """
+        job = self.store.submit(lambda: {"outputs": {"result": "done"}})
+
+        self.assertTrue(job.done.wait(5))
+        self.assertEqual(self.store.get(job.id).to_dict()["result"], {"outputs": {"result": "done"}})
+        self.assertEqual(job.status, "succeeded")
+
+    def test_job_fails(self):
+        """
+        Tests that an exception marks the job as failed with the error message.
+        """
+        def fail():
+            raise RuntimeError("Workflow error")
+
+        job = self.store.submit(fail)
+
+        self.assertTrue(job.done.wait(5))
+        self.assertEqual(job.to_dict()["status"], "failed")
+        self.assertEqual(job.to_dict()["error"], "Workflow error")
+
+    def test_rejects_when_too_many_pending(self):
+        """
+        Tests that submissions beyond the pending limit are rejected.
+        """
+        blocker = threading.Event()
+        release = lambda: blocker.wait(5)
+
+        first = self.store.submit(release)
+        second = self.store.submit(release)
+
+        self.assertIsNone(self.store.submit(release))
+        blocker.set()
+        self.assertTrue(first.done.wait(5) and second.done.wait(5))
+        self.assertIsNotNone(self.store.submit(lambda: None))
+
+    def test_jobs_of_other_scopes_are_hidden(self):
+        """
+        Tests that a job can only be looked up in the scope it was created in.
+        """
+        job = self.store.submit(lambda: "result", "scope-a")
+        self.assertTrue(job.done.wait(5))
+
+        self.assertIs(self.store.get(job.id, "scope-a"), job)
+        self.assertIsNone(self.store.get(job.id, "scope-b"))
+        self.assertIsNone(self.store.get(job.id))
+
+    def test_finished_jobs_expire(self):
+        """
+        Tests that finished jobs are evicted after the TTL.
+        """
+        job = self.store.submit(lambda: "result")
+        self.assertTrue(job.done.wait(5))
+
+        with patch('endpoints.jobs.time.time', return_value=time.time() + 120):
+            self.assertIsNone(self.store.get(job.id))
+
+
+class TestJobStatusEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = JobStatusEndpoint(session=Mock(spec=Session))
+        self.request = Mock(spec=Request)
+        self.request.headers = {"x-api-key": "test_api_key"}
+        self.settings = {"api_key": "test_api_key", "api_key_location": "api_key_header"}
+
+    @patch('endpoints.job_status_endpoint.job_store')
+    def test_returns_job(self, mock_job_store):
+        """
+        Tests that the status endpoint returns the job as JSON.
+        """
+        job = Mock()
+        job.to_dict.return_value = {"job_id": "abc", "status": "running"}
+        mock_job_store.get.return_value = job
+
+        response = self.endpoint._invoke(self.request, {"job_id": "abc"}, self.settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"job_id": "abc", "status": "running"})
+        mock_job_store.get.assert_called_once_with("abc", get_job_scope(self.settings, None))
+
+    def test_unknown_job(self):
+        """
+        Tests that an unknown job ID returns 404.
+        """
+        response = self.endpoint._invoke(self.request, {"job_id": "unknown"}, self.settings)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_of_other_endpoint(self):
+        """
+        Tests that a job created through another endpoint or with another API key is not found.
+        """
+        store = JobStore(workers=1)
+        other_endpoint = store.submit(lambda: "result", get_job_scope(self.settings, "other-endpoint"))
+        other_api_key = store.submit(lambda: "result", get_job_scope(dict(self.settings, api_key="other"), None))
+        own = store.submit(lambda: "result", get_job_scope(self.settings, None))
+        self.assertTrue(own.done.wait(5))
+
+        with patch('endpoints.job_status_endpoint.job_store', store):
+            for job, status in ((other_endpoint, 404), (other_api_key, 404), (own, 200)):
+                response = self.endpoint._invoke(self.request, {"job_id": job.id}, self.settings)
+                self.assertEqual(response.status_code, status)
+
+    def test_invalid_api_key(self):
+        """
+        Tests that the status endpoint requires the API key.
+        """
+        self.request.headers = {"x-api-key": "invalid"}
+
+        response = self.endpoint._invoke(self.request, {"job_id": "abc"}, self.settings)
+
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from endpoints.latency import LatencyWindow
+
+
+class TestLatencyWindow(unittest.TestCase):
+    def test_percentile_requires_samples(self):
+        """
+        Tests that no percentile is reported before enough calls were recorded.
+        """
+        window = LatencyWindow(min_samples=5)
+        for seconds in range(4):
+            window.record(seconds)
+
+        self.assertIsNone(window.percentile(95))
+
+    def test_percentile(self):
+        """
+        Tests the nearest rank percentiles of the recorded durations.
+        """
+        window = LatencyWindow(min_samples=1)
+        for seconds in range(100, 0, -1):
+            window.record(seconds / 10)
+
+        self.assertEqual(window.percentile(50), 5.0)
+        self.assertEqual(window.percentile(95), 9.5)
+        self.assertEqual(window.percentile(100), 10.0)
+        self.assertEqual(window.percentile(0), 0.1)
+
+    def test_window_keeps_recent_samples(self):
+        """
+        Tests that only the most recent durations are kept.
+        """
+        window = LatencyWindow(size=10, min_samples=1)
+        for _ in range(10):
+            window.record(60.0)
+        for _ in range(10):
+            window.record(1.0)
+
+        self.assertEqual(window.percentile(100), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from collections import Counter
+from endpoints.load_balancer import LEAST_OUTSTANDING, ROUND_ROBIN, LoadBalancer
+
+
+class TestLoadBalancer(unittest.TestCase):
+    def setUp(self):
+        self.balancer = LoadBalancer()
+        self.in_flight = {}
+        self.latencies = {}
+
+    def pick(self, pool, strategy):
+        return self.balancer.pick(pool, strategy, lambda app_id: self.in_flight.get(app_id, 0),
+                                  lambda app_id: self.latencies.get(app_id))
+
+    def test_single_app(self):
+        """
+        Tests that a pool of one app always picks it.
+        """
+        self.assertEqual(self.pick([("app-a", 1)], ROUND_ROBIN), "app-a")
+
+    def test_weighted_round_robin(self):
+        """
+        Tests that apps are picked in proportion to their weights and interleaved.
+        """
+        pool = [("app-a", 3), ("app-b", 1)]
+
+        picks = [self.pick(pool, ROUND_ROBIN) for _ in range(8)]
+
+        self.assertEqual(Counter(picks), {"app-a": 6, "app-b": 2})
+        self.assertEqual(picks[:4].count("app-b"), 1)
+
+    def test_least_outstanding(self):
+        """
+        Tests that the app with the fewest invocations in flight per weight is picked.
+        """
+        pool = [("app-a", 1), ("app-b", 1), ("app-c", 2)]
+        self.in_flight = {"app-a": 3, "app-b": 1, "app-c": 4}
+
+        self.assertEqual(self.pick(pool, LEAST_OUTSTANDING), "app-b")
+
+        self.in_flight["app-b"] = 2
+        self.assertEqual(self.pick(pool, LEAST_OUTSTANDING), "app-c")
+
+    def test_least_outstanding_prefers_fast_apps(self):
+        """
+        Tests that latencies are compared once they are known for all apps.
+        """
+        pool = [("app-a", 1), ("app-b", 1)]
+        self.in_flight = {"app-a": 1, "app-b": 2}
+        self.latencies = {"app-a": 10.0}
+
+        self.assertEqual(self.pick(pool, LEAST_OUTSTANDING), "app-a")
+
+        self.latencies["app-b"] = 1.0
+        self.assertEqual(self.pick(pool, LEAST_OUTSTANDING), "app-b")
+
+
+if __name__ == '__main__':
+    unittest.main()
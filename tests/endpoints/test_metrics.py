@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import Mock, patch
+from werkzeug import Request
+from dify_plugin.core.runtime import Session
+from endpoints.metrics import MetricsRegistry
+from endpoints.metrics_endpoint import MetricsEndpoint
+from endpoints.app_scope import EndpointApps
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render(self):
+        """
+        Tests that counters, gauges and collected samples are rendered in the Prometheus text format.
+        """
+        registry = MetricsRegistry()
+        registry.describe("requests_total", "counter", "Number of requests")
+        registry.inc("requests_total", app_id="a")
+        registry.inc("requests_total", 2, app_id="a")
+        registry.set("queue_depth", 0.5)
+        registry.register_collector(lambda: [("state", {"app_id": 'a"b'}, 2)])
+
+        self.assertEqual(registry.render(), (
+            "queue_depth 0.5\n"
+            "# HELP requests_total Number of requests\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{app_id="a"} 3\n'
+            'state{app_id="a\\"b"} 2\n'
+        ))
+
+    def test_render_histogram(self):
+        """
+        Tests that the samples of a histogram are rendered as one metric with ordered buckets.
+        """
+        registry = MetricsRegistry()
+        registry.describe("latency_seconds", "histogram", "Latency")
+        registry.register_collector(lambda: [
+            ("latency_seconds_bucket", {"le": "2.0"}, 1),
+            ("latency_seconds_bucket", {"le": "10.0"}, 2),
+            ("latency_seconds_bucket", {"le": "+Inf"}, 2),
+            ("latency_seconds_sum", {}, 6.5),
+            ("latency_seconds_count", {}, 2),
+        ])
+
+        self.assertEqual(registry.render(), (
+            "# HELP latency_seconds Latency\n"
+            "# TYPE latency_seconds histogram\n"
+            'latency_seconds_bucket{le="2.0"} 1\n'
+            'latency_seconds_bucket{le="10.0"} 2\n'
+            'latency_seconds_bucket{le="+Inf"} 2\n'
+            "latency_seconds_count 2\n"
+            "latency_seconds_sum 6.5\n"
+        ))
+
+    def test_render_for_apps(self):
+        """
+        Tests that samples labelled with other apps are left out when rendering for some apps.
+        """
+        registry = MetricsRegistry()
+        registry.inc("calls_total", app_id="a")
+        registry.inc("calls_total", app_id="b")
+        registry.set("queue_depth", 1)
+        registry.register_collector(lambda: [
+            ("canary", {"app_id": "a", "canary_app_id": "c"}, 1),
+            ("canary", {"app_id": "a", "canary_app_id": "d"}, 1),
+        ])
+
+        self.assertEqual(registry.render({"a", "c"}), (
+            'calls_total{app_id="a"} 1\n'
+            'canary{app_id="a",canary_app_id="c"} 1\n'
+            "queue_depth 1\n"
+        ))
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = MetricsEndpoint(Mock(spec=Session))
+        self.request = Mock(spec=Request)
+        self.request.headers = {"x-api-key": "test_api_key"}
+        self.request.args = {}
+        self.settings = {"api_key": "test_api_key", "api_key_location": "api_key_header"}
+
+    @patch('endpoints.metrics_endpoint.metrics')
+    def test_metrics(self, mock_metrics):
+        """
+        Tests that the metrics are returned as text.
+        """
+        mock_metrics.render.return_value = "webhook_circuit_breaker_state{app_id=\"a\"} 0\n"
+
+        response = self.endpoint._invoke(self.request, {}, self.settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        self.assertEqual(response.get_data(as_text=True), mock_metrics.render.return_value)
+
+    @patch('endpoints.metrics_endpoint.endpoint_apps', new_callable=EndpointApps)
+    @patch('endpoints.metrics_endpoint.metrics', new_callable=MetricsRegistry)
+    def test_metrics_scoped_to_endpoint(self, mock_metrics, mock_apps):
+        """
+        Tests that only the metrics of apps the endpoint invoked or configured are returned.
+        """
+        self.endpoint.session.endpoint_id = "endpoint-a"
+        mock_apps.add("endpoint-a", "invoked-app")
+        mock_apps.add("endpoint-b", "other-app")
+        for app_id in ("invoked-app", "canary-app", "other-app"):
+            mock_metrics.inc("calls_total", app_id=app_id)
+
+        response = self.endpoint._invoke(self.request, {}, dict(self.settings, canary_app_id="canary-app"))
+
+        self.assertEqual(response.get_data(as_text=True), (
+            'calls_total{app_id="canary-app"} 1\n'
+            'calls_total{app_id="invoked-app"} 1\n'
+        ))
+
+    def test_metrics_requires_api_key(self):
+        """
+        Tests that the metrics are not returned without a valid API key.
+        """
+        self.request.headers = {"x-api-key": "wrong"}
+
+        response = self.endpoint._invoke(self.request, {}, self.settings)
+
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
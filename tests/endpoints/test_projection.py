@@ -0,0 +1,68 @@
+import unittest
+from endpoints.projection import compile_projection
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.document = {
+            "action": "opened",
+            "repository": {"full_name": "octo/repo", "owner": {"login": "octo"}},
+            "sender": {"login": "octocat", "id": 1},
+            "commits": [{"id": "abc"}, {"id": "def"}],
+            "a/b": "slash",
+        }
+
+    def test_dotted_paths_and_json_pointers(self):
+        """
+        Tests that dotted paths and JSON pointers select nested fields.
+        """
+        projection = compile_projection("action, repository.full_name as repo, /sender/login as user")
+
+        self.assertEqual(projection.apply(self.document), {
+            "action": "opened",
+            "repo": "octo/repo",
+            "user": "octocat",
+        })
+
+    def test_shared_prefixes_and_array_indices(self):
+        """
+        Tests paths sharing a prefix, array indices and escaped JSON pointer segments.
+        """
+        projection = compile_projection(
+            "repository.full_name\nrepository.owner.login as owner\ncommits.1.id as last_commit\n/a~1b as slash")
+
+        self.assertEqual(projection.apply(self.document), {
+            "full_name": "octo/repo",
+            "owner": "octo",
+            "last_commit": "def",
+            "slash": "slash",
+        })
+
+    def test_missing_paths_are_omitted(self):
+        """
+        Tests that paths missing from the document are left out of the inputs.
+        """
+        projection = compile_projection("action, pull_request.title, commits.5.id")
+
+        self.assertEqual(projection.apply(self.document), {"action": "opened"})
+
+    def test_compiled_once_per_spec(self):
+        """
+        Tests that the same spec returns the cached compiled projection.
+        """
+        self.assertIs(compile_projection("action, sender.id"), compile_projection("action, sender.id"))
+
+    def test_invalid_spec(self):
+        """
+        Tests that malformed entries and duplicate names are rejected.
+        """
+        with self.assertRaises(ValueError):
+            compile_projection("repository..full_name")
+        with self.assertRaises(ValueError):
+            compile_projection("sender.login, repository.owner.login")
+        with self.assertRaises(ValueError):
+            compile_projection("action as a as b")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+from endpoints.rate_limit import TokenBucketLimiter, parse_rate
+
+
+class TestParseRate(unittest.TestCase):
+    def test_parse_rate(self):
+        """
+        Tests that rate limit specs are parsed into a rate per second and a burst.
+        """
+        self.assertEqual(parse_rate("10/s"), (10.0, 10.0))
+        self.assertEqual(parse_rate("60/minute"), (1.0, 60.0))
+        self.assertEqual(parse_rate("3600 / h, 20"), (1.0, 20.0))
+
+    def test_parse_invalid_rate(self):
+        """
+        Tests that malformed specs raise a ValueError.
+        """
+        for spec in ("10", "ten/s", "10/day", "0/s", "10/s, 0"):
+            with self.assertRaises(ValueError):
+                parse_rate(spec)
+
+
+@patch('endpoints.rate_limit.time.monotonic')
+class TestTokenBucketLimiter(unittest.TestCase):
+    def setUp(self):
+        self.limiter = TokenBucketLimiter(max_buckets=2)
+
+    def test_burst_and_refill(self, mock_monotonic):
+        """
+        Tests that a burst is allowed at once and tokens are refilled at the configured rate.
+        """
+        mock_monotonic.return_value = 100.0
+        self.assertEqual(self.limiter.acquire("key", rate=1, burst=2), 0)
+        self.assertEqual(self.limiter.acquire("key", rate=1, burst=2), 0)
+        self.assertAlmostEqual(self.limiter.acquire("key", rate=1, burst=2), 1.0)
+
+        mock_monotonic.return_value = 100.5
+        self.assertAlmostEqual(self.limiter.acquire("key", rate=1, burst=2), 0.5)
+
+        mock_monotonic.return_value = 101.0
+        self.assertEqual(self.limiter.acquire("key", rate=1, burst=2), 0)
+        # Other keys have their own bucket
+        self.assertEqual(self.limiter.acquire("other-key", rate=1, burst=2), 0)
+
+    def test_idle_buckets_are_evicted(self, mock_monotonic):
+        """
+        Tests that buckets are dropped once they refilled, and the oldest ones when the limiter is full.
+        """
+        mock_monotonic.return_value = 100.0
+        self.limiter.acquire("a", rate=1, burst=2)
+        self.limiter.acquire("b", rate=1, burst=2)
+        self.limiter.acquire("c", rate=1, burst=2)
+        # The limiter is full, so the least recently used bucket was evicted
+        self.assertEqual(list(self.limiter._buckets), ["b", "c"])
+
+        mock_monotonic.return_value = 102.0
+        self.limiter.acquire("c", rate=1, burst=2)
+        # "b" refilled completely, so it is dropped
+        self.assertEqual(list(self.limiter._buckets), ["c"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from unittest.mock import Mock
+from endpoints.registry import KeyedRegistry
+
+
+class TestKeyedRegistry(unittest.TestCase):
+    def test_get_creates_once_per_key(self):
+        """
+        Tests that the factory is called once for each key and the object is reused.
+        """
+        factory = Mock(side_effect=lambda key: [key])
+        registry = KeyedRegistry(factory)
+
+        first = registry.get("a")
+
+        self.assertIs(registry.get("a"), first)
+        self.assertEqual(registry.get("b"), ["b"])
+        self.assertEqual(factory.call_count, 2)
+        self.assertEqual(registry.values(), [["a"], ["b"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
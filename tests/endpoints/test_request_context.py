@@ -0,0 +1,133 @@
+import hashlib
+import io
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from werkzeug import Request
+from endpoints import codec
+from endpoints.request_context import PayloadTooLargeError, RequestContext, hold_response
+
+
+class TestRequestContext(unittest.TestCase):
+    def test_from_request_reads_body_once(self):
+        """
+        Tests that the context reads the request body exactly once.
+        """
+        request = Mock(spec=Request)
+        request.get_data.return_value = b'{"type": 1}'
+
+        context = RequestContext.from_request(request)
+
+        self.assertEqual(context.raw_body, b'{"type": 1}')
+        self.assertEqual(context.content_length, 11)
+        request.get_data.assert_called_once()
+
+    def test_from_request_rejects_large_content_length(self):
+        """
+        Tests that a declared Content-Length above the limit is rejected without reading the body.
+        """
+        request = Mock(spec=Request)
+        request.content_length = 1024
+
+        with self.assertRaises(PayloadTooLargeError):
+            RequestContext.from_request(request, max_body_size=100)
+
+        request.get_data.assert_not_called()
+
+    def test_from_request_rejects_large_chunked_body(self):
+        """
+        Tests that a body without Content-Length is rejected once the limit is crossed while streaming.
+        """
+        request = Mock(spec=Request)
+        request.content_length = None
+        request.stream = io.BytesIO(b"x" * 200_000)
+
+        with self.assertRaises(PayloadTooLargeError):
+            RequestContext.from_request(request, max_body_size=100_000)
+
+        # Reading stops at the chunk that crossed the limit
+        self.assertLess(request.stream.tell(), 200_000)
+
+    def test_from_request_reads_chunked_body_within_limit(self):
+        """
+        Tests that a body without Content-Length below the limit is read completely.
+        """
+        request = Mock(spec=Request)
+        request.content_length = None
+        request.stream = io.BytesIO(b'{"a": 1}')
+
+        context = RequestContext.from_request(request, max_body_size=100)
+
+        self.assertEqual(context.json, {"a": 1})
+
+    def test_json_is_parsed_once(self):
+        """
+        Tests that repeated access to the JSON body only decodes it once.
+        """
+        context = RequestContext(b'{"inputs": {"a": 1}}')
+
+        with patch('endpoints.request_context.codec.loads', wraps=codec.loads) as mock_loads:
+            self.assertEqual(context.json, {"inputs": {"a": 1}})
+            self.assertIs(context.json, context.json)
+
+        mock_loads.assert_called_once()
+
+    def test_invalid_json_error_is_cached(self):
+        """
+        Tests that a decode error is raised on every access without parsing again.
+        """
+        context = RequestContext(b'invalid json')
+
+        with patch('endpoints.request_context.codec.loads', wraps=codec.loads) as mock_loads:
+            with self.assertRaises(json.JSONDecodeError):
+                _ = context.json
+            with self.assertRaises(json.JSONDecodeError):
+                _ = context.json
+
+        mock_loads.assert_called_once()
+
+    def test_body_hash(self):
+        """
+        Tests that the body hash is the SHA-256 digest of the raw body.
+        """
+        context = RequestContext(b'{}')
+
+        self.assertEqual(context.body_hash, hashlib.sha256(b'{}').hexdigest())
+
+    def test_hold_response(self):
+        """
+        Tests that a held response sends its body with a Content-Length and completes only after
+        the pending events, including ones added while it is held, are set.
+        """
+        first, second = threading.Event(), threading.Event()
+        pending = [first]
+        response = hold_response(codec.json_response({"job_id": "abc"}, status=202), pending)
+
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'{"job_id":"abc"}')
+        self.assertEqual(response.headers["Content-Length"], "16")
+        self.assertEqual(response.status_code, 202)
+
+        pending.append(second)
+        waiter = threading.Thread(target=lambda: list(chunks))
+        waiter.start()
+        first.set()
+        waiter.join(0.05)
+        self.assertTrue(waiter.is_alive())
+        second.set()
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+
+    def test_hold_response_without_pending_work(self):
+        """
+        Tests that a response without pending work is returned unchanged.
+        """
+        response = codec.json_response({"result": 1})
+
+        self.assertIs(hold_response(response, []), response)
+        self.assertFalse(response.is_streamed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+from endpoints.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(max_bytes=100, max_entries=3)
+
+    def test_get_returns_cached_value(self):
+        """
+        Tests that a stored value is returned until it is replaced.
+        """
+        self.assertIsNone(self.cache.get("key"))
+
+        self.cache.set("key", {"outputs": 1}, ttl=60, size=10)
+        self.assertEqual(self.cache.get("key"), {"outputs": 1})
+
+        self.cache.set("key", {"outputs": 2}, ttl=60, size=20)
+        self.assertEqual(self.cache.get("key"), {"outputs": 2})
+        self.assertEqual(self.cache._bytes, 20)
+
+    @patch('endpoints.response_cache.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        """
+        Tests that entries are dropped after their TTL.
+        """
+        mock_monotonic.return_value = 1000.0
+        self.cache.set("key", "value", ttl=60, size=10)
+
+        mock_monotonic.return_value = 1059.0
+        self.assertEqual(self.cache.get("key"), "value")
+
+        mock_monotonic.return_value = 1060.0
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache._bytes, 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """
+        Tests that the least recently used entries are evicted when a bound is exceeded.
+        """
+        self.cache.set("a", "a", ttl=60, size=40)
+        self.cache.set("b", "b", ttl=60, size=40)
+        self.cache.get("a")
+        # Exceeds max_bytes, so "b" as least recently used entry is evicted
+        self.cache.set("c", "c", ttl=60, size=40)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), "a")
+        self.assertEqual(self.cache.get("c"), "c")
+
+        self.cache.set("d", "d", ttl=60, size=1)
+        self.cache.set("e", "e", ttl=60, size=1)
+        # Exceeds max_entries
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_oversized_values_are_not_cached(self):
+        """
+        Tests that a value larger than the whole cache is not stored.
+        """
+        self.cache.set("key", "value", ttl=60, size=101)
+
+        self.assertIsNone(self.cache.get("key"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import time
+import unittest
+from unittest.mock import Mock, patch
+from dify_plugin.errors.model import InvokeBadRequestError, InvokeRateLimitError
+from endpoints.bulkhead import BulkheadFullError
+from endpoints.retry import InvalidResponseError, RetryBudget, call_with_retries, is_retryable
+
+
+class TestIsRetryable(unittest.TestCase):
+    def test_is_retryable(self):
+        """
+        Tests that transient errors are retryable and errors caused by the request are fatal.
+        """
+        for error in (InvokeRateLimitError("rate limited"), ConnectionError(), TimeoutError(),
+                      InvalidResponseError("data is missing"), Exception("invocation exited without response"),
+                      Exception("upstream returned 503")):
+            self.assertTrue(is_retryable(error), error)
+
+        for error in (InvokeBadRequestError("bad request"), ValueError("inputs must be an object"),
+                      BulkheadFullError("app"), Exception("Workflow not found")):
+            self.assertFalse(is_retryable(error), error)
+
+
+@patch('endpoints.retry.time.sleep')
+class TestCallWithRetries(unittest.TestCase):
+    def test_retries_transient_errors(self, mock_sleep):
+        """
+        Tests that transient errors are retried with a capped, jittered backoff.
+        """
+        fn = Mock(side_effect=[TimeoutError(), TimeoutError(), "result"])
+
+        self.assertEqual(call_with_retries(fn, 3, RetryBudget(), base_delay=1, max_delay=1.5), "result")
+
+        self.assertEqual(fn.call_count, 3)
+        delays = [call[0][0] for call in mock_sleep.call_args_list]
+        self.assertTrue(0 <= delays[0] <= 1)
+        self.assertTrue(0 <= delays[1] <= 1.5)
+
+    def test_fatal_errors_are_not_retried(self, mock_sleep):
+        """
+        Tests that fatal errors are raised right away.
+        """
+        fn = Mock(side_effect=ValueError("invalid"))
+
+        with self.assertRaises(ValueError):
+            call_with_retries(fn, 3, RetryBudget())
+
+        fn.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_max_retries(self, mock_sleep):
+        """
+        Tests that the error of the last attempt is raised once the retries are used up.
+        """
+        fn = Mock(side_effect=TimeoutError())
+
+        with self.assertRaises(TimeoutError):
+            call_with_retries(fn, 2, RetryBudget())
+
+        self.assertEqual(fn.call_count, 3)
+
+    def test_retry_budget(self, mock_sleep):
+        """
+        Tests that no retry happens when the budget is exhausted.
+        """
+        fn = Mock(side_effect=TimeoutError())
+
+        with self.assertRaises(TimeoutError):
+            call_with_retries(fn, 3, RetryBudget(ratio=0.1, min_tokens=0))
+
+        fn.assert_called_once()
+
+    def test_deadline(self, mock_sleep):
+        """
+        Tests that no retry happens when the deadline passes before it.
+        """
+        fn = Mock(side_effect=TimeoutError())
+
+        with self.assertRaises(TimeoutError):
+            call_with_retries(fn, 3, RetryBudget(), deadline=time.monotonic() + 0.001, base_delay=10)
+
+        fn.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+from werkzeug import Request
+from dify_plugin.core.runtime import Session
+from endpoints.shadow import ShadowTraffic
+from endpoints.shadow_report_endpoint import ShadowReportEndpoint
+from endpoints.app_scope import EndpointApps
+
+
+class TestShadowTraffic(unittest.TestCase):
+    def setUp(self):
+        self.traffic = ShadowTraffic(workers=1, max_pending=1)
+        self.shadow_done = threading.Event()
+
+    def shadow(self, response):
+        def call():
+            self.shadow_done.set()
+            return response
+        return call
+
+    def test_compares_primary_and_shadow(self):
+        """
+        Tests that the latency and output size of both apps are reported.
+        """
+        primary = {"data": {"status": "succeeded", "outputs": {"text": "hello"}}}
+        shadow = {"data": {"status": "succeeded", "outputs": {"text": "hello world"}}}
+
+        result = self.traffic.call("app", "candidate", 100, lambda: primary, self.shadow(shadow))
+        self.assertTrue(self.shadow_done.wait(5))
+        self.traffic._executor.shutdown(wait=True)
+
+        self.assertEqual(result, primary)
+        report = self.traffic.report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]["app_id"], "app")
+        self.assertEqual(report[0]["shadow_app_id"], "candidate")
+        self.assertEqual(report[0]["primary"]["invocations"], 1)
+        self.assertEqual(report[0]["primary"]["mean_output_bytes"], len('{"text":"hello"}'))
+        self.assertEqual(report[0]["shadow"]["mean_output_bytes"], len('{"text":"hello world"}'))
+        self.assertIsNotNone(report[0]["shadow"]["latency_p95"])
+
+    def test_primary_does_not_wait_for_shadow(self):
+        """
+        Tests that the primary result is returned while the shadow still runs.
+        """
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        result = self.traffic.call("app", "candidate", 100, lambda: "primary", lambda: release.wait(5))
+
+        self.assertEqual(result, "primary")
+
+    def test_pending_event_is_set_when_shadow_finished(self):
+        """
+        Tests that the event added to the pending work of the caller is set once the shadow finished.
+        """
+        release = threading.Event()
+        self.addCleanup(release.set)
+        pending = []
+
+        self.traffic.call("app", "candidate", 100, lambda: "primary", lambda: release.wait(5), pending)
+
+        self.assertEqual(len(pending), 1)
+        self.assertFalse(pending[0].is_set())
+        release.set()
+        self.assertTrue(pending[0].wait(5))
+
+    def test_shadow_errors_are_recorded(self):
+        """
+        Tests that failed shadow runs are counted as errors and do not affect the primary.
+        """
+        def shadow():
+            self.shadow_done.set()
+            raise ValueError("Workflow not found")
+
+        self.traffic.call("app", "candidate", 100, lambda: {"data": {"outputs": {}}}, shadow)
+        self.assertTrue(self.shadow_done.wait(5))
+        self.traffic._executor.shutdown(wait=True)
+
+        self.assertEqual(self.traffic.report()[0]["shadow"]["errors"], 1)
+
+    def test_sampling_and_pending_limit(self):
+        """
+        Tests that runs outside the sample or beyond the pending limit are not mirrored.
+        """
+        shadow = Mock()
+        self.assertEqual(self.traffic.call("app", "candidate", 0, lambda: "primary", shadow), "primary")
+
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.traffic.call("app", "candidate", 100, lambda: "primary", lambda: release.wait(5))
+        self.traffic.call("app", "candidate", 100, lambda: "primary", shadow)
+
+        shadow.assert_not_called()
+        self.assertEqual(self.traffic.report()[0]["primary"]["invocations"], 1)
+
+
+class TestShadowReportEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = ShadowReportEndpoint(Mock(spec=Session))
+        self.request = Mock(spec=Request)
+        self.request.headers = {"x-api-key": "test_api_key"}
+        self.request.args = {}
+        self.settings = {"api_key": "test_api_key", "api_key_location": "api_key_header"}
+
+    @patch('endpoints.shadow_report_endpoint.shadow_traffic')
+    def test_report(self, mock_traffic):
+        """
+        Tests that the comparison report is returned as JSON.
+        """
+        mock_traffic.report.return_value = [{"app_id": "app", "shadow_app_id": "candidate"}]
+
+        response = self.endpoint._invoke(self.request, {}, self.settings)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"comparisons": mock_traffic.report.return_value})
+
+    @patch('endpoints.shadow_report_endpoint.endpoint_apps', new_callable=EndpointApps)
+    @patch('endpoints.shadow_report_endpoint.shadow_traffic', new_callable=lambda: ShadowTraffic(workers=1))
+    def test_report_scoped_to_endpoint(self, mock_traffic, mock_apps):
+        """
+        Tests that only the pairs of apps the endpoint invoked or configured are reported.
+        """
+        self.endpoint.session.endpoint_id = "endpoint-a"
+        mock_apps.add("endpoint-a", "app")
+        mock_apps.add("endpoint-b", "other-app")
+        for app_id, shadow_app_id in (("app", "candidate"), ("other-app", "candidate"), ("other-app", "other")):
+            mock_traffic.call(app_id, shadow_app_id, 100, lambda: {}, Mock(return_value={}))
+
+        response = self.endpoint._invoke(self.request, {}, dict(self.settings, shadow_app_id="candidate"))
+
+        comparisons = json.loads(response.data)["comparisons"]
+        self.assertEqual([(c["app_id"], c["shadow_app_id"]) for c in comparisons], [("app", "candidate")])
+
+    def test_report_requires_api_key(self):
+        """
+        Tests that the report is not returned without a valid API key.
+        """
+        self.request.headers = {"x-api-key": "wrong"}
+
+        response = self.endpoint._invoke(self.request, {}, self.settings)
+
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+from endpoints.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+
+    def test_concurrent_calls_share_one_invocation(self):
+        """
+        Tests that concurrent calls with the same key invoke the function once and share the result.
+        """
+        release = threading.Event()
+        fn = Mock(side_effect=lambda: release.wait(5) and {"result": "shared"})
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(self.flights.do, "key", fn) for _ in range(3)]
+            # Wait until every caller joined the call in flight
+            while self.flights._calls.get("key") is None or self.flights._calls["key"].waiters < 2:
+                time.sleep(0.01)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(results, [{"result": "shared"}] * 3)
+        fn.assert_called_once()
+
+    def test_exception_is_shared(self):
+        """
+        Tests that the exception of the call in flight is raised for the caller.
+        """
+        with self.assertRaises(RuntimeError):
+            self.flights.do("key", Mock(side_effect=RuntimeError("Workflow error")))
+
+        # The key is released, so the next call runs again
+        self.assertEqual(self.flights.do("key", lambda: "retried"), "retried")
+
+    def test_sequential_calls_are_not_cached(self):
+        """
+        Tests that calls after the first one finished invoke the function again.
+        """
+        fn = Mock(return_value="result")
+
+        self.flights.do("key", fn)
+        self.flights.do("key", fn)
+
+        self.assertEqual(fn.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import logging
 import unittest
 from unittest.mock import MagicMock
 from werkzeug import Request
+from endpoints.request_context import RequestContext
 from middlewares.default_middleware import DefaultMiddleware
 
 logger = logging.getLogger(__name__)
@@ -26,26 +27,35 @@ class TestDefaultMiddleware(unittest.TestCase):
         """
         Test transforming a valid JSON request body into a JSON string.
         """
-        request = MagicMock(spec=Request)
-        request.get_json.return_value = {"key": "value"}
+        context = RequestContext(b'{"key": "value"}')
 
-        self.middleware.transform_request_body(request)
+        self.middleware.transform_request_body(context)
 
         expected_json_string = json.dumps({"key": "value"})
         self.assertEqual(
-            request.default_middleware_json['json_string'], expected_json_string)
+            context.middleware_json['json_string'], expected_json_string)
+
+    def test_transform_request_body_keeps_json_dumps_format(self):
+        """
+        Test that the JSON string has the format of json.dumps, with spaces and escaped non-ASCII characters.
+        """
+        context = RequestContext('{"key":"välue","n":[1,2]}'.encode('utf-8'))
+
+        self.middleware.transform_request_body(context)
+
+        self.assertEqual(
+            context.middleware_json['json_string'], '{"key": "v\\u00e4lue", "n": [1, 2]}')
 
     def test_transform_request_body_invalid_json(self):
         """
         Test handling of an invalid JSON request body that raises an exception.
         """
-        request = MagicMock(spec=Request)
-        request.get_json.side_effect = ValueError("Error parsing JSON")
+        context = RequestContext(b'invalid json')
         
-        self.middleware.transform_request_body(request)
+        self.middleware.transform_request_body(context)
 
-        # Expect the default_middleware_json to not be set due to an error
-        self.assertFalse(hasattr(request, 'default_middleware_json'))
+        # Expect the middleware_json to not be set due to an error
+        self.assertIsNone(context.middleware_json)
 
     def test_invoke_with_json_string_input_enabled(self):
         """
@@ -53,13 +63,12 @@ class TestDefaultMiddleware(unittest.TestCase):
         """
         settings = {"json_string_input": True}
         request = MagicMock(spec=Request)
-        request.data = b'{}'
-        request.get_json.return_value = {}
+        context = RequestContext(b'{}')
 
-        response = self.middleware.invoke(request, settings)
+        response = self.middleware.invoke(request, settings, context)
 
         self.assertIsNone(response)  # Expect no response to be returned
-        self.assertIn('json_string', request.default_middleware_json)
+        self.assertIn('json_string', context.middleware_json)
 
     def test_invoke_with_json_string_input_disabled(self):
         """
@@ -67,13 +76,35 @@ class TestDefaultMiddleware(unittest.TestCase):
         """
         settings = {"json_string_input": False}
         request = MagicMock(spec=Request)
-        request.data = b'{}'
-        request.get_json.return_value = {}
+        context = RequestContext(b'{}')
 
-        response = self.middleware.invoke(request, settings)
+        response = self.middleware.invoke(request, settings, context)
 
         self.assertIsNone(response)  # Expect no response to be returned
-        self.assertFalse(hasattr(request, 'default_middleware_json'))
+        self.assertIsNone(context.middleware_json)
+
+    def test_forward_request_body_keeps_original_text(self):
+        """
+        Test forwarding the raw request body as JSON string without re-encoding it.
+        """
+        body = '{ "key" :  "välue",\n  "n": 1.50 }'
+        context = RequestContext(body.encode('utf-8'))
+
+        response = self.middleware.invoke(
+            MagicMock(spec=Request), {"json_string_input": True, "json_string_raw": True}, context)
+
+        self.assertIsNone(response)
+        self.assertEqual(context.middleware_json['json_string'], body)
+
+    def test_forward_request_body_invalid_json(self):
+        """
+        Test that an invalid body is not forwarded as JSON string.
+        """
+        context = RequestContext(b'{"key": ')
+
+        self.middleware.forward_request_body(context)
+
+        self.assertIsNone(context.middleware_json)
 
 
 if __name__ == '__main__':
@@ -1,8 +1,9 @@
 import json
 import unittest
-from unittest.mock import Mock, patch, PropertyMock
+from unittest.mock import Mock, patch
 from werkzeug import Request
 from nacl.exceptions import BadSignatureError
+from endpoints.request_context import RequestContext
 from middlewares.discord_middleware import DiscordMiddleware
 
 class TestDiscordMiddleware(unittest.TestCase):
@@ -26,11 +27,9 @@ class TestDiscordMiddleware(unittest.TestCase):
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
             'X-Signature-Timestamp': 'timestamp'
         }
-        request.data = self.valid_request_body
-        # Mock the JSON property
-        request.json = json.loads(self.valid_request_body)
+        context = RequestContext(self.valid_request_body)
 
-        response = self.middleware.invoke(request)
+        response = self.middleware.invoke(request, context)
 
         # Assert that the correct response is returned for a webhook event
         self.assertIsNotNone(response)
@@ -53,9 +52,9 @@ class TestDiscordMiddleware(unittest.TestCase):
             'X-Signature-Ed25519': '0123456789abcdef',  # Invalid but hex to pass conversion
             'X-Signature-Timestamp': 'timestamp'
         }
-        request.data = self.valid_request_body
+        context = RequestContext(self.valid_request_body)
 
-        response = self.middleware.invoke(request)
+        response = self.middleware.invoke(request, context)
 
         # Assert that a 401 error response is returned
         self.assertEqual(response.status_code, 401)
@@ -78,11 +77,9 @@ class TestDiscordMiddleware(unittest.TestCase):
             'X-Signature-Timestamp': 'timestamp'
         }
         ping_data = json.dumps({"type": 0}).encode('utf-8')  # Type 0 indicates a ping
-        request.data = ping_data
-        # Mock the JSON property correctly
-        request.json = json.loads(ping_data)
+        context = RequestContext(ping_data)
 
-        response = self.middleware.invoke(request)
+        response = self.middleware.invoke(request, context)
 
         # Assert that a 204 status response is returned for ping events
         self.assertIsNotNone(response)
@@ -105,11 +102,9 @@ class TestDiscordMiddleware(unittest.TestCase):
             'X-Signature-Timestamp': 'timestamp'
         }
         webhook_data = json.dumps({"type": 1}).encode('utf-8')  # Type 1 indicates a webhook event
-        request.data = webhook_data
-        # Mock the JSON property correctly
-        request.json = json.loads(webhook_data)
+        context = RequestContext(webhook_data)
 
-        response = self.middleware.invoke(request)
+        response = self.middleware.invoke(request, context)
 
         # Assert that the correct response is returned for webhook events
         self.assertIsNotNone(response)
@@ -132,12 +127,9 @@ class TestDiscordMiddleware(unittest.TestCase):
             'X-Signature-Ed25519': '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
             'X-Signature-Timestamp': 'timestamp'
         }
-        request.data = b'invalid_json'  # Malformed JSON
-        
-        # Properly mock the json property to raise an exception when accessed
-        type(request).json = PropertyMock(side_effect=TypeError("Invalid JSON"))
+        context = RequestContext(b'invalid_json')  # Malformed JSON
 
-        response = self.middleware.invoke(request)
+        response = self.middleware.invoke(request, context)
 
         # Since neither ping nor webhook event is triggered due to JSON parsing error,
         # the middleware should return None